@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import statistics
+import sys
+import time
+from pycreate2 import Create2, columnar
+from pycreate2.createSerial import SerialCommandInterface
+from pycreate2.loopback import LoopbackSerial, SensorResponder
+from pycreate2.pipeline import QueryPipeline
+from pycreate2.query import compile_sensor_group
+from pycreate2.sensors import SensorNames
+
+DESCRIPTION = """
+Benchmarks the Create2 I/O path against a loopback serial port that models
+the real byte timing at 115200 and 19200 baud. No robot needed.
+
+Save the results with --json and compare two runs with --compare to catch
+regressions between commits.
+"""
+
+LIST_SENSORS = (
+    SensorNames.LIGHT_BUMP_LEFT,
+    SensorNames.LIGHT_BUMP_FRONT_LEFT,
+    SensorNames.LIGHT_BUMP_CENTER_LEFT,
+    SensorNames.LIGHT_BUMP_CENTER_RIGHT,
+    SensorNames.LIGHT_BUMP_FRONT_RIGHT,
+    SensorNames.LIGHT_BUMP_RIGHT,
+    SensorNames.BATTERY_CHARGE,
+)
+
+# True if a larger value is better
+HIGHER_IS_BETTER = {
+    "drive_direct_per_sec": True,
+    "group_100_per_sec": True,
+    "sensor_list_per_sec": True,
+    "group_101_per_sec": True,
+    "group_101_pipelined_per_sec": True,
+    "decode_ns_per_packet": False,
+    "batch_decode_ns_per_packet": False,
+    "latency_p50_ms": False,
+    "latency_p99_ms": False,
+}
+
+
+def handleArgs():
+    parser = argparse.ArgumentParser(
+        description=DESCRIPTION, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument(
+        '-d', '--duration', help='seconds per measurement, default 1.0', type=float, default=1.0)
+    parser.add_argument(
+        '-b', '--baud', help='baud rates to model, default 115200 19200', type=int, nargs='+', default=[115200, 19200])
+    parser.add_argument(
+        '--json', help='write the results to this file', type=str, default=None)
+    parser.add_argument(
+        '--compare', help='compare against results saved with --json', type=str, default=None)
+    parser.add_argument(
+        '--threshold', help='percent change reported as a regression, default 10', type=float, default=10.0)
+
+    args = vars(parser.parse_args())
+    return args
+
+
+def make_bot(baud: int) -> Create2:
+    sci = SerialCommandInterface()
+    sci.ser = LoopbackSerial(SensorResponder(), baudrate=baud)  # type: ignore
+    return Create2(sci=sci)
+
+
+def rate(func, duration: float) -> float:
+    """Calls func for 'duration' seconds and returns calls per second."""
+    count = 0
+    start = time.perf_counter()
+    end = start + duration
+    while time.perf_counter() < end:
+        func()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def bench_baud(baud: int, duration: float) -> dict[str, float]:
+    with make_bot(baud) as bot:
+        results = {}
+
+        speeds = [(100, -100), (-100, 100)]
+        i = 0
+
+        def drive():
+            nonlocal i
+            bot.drive_direct(*speeds[i & 1])
+            i += 1
+
+        # include the time to drain the transmit buffer, the wire is the limit
+        start = time.perf_counter()
+        count = rate(drive, duration) * duration
+        bot.SCI.ser.flush()
+        results["drive_direct_per_sec"] = count / (time.perf_counter() - start)
+
+        results["group_100_per_sec"] = rate(lambda: bot.get_sensor_group(100), duration)
+        results["sensor_list_per_sec"] = rate(lambda: bot.get_sensor_list(LIST_SENSORS), duration)
+        results["group_101_per_sec"] = rate(lambda: bot.get_sensor_group(101), duration)
+
+        # keep 4 requests in flight, wait for the oldest before sending another
+        with QueryPipeline(bot, depth=4) as pipeline:
+            futures = [pipeline.get_sensor_group(101) for _ in range(4)]
+
+            def pipelined():
+                futures.pop(0).result()
+                futures.append(pipeline.get_sensor_group(101))
+
+            results["group_101_pipelined_per_sec"] = rate(pipelined, duration)
+            for f in futures:
+                f.result()
+
+        latencies = []
+
+        def query():
+            bot.get_sensor_list((SensorNames.CHARGER_AVAILABLE,))
+            latencies.append(bot.last_query_latency)
+
+        rate(query, duration)
+        latencies.sort()
+        results["latency_p50_ms"] = statistics.median(latencies) * 1e3
+        results["latency_p99_ms"] = latencies[int(len(latencies) * 0.99)] * 1e3
+        return results
+
+
+def bench_decode(duration: float) -> float:
+    """Nanoseconds to decode one packet of group 100."""
+    plan = compile_sensor_group(100)
+    data = bytes(plan.size)
+    calls = rate(lambda: plan.decode(data), duration)
+    return 1e9 / calls / len(plan.packets)
+
+
+def bench_batch_decode(duration: float) -> float | None:
+    """Nanoseconds per packet to decode 10000 responses of group 100 with numpy."""
+    if columnar.np is None:
+        return None
+    plan = compile_sensor_group(100)
+    data = bytes(plan.size * 10000)
+    calls = rate(lambda: columnar.decode_frames(plan, data)[SensorNames.VOLTAGE].sum(), duration)
+    return 1e9 / calls / (10000 * len(plan.packets))
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    ok = True
+    print(f"\n{'benchmark':>38} {'before':>10} {'after':>10} {'change':>8}")
+    for key, value in results.items():
+        if key not in baseline:
+            continue
+        before = baseline[key]
+        change = (value - before) / before * 100.0 if before else 0.0
+        higher_is_better = HIGHER_IS_BETTER[key.split("/")[-1]]
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > threshold:
+            flag = " <-- regression"
+            ok = False
+        print(f"{key:>38} {before:10.2f} {value:10.2f} {change:+7.1f}%{flag}")
+    return ok
+
+
+def main():
+    args = handleArgs()
+    duration = args['duration']
+
+    results: dict[str, float] = {}
+    results["decode_ns_per_packet"] = bench_decode(duration)
+    batch = bench_batch_decode(duration)
+    if batch is not None:
+        results["batch_decode_ns_per_packet"] = batch
+    for baud in args['baud']:
+        for key, value in bench_baud(baud, duration).items():
+            results[f"{baud}/{key}"] = value
+
+    for key, value in results.items():
+        print(f"{key:>38}: {value:10.2f}")
+
+    if args['json']:
+        with open(args['json'], 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args['compare']:
+        with open(args['compare']) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args['threshold']):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
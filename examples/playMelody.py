@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+# play a melody longer than the 16 notes a song can hold
+
+import pycreate2
+from pycreate2.melody import MelodyPlayer
+
+
+if __name__ == "__main__":
+    bot = pycreate2.Create2()
+    bot.start()
+    bot.full()
+
+    # a C major scale up and down, 4 times: 60 notes of 1/8 s
+    scale = [60, 62, 64, 65, 67, 69, 71, 72, 71, 69, 67, 65, 64, 62, 60]
+    melody = [(note, 8) for note in scale * 4]
+
+    # the player splits it into songs and keeps the next ones queued in the
+    # other song slots, so there are no gaps between them
+    player = MelodyPlayer(bot)
+    player.play(melody)
+
+    bot.close()
@@ -1,6 +1,7 @@
 # Walchko: I took some of these ideas from: https://bitbucket.org/lemoneer/irobot
 
 from enum import Enum
+from pycreate2.sensors import REGISTRY
 
 
 class BaudRate(Enum):
@@ -148,21 +149,16 @@ class Opcodes(Enum):
     MOTORS_PWM = 144
     DRIVE_DIRECT = 145
     DRIVE_PWM = 146
+    STREAM = 148
     QUERY_LIST = 149
+    PAUSE_RESUME_STREAM = 150
     DIGIT_LED_ASCII = 164
     STOP = 173
 
 
-RESPONSE_SIZES = {
-    0: 26, 1: 10, 2: 6, 3: 10, 4: 14, 5: 12, 6: 52,
-    # actual sensors
-    7: 1, 8: 1, 9: 1, 10: 1, 11: 1, 12: 1, 13: 1, 14: 1, 15: 1, 16: 1, 17: 1, 18: 1, 19: 2, 20: 2, 21: 1,
-    22: 2, 23: 2, 24: 1, 25: 2, 26: 2, 27: 2, 28: 2, 29: 2, 30: 2, 31: 2, 32: 3, 33: 3, 34: 1, 35: 1,
-    36: 1, 37: 1, 38: 1, 39: 2, 40: 2, 41: 2, 42: 2, 43: 2, 44: 2, 45: 1, 46: 2, 47: 2, 48: 2, 49: 2,
-    50: 2, 51: 2, 52: 1, 53: 1, 54: 2, 55: 2, 56: 2, 57: 2, 58: 1,
-    # end actual sensors
-    100: 80, 101: 28, 106: 12, 107: 9
-}
+# Response size of every sensor packet and packet group, taken from the sensor
+# registry so there is a single source of truth
+RESPONSE_SIZES = REGISTRY.packet_sizes
 
 
 def calc_query_data_len(pkts):
@@ -172,6 +168,36 @@ def calc_query_data_len(pkts):
     return packet_size
 
 
+# Data bytes that follow each opcode. Song, Stream and Query List carry their
+# own length, see command_size()
+COMMAND_DATA_SIZES = {
+    Opcodes.RESET.value: 0, Opcodes.START.value: 0, Opcodes.SAFE.value: 0,
+    Opcodes.FULL.value: 0, Opcodes.POWER.value: 0, Opcodes.DRIVE.value: 4,
+    Opcodes.MOTORS.value: 1, Opcodes.LED.value: 3, Opcodes.PLAY.value: 1,
+    Opcodes.SENSORS.value: 1, Opcodes.SEEK_DOCK.value: 0, Opcodes.MOTORS_PWM.value: 3,
+    Opcodes.DRIVE_DIRECT.value: 4, Opcodes.DRIVE_PWM.value: 4,
+    Opcodes.PAUSE_RESUME_STREAM.value: 1, Opcodes.DIGIT_LED_ASCII.value: 4,
+    Opcodes.STOP.value: 0,
+}
+
+
+def command_size(msg: bytes | bytearray | memoryview) -> int | None:
+    """
+    Size of the command at the start of msg, opcode included. Returns None if
+    msg is too short to tell yet and raises KeyError for unknown opcodes.
+    """
+    if len(msg) == 0:
+        return None
+    opcode = msg[0]
+    if opcode in COMMAND_DATA_SIZES:
+        return COMMAND_DATA_SIZES[opcode] + 1
+    if opcode == Opcodes.SONG.value:
+        return 3 + 2 * msg[2] if len(msg) >= 3 else None
+    if opcode in (Opcodes.STREAM.value, Opcodes.QUERY_LIST.value):
+        return 2 + msg[1] if len(msg) >= 2 else None
+    raise KeyError(f"Unknown opcode {opcode}")
+
+
 class ChargingState(Enum):
     NOT_CHARGING = 0
     RECONDITIONING_CHARGING = 1
@@ -0,0 +1,224 @@
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+from enum import IntEnum
+from typing import Any, Callable
+from pycreate2.create2api import Create2
+import pycreate2.logger  # just to set up logging
+import logging
+
+logger = logging.getLogger("create2arbiter")
+
+
+class Priority(IntEnum):
+    """Lower goes first, commands of the same priority keep their order."""
+    SAFETY = 0  # stopping the wheels, mode changes
+    DRIVE = 1
+    QUERY = 2
+    NORMAL = 3  # leds, display, songs, cleaning motors
+
+
+# Create2 methods that don't run at NORMAL priority
+PRIORITIES = {
+    "start": Priority.SAFETY,
+    "safe": Priority.SAFETY,
+    "full": Priority.SAFETY,
+    "stop": Priority.SAFETY,
+    "power": Priority.SAFETY,
+    "reset": Priority.SAFETY,
+    "drive_direct": Priority.DRIVE,
+    "drive_pwm": Priority.DRIVE,
+    "drive_radius": Priority.DRIVE,
+    "drive_stop": Priority.DRIVE,
+    "get_sensor_list": Priority.QUERY,
+    "get_sensor_group": Priority.QUERY,
+    "get_sensors": Priority.QUERY,
+    "get_mode": Priority.QUERY,
+}
+
+# commands that set the wheel speeds, a newer one makes the queued ones moot
+DRIVE_COMMANDS = {"drive_direct", "drive_pwm", "drive_radius", "drive_stop"}
+
+
+def _stops(name: str, args: tuple, kwargs: dict) -> bool:
+    """True if a wheel command sets every speed to 0."""
+    if name == "drive_stop":
+        return True
+    if name == "drive_radius":
+        speeds = [args[0] if args else kwargs.get("velocity")]
+    else:
+        speeds = list(args[:2]) + list(kwargs.values())
+    return not any(speeds)
+
+
+class _Command(object):
+    __slots__ = ("priority", "seq", "future", "func", "args", "kwargs")
+
+    def __init__(self, priority: int, seq: int, func: Callable, args: tuple, kwargs: dict):
+        self.priority = priority
+        self.seq = seq
+        self.future: Future = Future()
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __lt__(self, other: "_Command") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class CommandArbiter(object):
+    """
+    Gives the serial port to a single thread. Any thread can call robot
+    methods through the arbiter, they are queued and run one at a time on
+    the I/O thread, so writes and query responses never interleave and no
+    lock is needed around the robot:
+
+        with CommandArbiter(bot) as io:
+            io.led(8, 0, 255)                       # returns a Future
+            data = io.get_sensor_group(100).result()
+            io.emergency_stop()
+
+    The queue is ordered by Priority, then by submission. Wheel commands
+    stopping the robot run at SAFETY priority, ahead of everything queued,
+    so stopping takes at most the command already running plus its own
+    write, whatever is waiting. A new wheel command also cancels the queued
+    wheel command it makes moot, only the latest speeds matter, but a queued
+    stop is never cancelled: speeds sent after it run after it.
+
+    While the arbiter runs, only use the robot through it.
+    """
+
+    def __init__(self, bot: Create2):
+        """
+        Constructor.
+
+        :param bot: the robot to own
+        """
+        self.bot = bot
+        self._cond = threading.Condition()
+        self._queue: list[_Command] = []
+        self._seq = itertools.count()
+        # the latest wheel command, the only one a newer one may cancel
+        self._drive: _Command | None = None
+        self._running = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self.executed = 0
+        self.superseded = 0  # wheel commands cancelled by a newer one
+
+    def __enter__(self) -> "CommandArbiter":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getattr__(self, name: str) -> Callable[..., Future]:
+        # io.led(...) is io.call("led", ...)
+        if name.startswith("_") or name == "bot" or not callable(getattr(self.bot, name, None)):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    @property
+    def running(self) -> bool:
+        return self._running.is_set()
+
+    @property
+    def pending(self) -> int:
+        """Commands waiting to run."""
+        with self._cond:
+            return sum(1 for cmd in self._queue if not cmd.future.done())
+
+    def start(self):
+        """
+        Starts the I/O thread. Commands submitted before run in priority order.
+        """
+        if self.running:
+            return
+        self._running.set()
+        self._thread = threading.Thread(
+            target=self._run, name="create2io", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout: float = 1.0):
+        """
+        Stops the I/O thread once the command running is over, the queued
+        ones are cancelled.
+        """
+        self._running.clear()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._cond:
+            for cmd in self._queue:
+                cmd.future.cancel()
+            self._queue.clear()
+            self._drive = None
+
+    def call(self, name: str, *args, **kwargs) -> Future:
+        """
+        Queues a Create2 method by name, with the priority in PRIORITIES.
+        Wheel commands that stop the robot (all speeds 0) run at SAFETY.
+
+        :return: future with what the method returns
+        """
+        func = getattr(self.bot, name)
+        drive = name in DRIVE_COMMANDS
+        priority = PRIORITIES.get(name, Priority.NORMAL)
+        if drive and _stops(name, args, kwargs):
+            priority = Priority.SAFETY
+        return self._submit(priority, func, args, kwargs, drive)
+
+    def submit(self, func: Callable[..., Any], *args, priority: Priority = Priority.NORMAL, **kwargs) -> Future:
+        """
+        Queues any callable to run on the I/O thread, ie a function doing
+        several robot calls that must not be split up.
+
+        :return: future with what func returns
+        """
+        return self._submit(priority, func, args, kwargs, False)
+
+    def emergency_stop(self) -> Future:
+        """
+        Stops the wheels ahead of anything queued, cancelling the queued wheel
+        command.
+        """
+        return self.call("drive_direct", 0, 0)
+
+    def _submit(self, priority: int, func: Callable, args: tuple, kwargs: dict, drive: bool) -> Future:
+        cmd = _Command(priority, next(self._seq), func, args, kwargs)
+        with self._cond:
+            if drive:
+                queued = self._drive
+                # a stop runs no matter what, other speeds give way to
+                # newer ones of the same or a higher priority
+                if (queued is not None and queued.priority != Priority.SAFETY
+                        and queued.priority >= priority
+                        and not queued.future.done() and queued.future.cancel()):
+                    self.superseded += 1
+                self._drive = cmd
+            heapq.heappush(self._queue, cmd)
+            self._cond.notify()
+        return cmd.future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running.is_set() and not self._queue:
+                    self._cond.wait()
+                if not self._running.is_set():
+                    return
+                cmd = heapq.heappop(self._queue)
+            if not cmd.future.set_running_or_notify_cancel():
+                continue  # cancelled while queued
+            try:
+                result = cmd.func(*cmd.args, **cmd.kwargs)
+            except Exception as e:
+                logger.error(f"{getattr(cmd.func, '__name__', cmd.func)} failed on the I/O thread: {e}")
+                cmd.future.set_exception(e)
+            else:
+                cmd.future.set_result(result)
+            self.executed += 1
@@ -0,0 +1,138 @@
+from typing import Sequence
+from pycreate2.query import QueryPlan
+from pycreate2.recorder import TIMESTAMP, Recording
+import pycreate2.sensors as sensors
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# struct codes used by the sensor registry and their numpy equivalents
+_DTYPES = {
+    'B': '>u1',
+    'b': '>i1',
+    'H': '>u2',
+    'h': '>i2',
+}
+
+_SIZES = {'x': 1, 'B': 1, 'b': 1, 'H': 2, 'h': 2}
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("columnar decoding needs numpy: pip install pycreate2[numpy]")
+
+
+def layout_dtype(layout: str, names: Sequence[str], offset: int = 0, itemsize: int | None = None, extra: dict | None = None):
+    """
+    Builds a big-endian structured dtype from a struct format like the ones
+    QueryPlan and Recorder use ('>' followed by B, b, H, h and x pad bytes).
+
+    :param layout: the struct format of one frame
+    :param names: a field name for every non pad code, in order
+    :param offset: where the frame starts inside every item
+    :param itemsize: bytes between items, the frame size by default
+    :param extra: more fields, name -> (dtype, offset), ie a timestamp
+    :return: numpy structured dtype
+    """
+    _require_numpy()
+    codes = layout.lstrip('>')
+    fields: dict[str, tuple[str, int]] = dict(extra or {})
+    names_iter = iter(names)
+    index = offset
+    for code in codes:
+        if code != 'x':
+            fields[next(names_iter)] = (_DTYPES[code], index)
+        index += _SIZES[code]
+    if itemsize is None:
+        itemsize = index
+    return np.dtype({
+        'names': list(fields.keys()),
+        'formats': [f[0] for f in fields.values()],
+        'offsets': [f[1] for f in fields.values()],
+        'itemsize': itemsize,
+    })
+
+
+def plan_dtype(plan: QueryPlan):
+    """Structured dtype of one response to a query plan."""
+    return layout_dtype(plan.decoder.format, plan.names)
+
+
+def out_of_range(frames, packets: Sequence[sensors.Sensor]):
+    """
+    Vectorized range check of a batch of decoded frames.
+
+    :param frames: structured array from decode_frames or decode_recording
+    :param packets: the sensors in the frames
+    :return: boolean array, True for every frame holding an out of range value
+    """
+    _require_numpy()
+    bad = np.zeros(len(frames), dtype=bool)
+    for pkt in packets:
+        low, high = pkt.value_range
+        column = frames[pkt.name]
+        info = np.iinfo(column.dtype)
+        # a sensor spanning its whole type can't be out of range
+        if low > info.min or high < info.max:
+            bad |= (column < low) | (column > high)
+    return bad
+
+
+def _check(frames, packets: Sequence[sensors.Sensor]):
+    bad = out_of_range(frames, packets)
+    if bad.any():
+        row = int(np.argmax(bad))
+        for pkt in packets:
+            value = int(frames[pkt.name][row])
+            if not pkt.value_range[0] <= value <= pkt.value_range[1]:
+                raise ValueError(
+                    f"Unpacked value {value} out of range {pkt.value_range} for sensor {pkt.name} (ID {pkt.id}) in frame {row}"
+                )
+
+
+def decode_frames(plan: QueryPlan, buffer, validate: bool = True):
+    """
+    Decodes N responses to the same query, stored back to back, in one go.
+    The result is a read-only view of the buffer, nothing is copied:
+
+        frames = decode_frames(compile_sensor_group(100), data)
+        frames[SensorNames.VOLTAGE].mean()
+
+    :param plan: the query that produced the responses
+    :param buffer: bytes-like object holding a whole number of responses
+    :param validate: raise ValueError if any value is out of its sensor's range
+    :return: structured array with one field per sensor
+    """
+    dtype = plan_dtype(plan)
+    if len(buffer) % dtype.itemsize:
+        raise ValueError(f"Buffer holds {len(buffer)} bytes, not a multiple of {dtype.itemsize}")
+    frames = np.frombuffer(buffer, dtype=dtype)
+    if validate:
+        _check(frames, plan.packets)
+    return frames
+
+
+def decode_recording(recording: Recording, validate: bool = True):
+    """
+    Decodes a whole Recording in one go, without copying or reading it all
+    into memory: the result is a view of the memory mapped file.
+
+    :param recording: an open Recording
+    :param validate: raise ValueError if any value is out of its sensor's range
+    :return: structured array with a 'timestamp' field and one per sensor
+    """
+    _require_numpy()
+    header = recording.header
+    dtype = layout_dtype(
+        header["layout"], recording.names, offset=TIMESTAMP.size,
+        itemsize=recording.record_size, extra={"timestamp": ("<f8", 0)})
+    frames = np.frombuffer(recording.records(), dtype=dtype)
+    if validate:
+        packets = [
+            sensors.Sensor(p["id"], p["size"], tuple(p["range"]), p["name"], [])
+            for p in header["packets"]
+        ]
+        _check(frames, packets)
+    return frames
@@ -1,14 +1,39 @@
+import atexit
 import struct
 import time
+import weakref
 import pycreate2.sensors as sensors
-from typing import Sequence
+from typing import Callable, Sequence, TYPE_CHECKING
 from pycreate2.createSerial import SerialCommandInterface
-from pycreate2.OI import DriveDirection, Opcodes
+from pycreate2.stream import SensorStream
+from pycreate2.subscriptions import Subscription, SubscriptionManager
+from pycreate2.query import QueryPlan, compile_sensor_list, compile_sensor_group, optimize_query
+from pycreate2.instrumentation import Instrumentation, StatsCollector
+from pycreate2.OI import DriveDirection, Modes, Opcodes
 import pycreate2.logger  # just to set up logging
 import logging
 
+if TYPE_CHECKING:
+    from pycreate2.create2async import AsyncCreate2
+    from pycreate2.history import SensorHistory
+    from pycreate2.recorder import Recorder
+
 logger = logging.getLogger("create2api")
 
+# seconds between Open Interface Mode polls while waiting for a mode change
+MODE_POLL_INTERVAL = 0.01
+# query reading the Open Interface Mode packet (35)
+MODE_PLAN = compile_sensor_list((sensors.SensorNames.OPEN_INTERFACE_MODE,))
+
+# robots not closed yet, shut down when the interpreter exits
+_open_bots: "weakref.WeakSet[Create2]" = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_bots():
+    for bot in list(_open_bots):
+        bot.close()
+
 
 class Create2(object):
     """
@@ -31,58 +56,185 @@ class Create2(object):
         else:
             self.SCI = SerialCommandInterface()
             startup_msg = self.SCI.open(port, baud)
-            if len(startup_msg) != 0:
-                # we just woke up, so we get lots of info.
-                startup_msg = startup_msg.split(b"\r\n")
-                self.manufacturing_date = startup_msg[3]
-                self.version = startup_msg[4]
-                logger.info(
-                    "Got a wakeup message. Version: {}, Manufacturing Date: {}".format(
-                        self.version, self.manufacturing_date
-                    )
-                )
+            self._handle_startup_msg(startup_msg)
 
         self.song_list = {}
+        # notes last uploaded to every song slot, what the robot has in memory
+        self.song_notes: dict[int, tuple[int, ...]] = {}
+        self.sensor_stream: SensorStream | None = None
+        self.subscriptions = SubscriptionManager(self)
+        # seconds from sending the last sensor query to having it decoded
+        self.last_query_latency = 0.0
+        # raw responses to queries sending its request are recorded here,
+        # see Recorder.for_query
+        self.query_recorder: "Recorder | None" = None
+        # last OI mode the robot reported or we switched it to, None if unknown
+        self.mode: Modes | None = None
+        # longest wait for the robot to confirm a mode change, in seconds
+        self.mode_timeout = 1.0
+        # longest time close() may take to shut the robot down, in seconds
+        self.shutdown_budget = 0.5
+        # last data written with LED, DIGIT_LED_ASCII and MOTORS, by opcode.
+        # Writes that wouldn't change anything are skipped, see _write_actuator
+        self._actuators: dict[int, tuple[int, ...]] = {}
+        self._closed = False
+        _open_bots.add(self)
 
     @classmethod
-    async def create(cls, port: str = "/dev/ttyUSB0", baud: int = 115200): ...
+    async def create(cls, port: str = "/dev/ttyUSB0", baud: int = 115200) -> "AsyncCreate2":
+        """
+        Opens a Create2 for use from asyncio, see AsyncCreate2.
 
-    def __del__(self):
-        """Destructor, cleans up when class goes out of scope"""
-        # stop motors
-        self.drive_stop()
-        time.sleep(self.sleep_timer)
+        :param port: the serial port to open, ie, '/dev/ttyUSB0'
+        :type port: str
+        :param baud: default is 115200, can be set to 19200 doing nefarious things
+        :type baud: int
+        """
+        from pycreate2.create2async import AsyncCreate2
+        return await AsyncCreate2.connect(port, baud)
+
+    def _handle_startup_msg(self, startup_msg: bytes):
+        if len(startup_msg) != 0:
+            # we just woke up, so we get lots of info.
+            lines = startup_msg.split(b"\r\n")
+            if len(lines) < 5:
+                logger.warning(f"Got a short wakeup message: {startup_msg}")
+                return
+            self.manufacturing_date = lines[3]
+            self.version = lines[4]
+            logger.info(
+                "Got a wakeup message. Version: {}, Manufacturing Date: {}".format(
+                    self.version, self.manufacturing_date
+                )
+            )
 
-        # turn off LEDs
-        self.led()
-        self.digit_led_ascii("    ")
-        time.sleep(0.1)
+    def __enter__(self) -> "Create2":
+        return self
 
-        # close it down
-        # self.power()
-        # self.safe()  # this beeps every now and then, but doesn't seem to go off
-        time.sleep(0.1)
-        self.stop()  # power down, makes a low beep sound
-        time.sleep(0.1)
-        self.close()  # close serial port
-        time.sleep(0.1)
+    def __exit__(self, *exc):
+        self.close()
 
-    def close(self):
+    def close(self, shutdown: bool = True):
         """
-        Closes up serial ports and terminates connection to the Create2
+        Stops the robot and closes the serial port. Safe to call more than once.
+
+        The shutdown sequence (stop the stream, stop the wheels, LEDs and
+        display off, clear the songs, OFF mode) goes out in a single write and
+        the whole thing takes at most shutdown_budget seconds. Nothing sleeps.
+
+        :param shutdown: False only stops the sensor stream and closes the
+                         port, the robot is left as is
+        :type shutdown: bool
         """
+        if self._closed:
+            return
+        self._closed = True
+        _open_bots.discard(self)
+
+        if shutdown:
+            try:
+                self._shutdown(time.monotonic() + self.shutdown_budget)
+            except Exception as e:
+                logger.error(f"Shutdown sequence failed: {e}")
+        if self.sensor_stream is not None:
+            # the reader must not outlive the port
+            stream, self.sensor_stream = self.sensor_stream, None
+            try:
+                stream.stop(self.shutdown_budget)
+            except Exception as e:
+                logger.error(f"Stopping the sensor stream failed: {e}")
         self.SCI.close()
 
+    def _shutdown(self, deadline: float):
+        # a real port blocks on a full output buffer, don't let it overrun the budget
+        ser = self.SCI.ser
+        write_timeout = ser.write_timeout
+        ser.write_timeout = max(0.01, deadline - time.monotonic())
+        try:
+            self.invalidate_actuators()
+            with self.batch():
+                if self.sensor_stream is not None:
+                    self.sensor_stream.stop(max(0.0, deadline - time.monotonic()))
+                    self.sensor_stream = None
+                self.drive_direct(0, 0)
+                self.led()
+                self.digit_led_ascii("    ")
+                self._write_clear_songs()
+                self.SCI.write(Opcodes.STOP.value)
+            self.mode = Modes.OFF
+        finally:
+            ser.write_timeout = write_timeout
+
+    def batch(self):
+        """
+        Sends every command issued inside the with block in a single write,
+        in the same order, when the block exits:
+
+            with bot.batch():
+                bot.drive_direct(0, 0)
+                bot.led()
+                bot.digit_led_ascii("    ")
+
+        Sensor queries inside a batch send what is queued before asking.
+        """
+        return self.SCI.batch()
+
+    def instrument(self, instrumentation: Instrumentation | None = None) -> Instrumentation:
+        """
+        Installs hooks on the serial and query hot paths. With no argument a
+        StatsCollector is installed, read it back with stats().
+
+        :param instrumentation: the hooks to call, see pycreate2.instrumentation
+        :type instrumentation: Instrumentation | None
+        :return: the installed instrumentation
+        :rtype: Instrumentation
+        """
+        if instrumentation is None:
+            instrumentation = StatsCollector()
+        self.SCI.instrumentation = instrumentation
+        return instrumentation
+
+    def uninstrument(self):
+        """
+        Removes the installed hooks, the hot paths go back to doing nothing extra.
+        """
+        self.SCI.instrumentation = None
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of what the installed instrumentation collected,
+        plus the stream parser counters when a stream is running. Empty if
+        instrument() was never called and no stream is running.
+
+        :rtype: dict
+        """
+        snapshot = {}
+        if self.SCI.instrumentation is not None:
+            snapshot = self.SCI.instrumentation.snapshot()
+        if self.sensor_stream is not None:
+            parser = self.sensor_stream.parser
+            snapshot["stream"] = {
+                "frames": parser.frames,
+                "checksum_errors": parser.checksum_errors,
+                "format_errors": parser.format_errors,
+                "discarded_bytes": parser.discarded_bytes,
+            }
+        return snapshot
+
     # ------------------- Mode Control ------------------------
 
-    def start(self):
+    def start(self, force: bool = False):
         """
         Puts the Create 2 into Passive mode. You must always send the Start command
         before sending any other commands to the OI.
+
+        Returns as soon as the robot reports Passive mode, see _change_mode.
+
+        :param force: send the command even if the robot is already in Passive mode
+        :type force: bool
         """
         # self.SCI.open()
-        self.SCI.write(Opcodes.START.value)
-        time.sleep(self.sleep_timer)
+        self._change_mode(Opcodes.START, Modes.PASSIVE, force=force)
 
     # def getMode(self):
     #     """
@@ -125,6 +277,8 @@ class Create2(object):
         """
         self.clearSongMemory()
         self.SCI.write(Opcodes.RESET.value)
+        self.mode = Modes.OFF
+        self.invalidate_actuators()
         time.sleep(1)
 
         ret = b""
@@ -139,28 +293,37 @@ class Create2(object):
         Puts the Create 2 into OFF mode. All streams will stop and the robot will no
         longer respond to commands. Use this command when you are finished
         working with the robot.
+
+        The robot stops answering queries once it is off, so the change is not
+        confirmed and nothing waits for it.
         """
-        self.clearSongMemory()
-        self.SCI.write(Opcodes.STOP.value)
-        time.sleep(self.sleep_timer)
+        with self.batch():
+            self._write_clear_songs()
+            self.SCI.write(Opcodes.STOP.value)
+        self.mode = Modes.OFF
+        self.invalidate_actuators()
 
-    def safe(self):
+    def safe(self, force: bool = False):
         """
-        Puts the Create 2 into safe mode. Blocks for a short (<.5 sec) amount
-        of time so the bot has time to change modes.
+        Puts the Create 2 into safe mode. Returns as soon as the robot reports
+        the new mode, see _change_mode. Does nothing if it is already in safe
+        mode.
+
+        :param force: send the command even if the robot is already in safe mode
+        :type force: bool
         """
-        self.SCI.write(Opcodes.SAFE.value)
-        time.sleep(self.sleep_timer)
-        self.clearSongMemory()
+        self._change_mode(Opcodes.SAFE, Modes.SAFE, clear_songs=True, force=force)
 
-    def full(self):
+    def full(self, force: bool = False):
         """
-        Puts the Create 2 into full mode. Blocks for a short (<.5 sec) amount
-        of time so the bot has time to change modes.
+        Puts the Create 2 into full mode. Returns as soon as the robot reports
+        the new mode, see _change_mode. Does nothing if it is already in full
+        mode.
+
+        :param force: send the command even if the robot is already in full mode
+        :type force: bool
         """
-        self.SCI.write(Opcodes.FULL.value)
-        time.sleep(self.sleep_timer)
-        self.clearSongMemory()
+        self._change_mode(Opcodes.FULL, Modes.FULL, clear_songs=True, force=force)
 
     # def seek_dock(self):
     #     self.SCI.write(OPCODES.SEEK_DOCK)
@@ -169,9 +332,79 @@ class Create2(object):
         """
         Puts the Create 2 into Passive mode. The OI can be in Safe, or
         Full mode to accept this command.
+
+        The robot powers down right after, so the change is not confirmed.
         """
-        self.SCI.write(Opcodes.POWER.value)
-        time.sleep(self.sleep_timer)
+        self.SCI.write(Opcodes.POWER.value, flush=True)
+        self.mode = Modes.PASSIVE
+        self.invalidate_actuators()
+
+    def get_mode(self) -> Modes:
+        """
+        Asks the robot for its OI mode (packet 35).
+
+        :return: the current mode, also kept in self.mode
+        :rtype: Modes
+        """
+        data = self.get_sensor_list((sensors.SensorNames.OPEN_INTERFACE_MODE,))
+        return Modes(data[sensors.SensorNames.OPEN_INTERFACE_MODE])
+
+    def _change_mode(self, opcode: Opcodes, target: Modes, clear_songs: bool = False, force: bool = False) -> bool:
+        """
+        Sends a mode command, then polls the Open Interface Mode packet until
+        the robot reports the new mode. The command is skipped when we think
+        the robot is in that mode already and a fresh reading agrees: it drops
+        from Safe to Passive on its own (cliff, wheel drop, charger), so the
+        mode we last saw can't be trusted. While a stream is running the robot
+        can't be polled, the command is always sent and we fall back to
+        waiting sleep_timer.
+
+        :return: False if the transition was skipped
+        :raises Exception: if the robot is not in the new mode after mode_timeout
+        """
+        streaming = self.sensor_stream is not None and self.sensor_stream.running
+        if self.mode == target and not force and not streaming:
+            try:
+                self._query_sensors_common(MODE_PLAN, retries=1)
+            except Exception:
+                self.mode = None
+            if self.mode == target:
+                return False
+
+        self.invalidate_actuators()
+        with self.batch():
+            self.SCI.write(opcode.value)
+            if clear_songs:
+                self._write_clear_songs()
+
+        if streaming:
+            time.sleep(self.sleep_timer)
+            self.mode = target
+        else:
+            self.wait_for_mode(target)
+        return True
+
+    def wait_for_mode(self, target: Modes, timeout: float | None = None):
+        """
+        Polls the Open Interface Mode packet until the robot reports 'target'.
+
+        :param target: the mode to wait for
+        :type target: Modes
+        :param timeout: seconds to wait, defaults to mode_timeout
+        :type timeout: float | None
+        :raises Exception: if the robot is not in 'target' mode in time
+        """
+        deadline = time.monotonic() + (self.mode_timeout if timeout is None else timeout)
+        while True:
+            try:
+                self._query_sensors_common(MODE_PLAN, retries=1)
+            except Exception:
+                self.mode = None
+            if self.mode == target:
+                return
+            if time.monotonic() >= deadline:
+                raise Exception(f"Create2 did not switch to {target.name} mode")
+            time.sleep(MODE_POLL_INTERVAL)
 
     # ------------------ Drive Commands ------------------
 
@@ -234,7 +467,7 @@ class Create2(object):
         All leds other than power are on/off.
         """
         data = (led_bits, power_color, power_intensity)
-        self.SCI.write(Opcodes.LED.value, data)
+        self._write_actuator(Opcodes.LED, data)
 
     def digit_led_ascii(self, display_string):
         """
@@ -258,16 +491,40 @@ class Create2(object):
                 # Char was not available. Just print a blank space
                 display_list[i] = 32
 
-        self.SCI.write(Opcodes.DIGIT_LED_ASCII.value, tuple(display_list))
+        self._write_actuator(Opcodes.DIGIT_LED_ASCII, tuple(display_list))
+
+    def _write_actuator(self, opcode: Opcodes, data: tuple[int, ...]):
+        """
+        Writes a command that sets actuator state (LEDs, display, cleaning
+        motors), unless the robot already got the exact same one. UI loops
+        refresh these all the time and at 19200 baud the repeats delay the
+        drive commands.
+        """
+        if self._actuators.get(opcode.value) == data:
+            return
+        self.SCI.write(opcode.value, data)
+        self._actuators[opcode.value] = data
+
+    def invalidate_actuators(self):
+        """
+        Forgets the LED, display and motor state we think the robot has, so
+        the next command of each kind is written again. Mode changes and
+        resets do this, call it if the robot may have changed them on its own.
+        """
+        self._actuators.clear()
 
     # ------------------------ Songs ----------------------------
 
     def clearSongMemory(self):
+        with self.batch():
+            self._write_clear_songs()
+        time.sleep(0.1)
+
+    def _write_clear_songs(self):
         for sn in range(4):
             song = [70, 0]
             self.createSong(sn, song)
             self.playSong(sn)
-        time.sleep(0.1)
 
     def createSong(self, song_num, notes):
         """
@@ -301,6 +558,7 @@ class Create2(object):
         self.SCI.write(Opcodes.SONG.value, msg)
 
         self.song_list[song_num] = dt
+        self.song_notes[song_num] = notes
 
         return dt
 
@@ -351,7 +609,7 @@ class Create2(object):
         if invert_main:
             bits |= 0b00010000
 
-        self.SCI.write(Opcodes.MOTORS.value, (bits,))
+        self._write_actuator(Opcodes.MOTORS, (bits,))
 
     def stop_cleaning(self):
         """
@@ -361,10 +619,17 @@ class Create2(object):
 
     # ------------------------ Sensors ----------------------------
 
-    def _query_sensors_common(self, op: Opcodes, write_msg: tuple[int, ...], packet_list: list[sensors.Sensor], retries: int = 3) -> dict[str, int]:
-        # Calculate total bytes to read
-        total_bytes = sum(pkt.size for pkt in packet_list)
-        logger.debug(f"Expecting {total_bytes} bytes of sensor data")
+    def _record_query(self, plan: QueryPlan, data: bytes):
+        recorder = self.query_recorder
+        if recorder is not None and recorder.request == plan.request:
+            recorder.record(data)
+
+    def _query_sensors_common(self, plan: QueryPlan, retries: int = 3) -> dict[str, int]:
+        if self.sensor_stream is not None and self.sensor_stream.running:
+            raise Exception("Cannot query sensors while a sensor stream is running")
+
+        total_bytes = plan.size
+        inst = self.SCI.instrumentation
 
         for retry in range(retries):
             try:
@@ -372,29 +637,32 @@ class Create2(object):
                 on_queue = self.SCI.waiting()
                 if on_queue > 0:
                     logger.warning(
-                        f"Serial queue not empty before sending {op.name}: {on_queue} bytes. Flushing."
+                        f"Serial queue not empty before sending {plan.opcode.name}: {on_queue} bytes. Flushing."
                     )
                     self.SCI.flush_input()
 
-                # Write the request
-                self.SCI.write(op.value, write_msg, True)
-                time.sleep(0.015)  # wait 15 msec
-
-                # Read the data
+                # Write the request and read the data as soon as it comes back
+                start = time.monotonic()
+                self.SCI.write_raw(plan.request, True)
                 read_data = self.SCI.read(total_bytes)
                 if len(read_data) != total_bytes:
                     raise Exception(
                         f"Expected {total_bytes} bytes, got {len(read_data)} bytes"
                     )
+                self._record_query(plan, read_data)
 
                 # Decode the data
-                sensor_data: dict[str, int] = {}
-                index = 0
-                for pkt in packet_list:
-                    raw_bytes = read_data[index: index + pkt.size]
-                    sensor_data[pkt.name] = pkt.unpack(raw_bytes)
-                    index += pkt.size
-
+                if inst is None:
+                    sensor_data = plan.decode(read_data)
+                else:
+                    decode_start = time.perf_counter()
+                    sensor_data = plan.decode(read_data)
+                    inst.on_decode(plan.size, time.perf_counter() - decode_start)
+
+                self.last_query_latency = time.monotonic() - start
+                if inst is not None:
+                    inst.on_query(plan.opcode.value, self.last_query_latency)
+                self._track_mode(sensor_data)
                 return sensor_data
 
             except Exception as e:
@@ -404,42 +672,53 @@ class Create2(object):
                 self.SCI.flush_input()
                 if retry == retries - 1:
                     raise e
+                if inst is not None:
+                    inst.on_retry(plan.opcode.value)
 
         raise Exception("Unreachable code reached in _query_sensors_common")
 
+    def _track_mode(self, sensor_data: dict[str, int]):
+        # any query that includes packet 35 tells us the mode for free
+        value = sensor_data.get(sensors.SensorNames.OPEN_INTERFACE_MODE)
+        if value is not None:
+            mode = Modes(value)
+            if mode != self.mode:
+                # the robot switches modes on its own too (safe -> passive on
+                # a cliff), it may have reset the actuators when it did
+                self.invalidate_actuators()
+            self.mode = mode
+
     def get_sensor_list(self, sensor_list: Sequence[str | int]) -> dict[str, int]:
         """
-        Request a list of sensor packets by name or id.
+        Request a list of sensor packets by name or id. The request is compiled
+        once per distinct list and cached, passing a tuple avoids a copy.
 
         :param sensor_list: list of sensor names (str) or ids (int)
         :type sensor_list: Sequence[str | int]
         :return: dictionary of sensor name to value
         :rtype: dict[str, int]
         """
-        # Convert the names to packet ids
-        packet_list: list[sensors.Sensor] = []
-
-        for s in sensor_list:
-            if isinstance(s, str):
-                pkt = sensors.get_sensor_by_name(s)
-                assert pkt is not None, f"Sensor name '{s}' not found"
-                packet_list.append(pkt)
-            elif isinstance(s, int):
-                pkt = sensors.get_sensor_by_id(s)
-                assert pkt is not None, f"Sensor id '{s}' not found"
-                packet_list.append(pkt)
-            else:
-                raise Exception(
-                    f"Sensor list must contain strings or integers, got {type(s)}"
-                )
+        plan = compile_sensor_list(tuple(sensor_list))
+        return self._query_sensors_common(plan)
 
-        logger.debug(
-            f"Requesting sensors: {', '.join(f"'{pkt.name}' ({pkt.size} bytes)" for pkt in packet_list)}")
+    def get_sensors(self, sensor_list: Sequence[str | int], max_time: float | None = None) -> dict[str, int]:
+        """
+        Reads a set of sensors with the fewest bytes on the wire, mixing
+        whole groups and lists as optimize_query decides.
 
-        # Request the packets
-        msg = [len(packet_list)] + [pkt.id for pkt in packet_list]
-        op = Opcodes.QUERY_LIST
-        return self._query_sensors_common(op, tuple(msg), packet_list)
+        :param sensor_list: sensor names (str) or ids (int)
+        :type sensor_list: Sequence[str | int]
+        :param max_time: longest a single request may take, in seconds, see
+                         optimize_query
+        :type max_time: float | None
+        :return: dictionary of sensor name to value, only the sensors asked for
+        :rtype: dict[str, int]
+        """
+        query = optimize_query(tuple(sensor_list), self.SCI.ser.baudrate, max_time)
+        data: dict[str, int] = {}
+        for plan in query.plans:
+            data.update(self._query_sensors_common(plan))
+        return {name: data[name] for name in query.names}
 
     def get_sensor_group(self, group_id: int) -> dict[str, int]:
         """
@@ -450,11 +729,79 @@ class Create2(object):
         :return: dictionary of sensor name to value
         :rtype: dict[str, int]
         """
-        # Get all sensors belonging to the group and sort them by id in ascending order
-        sensor_list: list[sensors.Sensor] = sensors.get_sensor_block(group_id)
+        plan = compile_sensor_group(group_id)
+        return self._query_sensors_common(plan)
 
-        logger.debug(
-            f"Requesting sensor group {group_id} with sensors: {', '.join(f"'{pkt.name}' ({pkt.size} bytes)" for pkt in sensor_list)}")
+    # ------------------------ Streaming ----------------------------
 
-        # Request the packet group
-        return self._query_sensors_common(Opcodes.SENSORS, (group_id,), sensor_list)
+    def start_stream(self, sensor_list: Sequence[str | int], recorder: "Recorder | None" = None, history: "SensorHistory | None" = None) -> SensorStream:
+        """
+        Start streaming sensor packets in the background. The robot sends a new
+        frame every 15 ms, use get_stream_frame() to read the latest one.
+
+        Any stream that is already running is stopped first. Polling queries
+        (get_sensor_list, get_sensor_group) are not allowed while streaming.
+
+        :param sensor_list: sensor names (str), sensor ids or group ids (int)
+        :type sensor_list: Sequence[str | int]
+        :param recorder: records every raw frame, see Recorder.for_stream
+        :type recorder: Recorder | None
+        :param history: keeps the last frames, see SensorHistory.for_stream
+        :type history: SensorHistory | None
+        :return: the running stream
+        :rtype: SensorStream
+        """
+        self.stop_stream()
+        self.sensor_stream = SensorStream(self.SCI, sensor_list, recorder, history)
+        self.sensor_stream.start()
+        return self.sensor_stream
+
+    def stop_stream(self):
+        """
+        Stop the sensor stream, if one is running.
+        """
+        if self.sensor_stream is not None:
+            self.sensor_stream.stop()
+            self.sensor_stream = None
+
+    def get_stream_frame(self) -> dict[str, int] | None:
+        """
+        Return the latest decoded stream frame without blocking.
+
+        :return: dictionary of sensor name to value, None if no frame arrived yet
+        :rtype: dict[str, int] | None
+        """
+        if self.sensor_stream is None:
+            raise Exception("No sensor stream running, call start_stream() first")
+        return self.sensor_stream.latest()
+
+    def subscribe(self, sensor_list: Sequence[str | int], rate: float | None, callback: Callable[[dict[str, int]], None]) -> Subscription:
+        """
+        Calls 'callback' with the values of some sensors about 'rate' times a
+        second. All subscriptions share one stream holding the union of their
+        sensors, which is changed on the fly as they come and go:
+
+            bot.subscribe([SensorNames.BUMPS_WHEELDROPS], None, safety)  # every frame
+            ui = bot.subscribe([SensorNames.VOLTAGE, SensorNames.CURRENT], 5, show)
+            ...
+            ui.cancel()
+
+        The robot sends a frame every 15 ms, higher rates get every frame.
+        Callbacks run on the stream reader thread. See SubscriptionManager.
+
+        :param sensor_list: sensor names (str) or ids (int)
+        :type sensor_list: Sequence[str | int]
+        :param rate: deliveries per second, None for every frame
+        :type rate: float | None
+        :param callback: gets a dict of sensor name to value
+        :return: the subscription, cancel() it when done
+        :rtype: Subscription
+        """
+        return self.subscriptions.subscribe(sensor_list, rate, callback)
+
+    def unsubscribe(self, subscription: Subscription):
+        """
+        Stops a subscription, the stream drops the sensors nobody else wants
+        and stops with the last subscription.
+        """
+        self.subscriptions.unsubscribe(subscription)
@@ -0,0 +1,578 @@
+import asyncio
+import time
+import serial
+from typing import AsyncIterator, Sequence
+from pycreate2.create2api import MODE_PLAN, MODE_POLL_INTERVAL, Create2
+from pycreate2.createSerial import SerialCommandInterface
+from pycreate2.query import QueryPlan, compile_sensor_list, compile_sensor_group, optimize_query
+from pycreate2.stream import StreamParser, resolve_stream_packets
+from pycreate2.OI import Modes, Opcodes
+from pycreate2.sensors import SensorNames
+import pycreate2.logger  # just to set up logging
+import logging
+
+logger = logging.getLogger("create2async")
+
+
+class _LoopCommands(SerialCommandInterface):
+    """
+    The writes of AsyncSerialInterface. The flush flag is ignored, draining
+    the port would block the event loop.
+    """
+
+    def _send(self, msg: bytes, flush: bool):
+        super()._send(msg, False)
+
+
+class AsyncSerialInterface(object):
+    """
+    Non-blocking counterpart of SerialCommandInterface. The serial port is put
+    in non-blocking mode and the event loop calls us back whenever its file
+    descriptor is readable, so nothing ever waits on the port.
+
+    Writes are a few bytes long and go straight to the port through
+    'commands', a SerialCommandInterface sharing the port (batching included),
+    so Create2 commands work unchanged. Reading only happens here.
+    """
+
+    def __init__(self, ser: serial.Serial | None = None):
+        """
+        Constructor.
+
+        :param ser: an already configured serial port, mainly for testing. If
+                    None, one is created and opened by open().
+        """
+        self.commands: SerialCommandInterface = _LoopCommands()
+        if ser is not None:
+            self.commands.ser = ser
+        # seconds the last read() took to get its data
+        self.last_read_latency = 0.0
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._buffer = bytearray()
+        self._data_ready: asyncio.Event | None = None
+        self._error: Exception | None = None
+
+        # stream mode: frames go to the parser instead of the buffer
+        self.parser: StreamParser | None = None
+        self._subscribers: list[asyncio.Queue] = []
+
+    @property
+    def ser(self) -> serial.Serial:
+        """The serial port, shared with 'commands'."""
+        return self.commands.ser
+
+    @property
+    def instrumentation(self):
+        """Hot path hooks of 'commands', see pycreate2.instrumentation."""
+        return self.commands.instrumentation
+
+    def write(self, opcode: int, data: tuple | None = None):
+        """
+        Writes a command to the create, see SerialCommandInterface.write.
+        """
+        self.commands.write(opcode, data)
+
+    def write_raw(self, msg: bytes):
+        """
+        Writes an already encoded command, see SerialCommandInterface.write_raw.
+        """
+        self.commands.write_raw(msg)
+
+    def batch(self):
+        """
+        Sends every command written inside the with block in a single write,
+        see SerialCommandInterface.batch.
+        """
+        return self.commands.batch()
+
+    async def open(self, port: str, baud: int = 115200, startup_timeout: float = 1.0, startup_idle: float = 0.1) -> bytes:
+        """
+        Opens the serial port and starts watching it from the running loop.
+
+        Anything the robot sends right after opening is its startup message.
+        It is collected until the line has been quiet for startup_idle seconds
+        or startup_timeout has passed, without blocking the loop.
+
+        :param port: the serial port to open, ie, '/dev/ttyUSB0'
+        :param baud: default is 115200, can be set to 19200 doing nefarious things
+        :param startup_timeout: longest time to collect the startup message
+        :param startup_idle: quiet time that ends the startup message
+        :return: the startup message, if any
+        """
+        assert baud in [115200, 19200], "baudrate must be 115200 or 19200"
+        self.ser.port = port
+        self.ser.baudrate = baud
+        self.ser.timeout = 0
+
+        if self.ser.is_open:
+            self.ser.close()
+        self.ser.open()
+        if not self.ser.is_open:
+            raise Exception("Failed to open {} at {}".format(port, baud))
+        logger.info("Create opened serial: {}".format(self.ser))
+
+        self.attach()
+
+        deadline = time.monotonic() + startup_timeout
+        size = -1
+        while size != len(self._buffer) and time.monotonic() < deadline:
+            size = len(self._buffer)
+            await asyncio.sleep(min(startup_idle, max(0.0, deadline - time.monotonic())))
+
+        startup_msg = bytes(self._buffer)
+        self._buffer.clear()
+        return startup_msg
+
+    def attach(self):
+        """
+        Starts watching an already opened port from the running event loop.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._data_ready = asyncio.Event()
+        self._loop.add_reader(self.ser.fileno(), self._on_readable)
+
+    def _on_readable(self):
+        try:
+            data = self.ser.read(self.ser.in_waiting or 1)
+        except Exception as e:
+            logger.error(f"Serial port failed: {e}")
+            self._error = e
+            self.detach()
+            assert self._data_ready is not None
+            self._data_ready.set()
+            return
+
+        if not data:
+            return
+        if self.parser is not None:
+            for frame in self.parser.feed(data):
+                for queue in self._subscribers:
+                    if queue.full():
+                        queue.get_nowait()  # drop the oldest, fresh data matters more
+                    queue.put_nowait(frame)
+        else:
+            self._buffer += data
+            assert self._data_ready is not None
+            self._data_ready.set()
+
+    def detach(self):
+        """
+        Stops watching the port, it is left open.
+        """
+        if self._loop is not None:
+            try:
+                self._loop.remove_reader(self.ser.fileno())
+            except Exception:
+                pass
+            self._loop = None
+
+    def waiting(self) -> int:
+        """
+        Returns the number of bytes received but not read yet.
+        """
+        return len(self._buffer)
+
+    def flush_input(self):
+        """
+        Drops every byte received but not read yet.
+        """
+        logger.info("Flushing input buffer")
+        if self.instrumentation is not None:
+            self.instrumentation.on_flush()
+        self._buffer.clear()
+        self.ser.reset_input_buffer()
+
+    async def _wait_for(self, ready, deadline: float):
+        assert self._data_ready is not None, "You must open the serial port first"
+        while not ready():
+            if self._error is not None:
+                raise self._error
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._data_ready.clear()
+            try:
+                await asyncio.wait_for(self._data_ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                return
+
+    async def read(self, num_bytes: int, timeout: float | None = None) -> bytes:
+        """
+        Waits for 'num_bytes' bytes from the robot, returns as soon as they are
+        in or raises once the deadline has passed.
+
+        :param num_bytes: number of bytes to read from the robot
+        :param timeout: seconds to wait, defaults to response_timeout(num_bytes)
+        """
+        self.commands.send_batch()
+
+        start = time.monotonic()
+        if timeout is None:
+            timeout = self.commands.response_timeout(num_bytes)
+
+        def ready():
+            return len(SerialCommandInterface.filter_begin(bytes(self._buffer))) >= num_bytes
+
+        await self._wait_for(ready, start + timeout)
+
+        data = SerialCommandInterface.filter_begin(bytes(self._buffer))
+        self._buffer.clear()
+        self.last_read_latency = time.monotonic() - start
+        if self.instrumentation is not None:
+            self.instrumentation.on_read(len(data), self.last_read_latency)
+        if len(data) != num_bytes:
+            logger.error(
+                f"Expected {num_bytes} bytes but got {len(data)} bytes after filtering"
+            )
+            raise Exception("Did not receive expected number of bytes from Create2")
+        return data
+
+    async def read_until(self, delim: bytes = b"\n\r", timeout: float = 1.0) -> bytes:
+        """
+        Waits until the delimiter shows up and returns everything up to and
+        including it, or whatever arrived before the timeout.
+        """
+        await self._wait_for(lambda: delim in self._buffer, time.monotonic() + timeout)
+        end = self._buffer.find(delim)
+        end = len(self._buffer) if end < 0 else end + len(delim)
+        data = bytes(self._buffer[:end])
+        del self._buffer[:end]
+        return data
+
+    def subscribe(self, maxsize: int = 16) -> asyncio.Queue:
+        """
+        Switches the transport to stream mode and returns a queue that gets
+        every decoded frame. When the queue is full the oldest frame is dropped.
+        """
+        if self.parser is None:
+            self.parser = StreamParser()
+        queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        """
+        Stops delivering frames to a queue, leaves stream mode with the last one.
+        """
+        self._subscribers.remove(queue)
+        if not self._subscribers:
+            self.parser = None
+
+    def close(self):
+        """
+        Stops watching the port and closes it.
+        """
+        self.detach()
+        self.commands.close()
+
+
+class AsyncCreate2(object):
+    """
+    asyncio version of Create2. It drives a Create2 ('bot') writing through
+    the 'commands' of its AsyncSerialInterface: the commands that only write (drive, LEDs, songs,
+    motors, see WRITES) are the Create2 ones, called as they are, since
+    writing a few bytes never blocks. Everything that sleeps or reads is a
+    coroutine here. The Create2 methods that would block the loop or need a
+    reader thread (start_stream, subscribe, ...) are left out, use stream().
+
+    Settings (sleep_timer, mode_timeout, shutdown_budget, query_recorder)
+    are the ones of 'bot'.
+
+    Use Create2.create() or AsyncCreate2.connect() to get one.
+    """
+
+    # Create2 methods that only write, available unchanged
+    WRITES = frozenset({
+        "batch", "instrument", "uninstrument", "stats", "limit",
+        "drive_radius", "drive_direct", "drive_pwm",
+        "led", "digit_led_ascii", "invalidate_actuators",
+        "createSong", "playSong", "brush_motors", "stop_cleaning",
+    })
+
+    def __init__(self, sci: AsyncSerialInterface):
+        """
+        Constructor.
+
+        :param sci: an opened AsyncSerialInterface
+        :type sci: AsyncSerialInterface
+        """
+        self.SCI = sci
+        self.bot = Create2(sci=sci.commands)
+        self._query_lock = asyncio.Lock()
+        self._stream_packets: tuple[int, ...] | None = None
+
+    def __getattr__(self, name: str):
+        # bot.drive_direct(...) is bot.bot.drive_direct(...)
+        if name in AsyncCreate2.WRITES:
+            return getattr(self.bot, name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    @classmethod
+    async def connect(cls, port: str = "/dev/ttyUSB0", baud: int = 115200) -> "AsyncCreate2":
+        """
+        Opens the serial port without blocking the event loop.
+
+        :param port: the serial port to open, ie, '/dev/ttyUSB0'
+        :type port: str
+        :param baud: default is 115200, can be set to 19200 doing nefarious things
+        :type baud: int
+        """
+        sci = AsyncSerialInterface()
+        startup_msg = await sci.open(port, baud)
+        bot = cls(sci)
+        bot.bot._handle_startup_msg(startup_msg)
+        return bot
+
+    async def __aenter__(self) -> "AsyncCreate2":
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    @property
+    def mode(self) -> Modes | None:
+        """Last OI mode the robot reported or we switched it to, None if unknown."""
+        return self.bot.mode
+
+    @property
+    def last_query_latency(self) -> float:
+        """Seconds from sending the last sensor query to having it decoded."""
+        return self.bot.last_query_latency
+
+    def close(self, shutdown: bool = True):
+        """
+        Stops the robot and closes the serial port, see Create2.close. The
+        shutdown sequence ends a running stream with the rest, without it the
+        stream is paused first.
+        """
+        if self._stream_packets is not None and not shutdown:
+            self.SCI.write(Opcodes.PAUSE_RESUME_STREAM.value, (0,))
+        self._stream_packets = None
+        # the loop must not watch a closed port
+        self.SCI.detach()
+        self.bot.close(shutdown)
+
+    # ------------------- Mode Control ------------------------
+
+    async def start(self, force: bool = False):
+        """
+        Puts the Create 2 into Passive mode, see Create2.start.
+        """
+        await self._change_mode(Opcodes.START, Modes.PASSIVE, force=force)
+
+    async def wake(self):
+        """
+        Wake up robot by toggling RTS/DTR, see Create2.wake.
+        """
+        self.SCI.ser.rts = True
+        self.SCI.ser.dtr = True
+        await asyncio.sleep(1)
+        self.SCI.ser.rts = False
+        self.SCI.ser.dtr = False
+        await asyncio.sleep(1)
+        self.SCI.ser.rts = True
+        self.SCI.ser.dtr = True
+        await asyncio.sleep(1)
+
+    async def reset(self):
+        """
+        Resets the robot and returns what it printed, see Create2.reset.
+        """
+        await self.clearSongMemory()
+        self.SCI.write(Opcodes.RESET.value)
+        self.bot.mode = Modes.OFF
+        self.bot.invalidate_actuators()
+        await asyncio.sleep(1)
+
+        ret = b""
+        for _ in range(7):
+            ret += await self.SCI.read_until(b"\r\n")
+        return ret
+
+    async def stop(self):
+        """
+        Puts the Create 2 into OFF mode, see Create2.stop.
+        """
+        self.bot.stop()
+
+    async def safe(self, force: bool = False):
+        """
+        Puts the Create 2 into safe mode, see Create2.safe.
+        """
+        await self._change_mode(Opcodes.SAFE, Modes.SAFE, clear_songs=True, force=force)
+
+    async def full(self, force: bool = False):
+        """
+        Puts the Create 2 into full mode, see Create2.full.
+        """
+        await self._change_mode(Opcodes.FULL, Modes.FULL, clear_songs=True, force=force)
+
+    async def power(self):
+        """
+        Puts the Create 2 into Passive mode, see Create2.power.
+        """
+        self.bot.power()
+
+    async def get_mode(self) -> Modes:
+        """
+        Asks the robot for its OI mode, see Create2.get_mode.
+        """
+        data = await self.get_sensor_list((SensorNames.OPEN_INTERFACE_MODE,))
+        return Modes(data[SensorNames.OPEN_INTERFACE_MODE])
+
+    async def _change_mode(self, opcode: Opcodes, target: Modes, clear_songs: bool = False, force: bool = False) -> bool:
+        streaming = self._stream_packets is not None
+        if self.bot.mode == target and not force and not streaming:
+            try:
+                await self._query_sensors_common(MODE_PLAN, retries=1)
+            except Exception:
+                self.bot.mode = None
+            if self.bot.mode == target:
+                return False
+
+        self.bot.invalidate_actuators()
+        with self.bot.batch():
+            self.SCI.write(opcode.value)
+            if clear_songs:
+                self.bot._write_clear_songs()
+
+        if streaming:
+            await asyncio.sleep(self.bot.sleep_timer)
+            self.bot.mode = target
+        else:
+            await self.wait_for_mode(target)
+        return True
+
+    async def wait_for_mode(self, target: Modes, timeout: float | None = None):
+        """
+        Polls the Open Interface Mode packet until the robot reports 'target',
+        see Create2.wait_for_mode.
+        """
+        deadline = time.monotonic() + (self.bot.mode_timeout if timeout is None else timeout)
+        while True:
+            try:
+                await self._query_sensors_common(MODE_PLAN, retries=1)
+            except Exception:
+                self.bot.mode = None
+            if self.bot.mode == target:
+                return
+            if time.monotonic() >= deadline:
+                raise Exception(f"Create2 did not switch to {target.name} mode")
+            await asyncio.sleep(MODE_POLL_INTERVAL)
+
+    # ------------------ Drive Commands ------------------
+
+    async def drive_stop(self):
+        self.bot.drive_direct(0, 0)
+        # wait just a little for the robot to stop
+        await asyncio.sleep(self.bot.sleep_timer)
+
+    # ------------------------ Songs ----------------------------
+
+    async def clearSongMemory(self):
+        with self.bot.batch():
+            self.bot._write_clear_songs()
+        await asyncio.sleep(0.1)
+
+    # ------------------------ Sensors ----------------------------
+
+    async def _query_sensors_common(self, plan: QueryPlan, retries: int = 3) -> dict[str, int]:
+        if self._stream_packets is not None:
+            raise Exception("Cannot query sensors while a sensor stream is running")
+
+        inst = self.SCI.instrumentation
+        async with self._query_lock:
+            for retry in range(retries):
+                try:
+                    on_queue = self.SCI.waiting()
+                    if on_queue > 0:
+                        logger.warning(
+                            f"Serial queue not empty before sending {plan.opcode.name}: {on_queue} bytes. Flushing."
+                        )
+                        self.SCI.flush_input()
+
+                    start = time.monotonic()
+                    self.SCI.write_raw(plan.request)
+                    read_data = await self.SCI.read(plan.size)
+                    self.bot._record_query(plan, read_data)
+                    # Decode the data
+                    if inst is None:
+                        sensor_data = plan.decode(read_data)
+                    else:
+                        decode_start = time.perf_counter()
+                        sensor_data = plan.decode(read_data)
+                        inst.on_decode(plan.size, time.perf_counter() - decode_start)
+
+                    self.bot.last_query_latency = time.monotonic() - start
+                    if inst is not None:
+                        inst.on_query(plan.opcode.value, self.bot.last_query_latency)
+                    self.bot._track_mode(sensor_data)
+                    return sensor_data
+
+                except Exception as e:
+                    logger.error(
+                        f"Error reading sensors on attempt {retry + 1}/{retries}: {e}"
+                    )
+                    self.SCI.flush_input()
+                    if retry == retries - 1:
+                        raise e
+                    if inst is not None:
+                        inst.on_retry(plan.opcode.value)
+
+        raise Exception("Unreachable code reached in _query_sensors_common")
+
+    async def get_sensor_list(self, sensor_list: Sequence[str | int]) -> dict[str, int]:
+        """
+        Request a list of sensor packets by name or id, see Create2.get_sensor_list.
+        """
+        plan = compile_sensor_list(tuple(sensor_list))
+        return await self._query_sensors_common(plan)
+
+    async def get_sensors(self, sensor_list: Sequence[str | int], max_time: float | None = None) -> dict[str, int]:
+        """
+        Reads a set of sensors with the fewest bytes on the wire, see
+        Create2.get_sensors.
+        """
+        query = optimize_query(tuple(sensor_list), self.SCI.ser.baudrate, max_time)
+        data: dict[str, int] = {}
+        for plan in query.plans:
+            data.update(await self._query_sensors_common(plan))
+        return {name: data[name] for name in query.names}
+
+    async def get_sensor_group(self, group_id: int) -> dict[str, int]:
+        """
+        Request a whole sensor group by its id, see Create2.get_sensor_group.
+        """
+        plan = compile_sensor_group(group_id)
+        return await self._query_sensors_common(plan)
+
+    # ------------------------ Streaming ----------------------------
+
+    async def stream(self, sensor_list: Sequence[str | int], maxsize: int = 16) -> AsyncIterator[dict[str, int]]:
+        """
+        Streams sensor frames, every 15 ms. Several consumers can iterate the
+        same stream at once, the robot is paused when the last one stops.
+
+            async for frame in bot.stream([SensorNames.ENCODER_COUNTS_LEFT]):
+                ...
+
+        :param sensor_list: sensor names (str), sensor ids or group ids (int)
+        :param maxsize: frames kept per consumer before the oldest is dropped
+        """
+        packets = tuple(resolve_stream_packets(sensor_list).keys())
+        if self._stream_packets is not None and self._stream_packets != packets:
+            raise Exception("A stream with a different sensor list is already running")
+
+        queue = self.SCI.subscribe(maxsize)
+        if self._stream_packets is None:
+            self.SCI.write(Opcodes.STREAM.value, (len(packets),) + packets)
+            self._stream_packets = packets
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.SCI.unsubscribe(queue)
+            if self.SCI.parser is None:
+                self.SCI.write(Opcodes.PAUSE_RESUME_STREAM.value, (0,))
+                self._stream_packets = None
@@ -1,8 +1,9 @@
 import serial
 import pycreate2.logger  # just to set up logging
 import logging
-import struct
 import time
+from contextlib import contextmanager
+from pycreate2.instrumentation import Instrumentation
 
 logger = logging.getLogger("create2serial")
 
@@ -29,14 +30,23 @@ class SerialCommandInterface(object):
             rtscts=False,
             dsrdtr=False,
         )
+        # extra time allowed on top of the wire time for a response to arrive
+        self.read_margin = 0.25
+        # seconds the last read() took to get its data
+        self.last_read_latency = 0.0
+        # commands queued by batch()
+        self._batch: bytearray | None = None
+        # hot path hooks, see pycreate2.instrumentation
+        self.instrumentation: Instrumentation | None = None
 
     def __del__(self):
         """
         Destructor.
 
-        Closes the serial port
+        Closes the serial port if it is still open
         """
-        self.close()
+        if self.ser.is_open:
+            self.close()
 
     def open(self, port: str, baud: int = 115200, timeout: int = 1) -> bytes:
         """
@@ -78,11 +88,67 @@ class SerialCommandInterface(object):
         :type data: tuple | None
         """
         msg = (opcode,) + data if data else (opcode,)
-        self.ser.write(struct.pack("B" * len(msg), *msg))
+        self.write_raw(bytes(msg), flush)
+
+    def write_raw(self, msg: bytes, flush: bool = False):
+        """
+        Writes an already encoded command, opcode included, to the create.
+        Inside a batch() the command is queued instead.
+
+        :param msg: the encoded command
+        :type msg: bytes
+        """
+        if self.instrumentation is not None:
+            self.instrumentation.on_command(msg[0], len(msg))
+        if self._batch is not None:
+            self._batch += msg
+            return
+        self._send(msg, flush)
+
+    def _send(self, msg: bytes, flush: bool):
+        if self.instrumentation is None:
+            self.ser.write(msg)
+            if flush:
+                self.ser.flush()
+            return
+
+        start = time.perf_counter()
+        self.ser.write(msg)
         if flush:
-            logger.debug("Flushing output buffer")
             self.ser.flush()
-        logger.debug("Wrote: {}".format(msg))
+        self.instrumentation.on_write(len(msg), time.perf_counter() - start)
+
+    @contextmanager
+    def batch(self):
+        """
+        Queues every command written inside the with block and sends them all
+        in a single write and flush when it exits, in the order they were
+        written. Batches can be nested, only the outermost one sends. Reading
+        from the robot sends whatever is queued first.
+
+            with sci.batch():
+                sci.write(...)
+                sci.write(...)
+        """
+        if self._batch is not None:
+            yield
+            return
+
+        self._batch = bytearray()
+        try:
+            yield
+        finally:
+            self.send_batch()
+            self._batch = None
+
+    def send_batch(self):
+        """
+        Sends the commands queued by batch() so far, the batch stays open.
+        """
+        if self._batch:
+            msg = bytes(self._batch)
+            self._batch.clear()
+            self._send(msg, True)
 
     def waiting(self) -> int:
         """
@@ -101,34 +167,83 @@ class SerialCommandInterface(object):
             raise Exception("You must open the serial port first")
 
         logger.info("Flushing input buffer")
+        if self.instrumentation is not None:
+            self.instrumentation.on_flush()
         self.ser.flush()
         self.ser.reset_output_buffer()
         self.ser.reset_input_buffer()
 
-    def read(self, num_bytes: int) -> bytes:
+    def response_timeout(self, num_bytes: int) -> float:
+        """
+        Returns how long a response of 'num_bytes' bytes may take to arrive: the
+        time it spends on the wire (10 bits per byte) plus read_margin for the
+        robot and the USB adapter to get it to us.
+
+        :param num_bytes: number of bytes expected from the robot
+        :type num_bytes: int
+        """
+        return num_bytes * 10 / self.ser.baudrate + self.read_margin
+
+    def read(self, num_bytes: int, timeout: float | None = None) -> bytes:
         """
-        Read a string of 'num_bytes' bytes from the robot.
+        Read a string of 'num_bytes' bytes from the robot. Returns as soon as
+        the bytes are in, or raises once the deadline has passed.
 
         :param num_bytes: number of bytes to read from the robot
         :type num_bytes: int
+        :param timeout: seconds to wait for the data, defaults to response_timeout(num_bytes)
+        :type timeout: float | None
         """
         if not self.ser.is_open:
             raise Exception("You must open the serial port first")
 
-        # Read
-        raw_data = self.ser.read(num_bytes)
+        # the request we are waiting on might still be queued
+        self.send_batch()
+
+        start = time.monotonic()
+        if timeout is None:
+            timeout = self.response_timeout(num_bytes)
+        deadline = start + timeout
+
+        # Read until we have enough bytes after filtering or run out of time.
+        # Setting the timeout is a syscall on a real port, it is only changed
+        # when it differs: once for the whole read, again only if a flash
+        # message got filtered out and we have to wait for more
+        raw_data = b""
+        filtered_data = b""
+        port_timeout = self.ser.timeout
+        if port_timeout != timeout:
+            self.ser.timeout = timeout
+        try:
+            while True:
+                raw_data += self.ser.read(num_bytes - len(filtered_data))
+                filtered_data = self.filter_begin(raw_data)
+                if len(filtered_data) >= num_bytes:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.ser.timeout = remaining
+        finally:
+            if self.ser.timeout != port_timeout:
+                self.ser.timeout = port_timeout
+
+        # Anything else already waiting means we are out of sync
         available_bytes = self.ser.in_waiting
         if available_bytes > 0:
             raw_data += self.ser.read(available_bytes)
+            filtered_data = self.filter_begin(raw_data)
+
+        self.last_read_latency = time.monotonic() - start
+        if self.instrumentation is not None:
+            self.instrumentation.on_read(len(filtered_data), self.last_read_latency)
 
-        filtered_data = self.filter_begin(raw_data)
         if len(filtered_data) != num_bytes:
             logger.error(
                 f"Expected {num_bytes} bytes but got {len(filtered_data)} bytes after filtering"
             )
             raise Exception("Did not receive expected number of bytes from Create2")
 
-        logger.debug(f"Final read output: {filtered_data}")
         return bytes(filtered_data)
 
     def read_until(self, delim: bytes = b"\n\r") -> bytes:
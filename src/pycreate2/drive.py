@@ -0,0 +1,185 @@
+import threading
+import time
+from typing import Callable
+from pycreate2.create2api import Create2
+import pycreate2.logger  # just to set up logging
+import logging
+
+logger = logging.getLogger("create2drive")
+
+
+class DriveController(object):
+    """
+    Sends wheel speeds to the robot at a fixed rate instead of on every call.
+    Any thread can set() a setpoint as often as it likes, only the latest one
+    is used. Every tick the wheel speeds move towards it, limited by
+    max_accel, and are written only if they changed, so the serial traffic
+    is bounded by the rate and drops to nothing when the setpoint holds.
+
+        with DriveController(bot, rate=50, max_accel=1000) as drive:
+            drive.set(200, 200)
+            ...
+
+    Ticks follow fixed deadlines (start + n / rate), a late tick does not
+    shift the following ones. Ticks missed by more than a period are skipped
+    and counted in 'overruns'.
+    """
+
+    def __init__(self, bot: Create2, rate: float = 50.0, max_accel: float | None = None, clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] | None = None):
+        """
+        Constructor.
+
+        :param bot: the robot to drive, in safe or full mode
+        :param rate: ticks per second
+        :param max_accel: largest change of a wheel speed in mm/s per second,
+                          None for no limit
+        :param clock: time source, time.monotonic by default
+        :param sleep: waits a number of seconds, by default a wait that close()
+                      interrupts
+        """
+        assert rate > 0, "rate must be positive"
+        self.bot = bot
+        self.period = 1.0 / rate
+        self.max_accel = max_accel
+
+        self._lock = threading.Lock()
+        self._target = (0, 0)
+        self._current = (0.0, 0.0)
+        self._sent: tuple[int, int] | None = None
+        self._running = threading.Event()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._clock = clock
+        self._sleep = sleep if sleep is not None else self._wake.wait
+
+        self.ticks = 0
+        self.writes = 0
+        self.overruns = 0
+
+    def __enter__(self) -> "DriveController":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def target(self) -> tuple[int, int]:
+        """Latest setpoint, (right, left) in mm/s."""
+        with self._lock:
+            return self._target
+
+    @property
+    def current(self) -> tuple[int, int]:
+        """Wheel speeds last written, (right, left) in mm/s."""
+        with self._lock:
+            return self._sent if self._sent is not None else (0, 0)
+
+    def set(self, r_vel: int, l_vel: int):
+        """
+        New setpoint in mm/s, clamped to [-500, 500]. Never blocks on the
+        serial port.
+        """
+        with self._lock:
+            self._target = (int(self.bot.limit(r_vel, -500, 500)),
+                            int(self.bot.limit(l_vel, -500, 500)))
+
+    def stop(self):
+        """
+        Zeroes the setpoint, the wheels slow down at max_accel.
+        """
+        self.set(0, 0)
+
+    def emergency_stop(self):
+        """
+        Stops the wheels right now, ignoring max_accel, and writes it at once.
+        """
+        with self._lock:
+            self._target = (0, 0)
+            self._current = (0.0, 0.0)
+            self._sent = (0, 0)
+        self.bot.drive_direct(0, 0)
+        with self._lock:
+            self.writes += 1
+
+    def step(self, dt: float | None = None) -> bool:
+        """
+        Runs one tick: moves the wheel speeds towards the setpoint and writes
+        them if they changed. Called by the background thread, call it
+        yourself to run the controller from your own loop.
+
+        :param dt: seconds since the last tick, one period by default
+        :return: True if something was written
+        """
+        if dt is None:
+            dt = self.period
+        with self._lock:
+            target = self._target
+            current = self._current
+            if self.max_accel is None:
+                current = (float(target[0]), float(target[1]))
+            else:
+                max_step = self.max_accel * dt
+                current = tuple(
+                    c + max(-max_step, min(max_step, t - c))
+                    for c, t in zip(current, target))  # type: ignore[assignment]
+            self._current = current
+            command = (round(current[0]), round(current[1]))
+            self.ticks += 1
+            if command == self._sent:
+                return False
+            self._sent = command
+
+        self.bot.drive_direct(*command)
+        with self._lock:
+            self.writes += 1
+        return True
+
+    def start(self):
+        """
+        Starts ticking from a background thread.
+        """
+        if self._running.is_set():
+            return
+        self._running.set()
+        self._wake.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="create2drive", daemon=True)
+        self._thread.start()
+
+    def run(self):
+        """
+        Ticks from the calling thread until close() is called, what start()
+        does in the background.
+        """
+        self._running.set()
+        self._run()
+
+    def close(self, timeout: float = 1.0):
+        """
+        Stops the wheels at once and stops the background thread.
+        """
+        if self._running.is_set():
+            self._running.clear()
+            self._wake.set()
+            if self._thread is not None:
+                self._thread.join(timeout)
+                self._thread = None
+        self.emergency_stop()
+
+    def _run(self):
+        deadline = self._clock()
+        while self._running.is_set():
+            try:
+                self.step()
+            except Exception as e:
+                logger.error(f"Drive tick failed: {e}")
+
+            deadline += self.period
+            now = self._clock()
+            if now > deadline:
+                # too late for this tick, realign instead of bursting to catch up
+                missed = int((now - deadline) / self.period) + 1
+                self.overruns += missed
+                deadline += missed * self.period
+            self._sleep(deadline - now)
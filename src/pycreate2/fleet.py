@@ -0,0 +1,178 @@
+import asyncio
+import time
+from typing import Iterable, Iterator, Mapping, Sequence
+from pycreate2.create2async import AsyncCreate2
+from pycreate2.OI import Opcodes
+import pycreate2.logger  # just to set up logging
+import logging
+
+logger = logging.getLogger("create2fleet")
+
+
+class Fleet(object):
+    """
+    Many robots driven from one asyncio event loop, on one thread. Every port
+    is watched by the loop (see AsyncSerialInterface), so opening, querying
+    and streaming all robots happens concurrently and broadcast commands are
+    written to every port in a single pass, without waiting on any of them.
+
+        fleet = await Fleet.connect({"left": "/dev/ttyUSB0", "right": "/dev/ttyUSB1"})
+        await fleet.gather("start")
+        fleet.start_streams([SensorNames.BUMPS_WHEELDROPS])
+        ...
+        fleet.stop_all()
+        await fleet.close()
+    """
+
+    def __init__(self, bots: Mapping[str, AsyncCreate2]):
+        """
+        Constructor.
+
+        :param bots: robots by name, already connected
+        """
+        self.bots: dict[str, AsyncCreate2] = dict(bots)
+        # latest stream frame of every robot and when it arrived (time.monotonic)
+        self.frames: dict[str, dict[str, int]] = {}
+        self.frame_times: dict[str, float] = {}
+        self._stream_tasks: dict[str, asyncio.Task] = {}
+
+    @classmethod
+    async def connect(cls, ports: Iterable[str] | Mapping[str, str], baud: int = 115200, require_all: bool = True) -> "Fleet":
+        """
+        Opens every port at once, so bring-up takes as long as the slowest
+        robot instead of the sum of all of them.
+
+        :param ports: port names, or robot names mapped to port names
+        :param baud: default is 115200, can be set to 19200 doing nefarious things
+        :param require_all: if True, a port that fails to open closes the others
+                            and raises. If False, it is logged and left out.
+        """
+        if not isinstance(ports, Mapping):
+            ports = {port: port for port in ports}
+
+        names = list(ports.keys())
+        results = await asyncio.gather(
+            *(AsyncCreate2.connect(ports[name], baud) for name in names),
+            return_exceptions=True)
+
+        bots = {}
+        failed = {}
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Could not connect to {name} on {ports[name]}: {result}")
+                failed[name] = result
+            else:
+                bots[name] = result
+
+        if failed and require_all:
+            for bot in bots.values():
+                bot.close()
+            raise Exception("Failed to open {}".format(", ".join(failed)))
+        return cls(bots)
+
+    def __len__(self) -> int:
+        return len(self.bots)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.bots)
+
+    def __getitem__(self, name: str) -> AsyncCreate2:
+        return self.bots[name]
+
+    async def __aenter__(self) -> "Fleet":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # ------------------------ Commands ----------------------------
+
+    def broadcast(self, opcode: int, data: Sequence[int] | None = None) -> dict[str, Exception]:
+        """
+        Writes the same command to every robot in one pass. A port that fails
+        does not keep the others from getting the command.
+
+        :param opcode: the command opcode
+        :param data: the command data bytes, if any
+        :return: the errors of the robots that could not be written to, by name
+        """
+        msg = bytes([opcode]) if data is None else bytes([opcode, *data])
+        errors = {}
+        for name, bot in self.bots.items():
+            try:
+                bot.SCI.write_raw(msg)
+            except Exception as e:
+                errors[name] = e
+        for name, error in errors.items():
+            logger.error(f"Broadcast of opcode {opcode} to {name} failed: {error}")
+        return errors
+
+    def stop_all(self) -> dict[str, Exception]:
+        """
+        Emergency stop: sets every robot's wheel speeds to zero. Nothing is
+        awaited, the commands are on their way when this returns.
+
+        :return: the errors of the robots that could not be stopped, by name
+        """
+        return self.broadcast(Opcodes.DRIVE_DIRECT.value, (0, 0, 0, 0))
+
+    async def gather(self, method: str, *args) -> dict[str, object]:
+        """
+        Awaits the same AsyncCreate2 coroutine on every robot at once, ie
+        await fleet.gather("safe") or await fleet.gather("get_sensor_group", 100).
+
+        :param method: name of the AsyncCreate2 coroutine method
+        :return: the results by robot name
+        """
+        names = list(self.bots.keys())
+        results = await asyncio.gather(
+            *(getattr(self.bots[name], method)(*args) for name in names))
+        return dict(zip(names, results))
+
+    # ------------------------ Streaming ----------------------------
+
+    def start_streams(self, sensor_list: Sequence[str | int]):
+        """
+        Streams the same sensors from every robot, the latest frames are kept
+        in 'frames', see latest().
+
+        :param sensor_list: sensor names (str), sensor ids or group ids (int)
+        """
+        for name, bot in self.bots.items():
+            if name not in self._stream_tasks:
+                self._stream_tasks[name] = asyncio.get_running_loop().create_task(
+                    self._collect(name, bot, sensor_list))
+
+    async def _collect(self, name: str, bot: AsyncCreate2, sensor_list: Sequence[str | int]):
+        async for frame in bot.stream(sensor_list, maxsize=1):
+            self.frames[name] = frame
+            self.frame_times[name] = time.monotonic()
+
+    async def stop_streams(self):
+        """
+        Stops the streams of every robot.
+        """
+        tasks = list(self._stream_tasks.values())
+        self._stream_tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def latest(self, max_age: float | None = None) -> dict[str, dict[str, int]]:
+        """
+        Returns the latest stream frame of every robot.
+
+        :param max_age: leave out frames older than this many seconds
+        """
+        if max_age is None:
+            return dict(self.frames)
+        oldest = time.monotonic() - max_age
+        return {name: frame for name, frame in self.frames.items() if self.frame_times[name] >= oldest}
+
+    async def close(self):
+        """
+        Stops the streams and closes every port.
+        """
+        await self.stop_streams()
+        for bot in self.bots.values():
+            bot.close()
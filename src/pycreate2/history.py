@@ -0,0 +1,193 @@
+import threading
+import time
+from typing import Callable, Mapping, Sequence
+from pycreate2.query import QueryPlan
+from pycreate2.stream import resolve_stream_packets
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("SensorHistory needs numpy: pip install pycreate2[numpy]")
+
+
+class SensorHistory(object):
+    """
+    The last 'capacity' samples of a set of sensors, in preallocated numpy
+    arrays used as a ring buffer. Appending is O(1) and never allocates, the
+    memory used is fixed no matter how long the robot runs.
+
+    Every sample is a row, every sensor a column, in the order of 'names'.
+    Windows are picked by age or by sample count and their statistics
+    computed with numpy, without building a dict per sample:
+
+        history = SensorHistory.for_plan(plan, capacity=2000)
+        history.append_values(plan.values(data))  # straight from the decoder
+        history.max(SensorNames.CURRENT, seconds=1.0)
+        history.percentile(SensorNames.VOLTAGE, 50, samples=20)
+
+    or, while streaming, bot.start_stream(sensor_list, history=history).
+    Appending and queries can happen from different threads.
+    """
+
+    def __init__(self, names: Sequence[str], capacity: int, clock: Callable[[], float] = time.monotonic):
+        """
+        Constructor.
+
+        :param names: sensor names, one column each
+        :param capacity: samples kept, older ones are overwritten
+        :param clock: time source for samples appended without a timestamp
+        """
+        _require_numpy()
+        assert capacity > 0, "capacity must be positive"
+        self.names = tuple(names)
+        self.columns = {name: i for i, name in enumerate(self.names)}
+        self.capacity = capacity
+        self._clock = clock
+        # int32 holds every sensor, signed and unsigned 16 bit ones alike
+        self._data = np.zeros((capacity, len(self.names)), dtype=np.int32)
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._next = 0  # row the next sample goes to
+        self._count = 0
+        self._lock = threading.Lock()
+        self.skipped = 0  # frames missing some of the columns
+
+    @classmethod
+    def for_plan(cls, plan: QueryPlan, capacity: int, clock: Callable[[], float] = time.monotonic) -> "SensorHistory":
+        """History of the sensors in a query, columns ordered like plan.values()."""
+        return cls(plan.names, capacity, clock)
+
+    @classmethod
+    def for_stream(cls, sensor_list: Sequence[str | int], capacity: int, clock: Callable[[], float] = time.monotonic) -> "SensorHistory":
+        """History of the sensors in a stream, see Create2.start_stream."""
+        packets = resolve_stream_packets(sensor_list)
+        names = [pkt.name for members in packets.values() for pkt in members]
+        return cls(names, capacity, clock)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append_values(self, values: Sequence[int], timestamp: float | None = None):
+        """
+        Adds a sample.
+
+        :param values: one value per column, ie QueryPlan.values()
+        :param timestamp: when it was taken, now by default
+        """
+        if timestamp is None:
+            timestamp = self._clock()
+        with self._lock:
+            self._data[self._next] = values
+            self._times[self._next] = timestamp
+            self._next = (self._next + 1) % self.capacity
+            if self._count < self.capacity:
+                self._count += 1
+
+    def append(self, frame: Mapping[str, int], timestamp: float | None = None):
+        """
+        Adds a sample from a sensor name to value dict, like the ones
+        get_sensor_group() and the stream return. Frames without every
+        column, ie sent before a stream was switched to other sensors, are
+        counted in 'skipped' and dropped.
+        """
+        try:
+            values = [frame[name] for name in self.names]
+        except KeyError:
+            with self._lock:
+                self.skipped += 1
+            return
+        self.append_values(values, timestamp)
+
+    def clear(self):
+        with self._lock:
+            self._next = 0
+            self._count = 0
+
+    def _segments(self, seconds: float | None, samples: int | None, now: float | None) -> list[slice]:
+        """
+        Rows of the window, oldest first, as at most two slices of the ring.
+        Call with the lock held.
+        """
+        if self._count < self.capacity:
+            segments = [slice(0, self._count)]
+        else:
+            segments = [slice(self._next, self.capacity), slice(0, self._next)]
+        segments = [s for s in segments if s.start < s.stop]
+
+        keep = self._count
+        if samples is not None:
+            keep = min(keep, samples)
+        if seconds is not None:
+            since = (self._clock() if now is None else now) - seconds
+            recent = sum(
+                s.stop - s.start - int(np.searchsorted(self._times[s], since))
+                for s in segments)
+            keep = min(keep, recent)
+
+        # drop the rows older than the window, starting from the oldest segment
+        skip = self._count - keep
+        window = []
+        for s in segments:
+            length = s.stop - s.start
+            if skip >= length:
+                skip -= length
+                continue
+            window.append(slice(s.start + skip, s.stop))
+            skip = 0
+        return window
+
+    def _column(self, name: str, seconds: float | None, samples: int | None, now: float | None) -> list:
+        column = self.columns[name]
+        with self._lock:
+            parts = [self._data[s, column].copy() for s in self._segments(seconds, samples, now)]
+        if not parts:
+            raise ValueError(f"No samples of {name} in the window")
+        return parts
+
+    def window(self, name: str, seconds: float | None = None, samples: int | None = None, now: float | None = None):
+        """
+        Values of a sensor, oldest first.
+
+        :param name: sensor name
+        :param seconds: only samples taken in the last 'seconds'
+        :param samples: only the last 'samples' samples
+        :param now: end of the time window, the clock by default
+        :return: numpy array, a copy
+        """
+        with self._lock:
+            segments = self._segments(seconds, samples, now)
+            return np.concatenate([self._data[s, self.columns[name]] for s in segments] or [np.zeros(0, np.int32)])
+
+    def timestamps(self, seconds: float | None = None, samples: int | None = None, now: float | None = None):
+        """Timestamps of the samples in a window, oldest first, see window()."""
+        with self._lock:
+            segments = self._segments(seconds, samples, now)
+            return np.concatenate([self._times[s] for s in segments] or [np.zeros(0)])
+
+    def min(self, name: str, seconds: float | None = None, samples: int | None = None, now: float | None = None) -> int:
+        """
+        Smallest value of a sensor in a window, see window().
+
+        :raises ValueError: if the window is empty
+        """
+        return int(min(part.min() for part in self._column(name, seconds, samples, now)))
+
+    def max(self, name: str, seconds: float | None = None, samples: int | None = None, now: float | None = None) -> int:
+        """Largest value of a sensor in a window, see min()."""
+        return int(max(part.max() for part in self._column(name, seconds, samples, now)))
+
+    def mean(self, name: str, seconds: float | None = None, samples: int | None = None, now: float | None = None) -> float:
+        """Mean value of a sensor in a window, see min()."""
+        parts = self._column(name, seconds, samples, now)
+        return float(sum(int(part.sum(dtype=np.int64)) for part in parts) / sum(len(part) for part in parts))
+
+    def percentile(self, name: str, q: float, seconds: float | None = None, samples: int | None = None, now: float | None = None) -> float:
+        """
+        q-th percentile (0-100) of a sensor in a window, see min().
+        """
+        parts = self._column(name, seconds, samples, now)
+        return float(np.percentile(np.concatenate(parts), q))
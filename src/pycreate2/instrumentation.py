@@ -0,0 +1,152 @@
+from dataclasses import dataclass, field
+import threading
+
+
+class Instrumentation(object):
+    """
+    Hooks called from the serial and query hot paths. Every method does
+    nothing here, subclass and override the events you care about, then hand
+    it to Create2.instrument(). When no instrumentation is installed the hot
+    paths only pay for a None check.
+    """
+
+    def on_command(self, opcode: int, num_bytes: int):
+        """A command was issued (sent right away or queued in a batch)."""
+
+    def on_write(self, num_bytes: int, seconds: float):
+        """Bytes were written to the port, one call per write syscall."""
+
+    def on_read(self, num_bytes: int, seconds: float):
+        """A response was read, seconds is how long we waited for it."""
+
+    def on_query(self, opcode: int, seconds: float):
+        """A sensor query finished, from sending the request to decoded data."""
+
+    def on_decode(self, num_bytes: int, seconds: float):
+        """A sensor response was decoded."""
+
+    def on_retry(self, opcode: int):
+        """A sensor query failed and is being retried."""
+
+    def on_flush(self):
+        """The input buffer was flushed because it held unexpected bytes."""
+
+    def snapshot(self) -> dict:
+        """Returns whatever this instrumentation collected."""
+        return {}
+
+
+@dataclass
+class Histogram:
+    """
+    Latency histogram with power of two buckets: bucket i counts samples that
+    took from 2**(i-1) to 2**i microseconds (bucket 0 is below 1 us).
+    """
+    count: int = 0
+    total: float = 0.0
+    min: float = float("inf")
+    max: float = 0.0
+    buckets: list[int] = field(default_factory=lambda: [0] * 32)
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), 31)] += 1
+
+    def percentile(self, pct: float) -> float:
+        """
+        Upper bound, in seconds, of the bucket holding the given percentile.
+        """
+        if self.count == 0:
+            return 0.0
+        target = self.count * pct / 100.0
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min((1 << i) * 1e-6, self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "buckets": {(1 << i): n for i, n in enumerate(self.buckets) if n},
+        }
+
+
+class StatsCollector(Instrumentation):
+    """
+    Default instrumentation: per-opcode command counters, bytes in and out,
+    latency histograms for writes, reads, queries and decoding, and retry and
+    flush counts. Safe to use from several threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Zeroes every counter and histogram."""
+        with self._lock:
+            self.commands: dict[int, int] = {}
+            self.bytes_out = 0
+            self.bytes_in = 0
+            self.writes = Histogram()
+            self.reads = Histogram()
+            self.queries = Histogram()
+            self.decodes = Histogram()
+            self.retries = 0
+            self.flushes = 0
+
+    def on_command(self, opcode: int, num_bytes: int):
+        with self._lock:
+            self.commands[opcode] = self.commands.get(opcode, 0) + 1
+
+    def on_write(self, num_bytes: int, seconds: float):
+        with self._lock:
+            self.bytes_out += num_bytes
+            self.writes.record(seconds)
+
+    def on_read(self, num_bytes: int, seconds: float):
+        with self._lock:
+            self.bytes_in += num_bytes
+            self.reads.record(seconds)
+
+    def on_query(self, opcode: int, seconds: float):
+        with self._lock:
+            self.queries.record(seconds)
+
+    def on_decode(self, num_bytes: int, seconds: float):
+        with self._lock:
+            self.decodes.record(seconds)
+
+    def on_retry(self, opcode: int):
+        with self._lock:
+            self.retries += 1
+
+    def on_flush(self):
+        with self._lock:
+            self.flushes += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "commands": dict(self.commands),
+                "bytes_out": self.bytes_out,
+                "bytes_in": self.bytes_in,
+                "write": self.writes.snapshot(),
+                "read": self.reads.snapshot(),
+                "query": self.queries.snapshot(),
+                "decode": self.decodes.snapshot(),
+                "retries": self.retries,
+                "flushes": self.flushes,
+            }
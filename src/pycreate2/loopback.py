@@ -0,0 +1,195 @@
+import threading
+import time
+from collections import deque
+from typing import Callable
+from pycreate2.OI import Opcodes, command_size
+from pycreate2.query import compile_sensor_list, compile_sensor_group
+import pycreate2.logger  # just to set up logging
+import logging
+
+logger = logging.getLogger("create2loopback")
+
+
+class LoopbackSerial(object):
+    """
+    In-process stand-in for serial.Serial that models the time bytes spend on
+    the wire, 10 bits per byte at the configured baud rate in each direction.
+
+    Written bytes leave through a transmit buffer of tx_buffer bytes: write()
+    returns right away unless the buffer is full and flush() waits until the
+    last byte is out. Once a chunk is fully sent the responder is called with
+    it, and whatever it returns arrives byte by byte after 'latency' seconds.
+    Bytes can also be pushed at any time with inject(), ie for streams.
+
+    It can be handed to SerialCommandInterface in place of its ser attribute.
+    """
+
+    def __init__(self, responder: Callable[[bytes], bytes] | None = None, baudrate: int = 115200, latency: float = 0.0, tx_buffer: int = 4096):
+        """
+        Constructor.
+
+        :param responder: called with every written chunk, returns the reply
+        :param baudrate: line speed used for the timing model
+        :param latency: seconds between a command being received and its reply
+        :param tx_buffer: bytes that can be queued before write() blocks
+        """
+        self.responder = responder
+        self.port = "loopback"
+        self.baudrate = baudrate
+        self.timeout: float | None = 1.0
+        self.write_timeout: float | None = None
+        self.latency = latency
+        self.tx_buffer = tx_buffer
+        self.is_open = True
+        self.rts = True
+        self.dtr = True
+
+        self._cond = threading.Condition()
+        self._tx_free_at = 0.0
+        self._rx_free_at = 0.0
+        self._rx: deque[tuple[float, bytes]] = deque()  # (first byte received, data)
+        self._cancelled = False
+
+    @property
+    def byte_time(self) -> float:
+        """Seconds one byte spends on the wire."""
+        return 10.0 / self.baudrate
+
+    # --------------------------- serial.Serial API ---------------------------
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    @property
+    def in_waiting(self) -> int:
+        with self._cond:
+            return self._available(time.monotonic())
+
+    def write(self, data: bytes) -> int:
+        data = bytes(data)
+        now = time.monotonic()
+        # block while the transmit buffer is full, like a real port would
+        backlog = (self._tx_free_at - now) / self.byte_time
+        if backlog + len(data) > self.tx_buffer:
+            time.sleep((backlog + len(data) - self.tx_buffer) * self.byte_time)
+            now = time.monotonic()
+
+        with self._cond:
+            start = max(now, self._tx_free_at)
+            self._tx_free_at = start + len(data) * self.byte_time
+            if self.responder is not None:
+                reply = self.responder(data)
+                if reply:
+                    self._schedule(reply, self._tx_free_at + self.latency)
+        return len(data)
+
+    def flush(self):
+        remaining = self._tx_free_at - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def read(self, size: int = 1) -> bytes:
+        deadline = float("inf") if self.timeout is None else time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                available = self._available(now)
+                if available >= size or now >= deadline or self._cancelled:
+                    break
+                arrival = self._arrival_time(size)
+                self._cond.wait(min(arrival, deadline) - now)
+            self._cancelled = False
+            return self._take(min(available, size), now)
+
+    def cancel_read(self):
+        with self._cond:
+            self._cancelled = True
+            self._cond.notify_all()
+
+    def reset_input_buffer(self):
+        with self._cond:
+            now = time.monotonic()
+            self._take(self._available(now), now)
+
+    def reset_output_buffer(self):
+        pass
+
+    # ------------------------------ loopback ---------------------------------
+
+    def inject(self, data: bytes, at: float | None = None):
+        """
+        Sends bytes from the robot side, they start arriving at time 'at'
+        (time.monotonic() clock), right away by default.
+        """
+        with self._cond:
+            self._schedule(bytes(data), time.monotonic() if at is None else at)
+
+    def _schedule(self, data: bytes, at: float):
+        start = max(at, self._rx_free_at)
+        self._rx.append((start + self.byte_time, data))
+        self._rx_free_at = start + len(data) * self.byte_time
+        self._cond.notify_all()
+
+    def _available(self, now: float) -> int:
+        count = 0
+        for start, data in self._rx:
+            if now < start:
+                break
+            arrived = min(len(data), int((now - start) / self.byte_time) + 1)
+            count += arrived
+            if arrived < len(data):
+                break
+        return count
+
+    def _arrival_time(self, size: int) -> float:
+        """When the size-th byte will have arrived, inf if it is not on its way."""
+        for start, data in self._rx:
+            if size <= len(data):
+                return start + (size - 1) * self.byte_time
+            size -= len(data)
+        return float("inf")
+
+    def _take(self, size: int, now: float) -> bytes:
+        out = bytearray()
+        while size > 0 and self._rx:
+            start, data = self._rx[0]
+            if size >= len(data):
+                out += data
+                size -= len(data)
+                self._rx.popleft()
+            else:
+                out += data[:size]
+                self._rx[0] = (start + size * self.byte_time, data[size:])
+                size = 0
+        return bytes(out)
+
+
+class SensorResponder(object):
+    """
+    Minimal robot for LoopbackSerial: splits the written bytes into commands
+    and answers SENSORS and QUERY_LIST with correctly sized, all-zero data.
+    Every other command is swallowed.
+    """
+
+    def __init__(self):
+        self._pending = bytearray()
+        self.commands = 0
+
+    def __call__(self, data: bytes) -> bytes:
+        self._pending += data
+        reply = bytearray()
+        while True:
+            size = command_size(self._pending)
+            if size is None or size > len(self._pending):
+                break
+            cmd = bytes(self._pending[:size])
+            del self._pending[:size]
+            self.commands += 1
+            if cmd[0] == Opcodes.SENSORS.value:
+                reply += bytes(compile_sensor_group(cmd[1]).size)
+            elif cmd[0] == Opcodes.QUERY_LIST.value:
+                reply += bytes(compile_sensor_list(tuple(cmd[2:])).size)
+        return bytes(reply)
@@ -0,0 +1,190 @@
+import threading
+import time
+from typing import Callable, Sequence
+from pycreate2.create2api import Create2
+from pycreate2.sensors import SensorNames
+import pycreate2.logger  # just to set up logging
+import logging
+
+logger = logging.getLogger("create2melody")
+
+NOTES_PER_SONG = 16
+SONG_SLOTS = 4
+
+
+def split_notes(notes: Sequence[int] | Sequence[tuple[int, int]]) -> list[tuple[int, ...]]:
+    """
+    Splits a melody into songs of at most 16 notes.
+
+    :param notes: [note, duration, note, duration, ...] like createSong, or
+                  [(note, duration), ...]. Durations are in 1/64 s.
+    :return: every chunk as a flat (note, duration, ...) tuple
+    """
+    if notes and isinstance(notes[0], (tuple, list)):
+        flat = tuple(value for pair in notes for value in pair)  # type: ignore[union-attr]
+    else:
+        flat = tuple(notes)  # type: ignore[arg-type]
+    if len(flat) % 2 != 0:
+        raise Exception("Every note needs a duration")
+    size = 2 * NOTES_PER_SONG
+    return [flat[i: i + size] for i in range(0, len(flat), size)]
+
+
+def song_duration(chunk: Sequence[int]) -> float:
+    """Seconds a song takes to play."""
+    return sum(chunk[1::2]) / 64.0
+
+
+class MelodyPlayer(object):
+    """
+    Plays melodies of any length without gaps. The melody is split into 16
+    note songs spread over the 4 song slots: while one plays, the next three
+    are already on the robot, and the slot that just finished is refilled
+    right after the next PLAY. A song already held by a slot plays from there
+    instead of being uploaded again, so replaying a short melody costs no
+    uploads at all.
+
+    The robot ignores PLAY while a song is playing, so the next PLAY is sent
+    once the current song is over: we sleep until just before its end and
+    then poll 'Song Playing?' (packet 37). While a sensor stream is running
+    the robot can't be polled and the precomputed durations plus 'margin'
+    are used instead.
+
+        player = MelodyPlayer(bot)
+        player.play(notes)   # blocks until the melody is over
+        player.start(notes)  # or plays it from a background thread
+
+    The robot must be in safe or full mode.
+    """
+
+    def __init__(self, bot: Create2, clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] | None = None):
+        """
+        Constructor.
+
+        :param bot: the robot to play on
+        :param clock: time source, time.monotonic by default
+        :param sleep: waits a number of seconds, by default a wait that stop()
+                      can interrupt. Only change these two for simulations.
+        """
+        self.bot = bot
+        self._clock = clock
+        self._stop = threading.Event()
+        self._sleep = sleep if sleep is not None else self._stop.wait
+        self._thread: threading.Thread | None = None
+
+        # start polling 'Song Playing?' this long before a song should end
+        self.poll_lead = 0.02
+        self.poll_interval = 0.002
+        # give up polling this long after a song should have ended
+        self.poll_timeout = 0.25
+        # extra wait after a song's duration when the robot can't be polled
+        self.margin = 0.01
+
+        self.uploads = 0  # songs sent to the robot so far
+
+    @property
+    def playing(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def play(self, notes: Sequence[int] | Sequence[tuple[int, int]], repeat: int = 1):
+        """
+        Plays a melody and returns when its last note starts playing, or when
+        stop() is called.
+
+        :param notes: see split_notes
+        :param repeat: how many times to play it
+        """
+        chunks = split_notes(notes) * repeat
+        if not chunks:
+            return
+        self._stop.clear()
+        plan = self.plan(chunks)
+
+        with self.bot.batch():
+            for i in range(min(SONG_SLOTS, len(chunks))):
+                self._upload(plan[i], chunks[i])
+
+        end = 0.0
+        for i, chunk in enumerate(chunks):
+            if i > 0 and not self._wait_end(end):
+                return
+            with self.bot.batch():
+                self.bot.playSong(plan[i])
+                # the slot that just finished may take a song further ahead
+                ahead = i + SONG_SLOTS - 1
+                if i > 0 and ahead < len(chunks):
+                    self._upload(plan[ahead], chunks[ahead])
+            end = self._clock() + song_duration(chunk)
+
+    def plan(self, chunks: Sequence[tuple[int, ...]]) -> list[int]:
+        """
+        Picks the slot every song plays from. A slot already holding the song
+        is reused, otherwise the least recently used slot whose last song
+        is over by the time the upload goes out (song i is uploaded when song
+        i-3 starts playing).
+
+        :return: the slot of every song
+        """
+        content = {slot: self.bot.song_notes.get(slot) for slot in range(SONG_SLOTS)}
+        last_use = {slot: -SONG_SLOTS for slot in range(SONG_SLOTS)}
+        slots = []
+        for i, chunk in enumerate(chunks):
+            resident = [slot for slot in range(SONG_SLOTS) if content[slot] == chunk]
+            if resident:
+                slot = resident[0]
+            else:
+                free = [slot for slot in range(SONG_SLOTS) if last_use[slot] <= i - SONG_SLOTS]
+                slot = min(free, key=lambda s: last_use[s])
+                content[slot] = chunk
+            last_use[slot] = i
+            slots.append(slot)
+        return slots
+
+    def start(self, notes: Sequence[int] | Sequence[tuple[int, int]], repeat: int = 1):
+        """
+        Plays a melody from a background thread, see play().
+        """
+        self.stop()
+        self._thread = threading.Thread(
+            target=self.play, args=(notes, repeat), name="create2melody", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        """
+        Stops queuing songs, the one already playing finishes.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _upload(self, slot: int, chunk: tuple[int, ...]):
+        if self.bot.song_notes.get(slot) == chunk:
+            return
+        self.bot.createSong(slot, chunk)
+        self.uploads += 1
+
+    def _wait_end(self, end: float) -> bool:
+        """
+        Waits for the current song to finish, returns False if stopped.
+        """
+        stream = self.bot.sensor_stream
+        can_poll = stream is None or not stream.running
+
+        remaining = end - self._clock() - (self.poll_lead if can_poll else -self.margin)
+        if remaining > 0:
+            self._sleep(remaining)
+        if self._stop.is_set():
+            return False
+        if not can_poll:
+            return True
+
+        while self._clock() < end + self.poll_timeout:
+            data = self.bot.get_sensor_list((SensorNames.SONG_PLAYING,))
+            if not data[SensorNames.SONG_PLAYING]:
+                return True
+            self._sleep(self.poll_interval)
+            if self._stop.is_set():
+                return False
+        logger.warning("Song still playing past its duration, playing the next one anyway")
+        return True
@@ -0,0 +1,146 @@
+import math
+from dataclasses import dataclass
+from typing import Sequence
+from pycreate2.OI import Robot
+from pycreate2.sensors import SensorNames
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # only needed by integrate()
+
+
+def encoder_delta(current: int, previous: int) -> int:
+    """
+    Ticks between two encoder readings. The counters are signed 16 bit and
+    roll over, so 32767 -> -32768 is one tick forward, not 65535 back.
+    """
+    return ((current - previous + 0x8000) % 0x10000) - 0x8000
+
+
+@dataclass
+class Pose:
+    x: float = 0.0      # mm
+    y: float = 0.0      # mm
+    theta: float = 0.0  # rad, counter-clockwise
+
+
+class Odometry(object):
+    """
+    Dead reckoning from the wheel encoders. Feed it every sensor frame, or
+    the encoder counts from a stream, and it integrates the pose:
+
+        odom = Odometry()
+        for frame in frames:
+            pose = odom.update_frame(frame)
+
+    The first reading only sets the reference counts. The Angle packet, when
+    present, can be blended into the heading with fuse_angle.
+    """
+
+    def __init__(self, fuse_angle: float = 0.0, pose: Pose | None = None):
+        """
+        Constructor.
+
+        :param fuse_angle: weight of the Angle packet in the heading change,
+                           0 uses the encoders only, 1 the Angle packet only
+        :param pose: starting pose, the origin by default
+        """
+        assert 0.0 <= fuse_angle <= 1.0, "fuse_angle must be between 0 and 1"
+        self.fuse_angle = fuse_angle
+        self.pose = pose if pose is not None else Pose()
+        self.distance = 0.0  # mm travelled, backwards counts as negative
+        self._last: tuple[int, int] | None = None
+
+    def reset(self, pose: Pose | None = None):
+        """
+        Moves back to 'pose' (the origin by default) and forgets the last
+        encoder counts.
+        """
+        self.pose = pose if pose is not None else Pose()
+        self.distance = 0.0
+        self._last = None
+
+    def update(self, left: int, right: int, angle: int | None = None) -> Pose:
+        """
+        Integrates one pair of encoder readings.
+
+        :param left: Encoder Counts Left as reported by the robot
+        :param right: Encoder Counts Right as reported by the robot
+        :param angle: Angle packet in degrees since the last reading, optional
+        :return: the new pose
+        """
+        if self._last is None:
+            self._last = (left, right)
+            return self.pose
+
+        d_left = encoder_delta(left, self._last[0]) * Robot.TICK_TO_DISTANCE.value
+        d_right = encoder_delta(right, self._last[1]) * Robot.TICK_TO_DISTANCE.value
+        self._last = (left, right)
+
+        distance = (d_left + d_right) / 2.0
+        dtheta = (d_right - d_left) / Robot.WHEEL_BASE.value
+        if angle is not None and self.fuse_angle:
+            dtheta += self.fuse_angle * (math.radians(angle) - dtheta)
+
+        heading = self.pose.theta + dtheta / 2.0
+        self.pose = Pose(
+            self.pose.x + distance * math.cos(heading),
+            self.pose.y + distance * math.sin(heading),
+            self.pose.theta + dtheta,
+        )
+        self.distance += distance
+        return self.pose
+
+    def update_frame(self, frame: dict[str, int]) -> Pose:
+        """
+        Integrates a sensor frame, from a query or a stream, that holds both
+        encoder counts and optionally the Angle packet.
+        """
+        return self.update(
+            frame[SensorNames.ENCODER_COUNTS_LEFT],
+            frame[SensorNames.ENCODER_COUNTS_RIGHT],
+            frame.get(SensorNames.ANGLE),
+        )
+
+
+def integrate(left: Sequence[int], right: Sequence[int], angle: Sequence[int] | None = None, fuse_angle: float = 0.0, pose: Pose | None = None):
+    """
+    Batch version of Odometry for recorded data: integrates whole arrays of
+    encoder samples at once with numpy. Gives the same poses as calling
+    Odometry.update() with every sample.
+
+    :param left: Encoder Counts Left samples
+    :param right: Encoder Counts Right samples
+    :param angle: Angle packet samples, optional
+    :param fuse_angle: weight of the Angle packet, see Odometry
+    :param pose: starting pose, the origin by default
+    :return: array of shape (N, 3) with x, y, theta after every sample
+    """
+    if np is None:
+        raise ImportError("integrate() needs numpy: pip install pycreate2[numpy]")
+    if pose is None:
+        pose = Pose()
+
+    left_arr = np.asarray(left, dtype=np.int64)
+    right_arr = np.asarray(right, dtype=np.int64)
+    assert left_arr.shape == right_arr.shape, "left and right must have the same length"
+
+    d_left = (((np.diff(left_arr) + 0x8000) % 0x10000) - 0x8000) * Robot.TICK_TO_DISTANCE.value
+    d_right = (((np.diff(right_arr) + 0x8000) % 0x10000) - 0x8000) * Robot.TICK_TO_DISTANCE.value
+
+    distance = (d_left + d_right) / 2.0
+    dtheta = (d_right - d_left) / Robot.WHEEL_BASE.value
+    if angle is not None and fuse_angle:
+        dtheta += fuse_angle * (np.radians(np.asarray(angle, dtype=np.float64)[1:]) - dtheta)
+
+    out = np.empty((len(left_arr), 3))
+    if len(left_arr) == 0:
+        return out
+    theta = pose.theta + np.cumsum(dtheta)
+    heading = theta - dtheta / 2.0
+    out[0] = (pose.x, pose.y, pose.theta)
+    out[1:, 0] = pose.x + np.cumsum(distance * np.cos(heading))
+    out[1:, 1] = pose.y + np.cumsum(distance * np.sin(heading))
+    out[1:, 2] = theta
+    return out
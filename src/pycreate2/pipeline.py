@@ -0,0 +1,230 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Sequence
+from pycreate2.create2api import Create2
+from pycreate2.query import QueryPlan, compile_sensor_group, compile_sensor_list
+import pycreate2.logger  # just to set up logging
+import logging
+
+logger = logging.getLogger("create2pipeline")
+
+# how long the reader waits for bytes before checking deadlines again
+POLL_INTERVAL = 0.005
+
+
+class _Request(object):
+    __slots__ = ("plan", "future", "sent", "deadline")
+
+    def __init__(self, plan: QueryPlan):
+        self.plan = plan
+        self.future: Future = Future()
+        self.sent = 0.0
+        self.deadline = 0.0
+
+
+class QueryPipeline(object):
+    """
+    Sensor queries with several requests on the wire at once. The robot
+    answers queries in order and every answer has a known size, so there
+    is no need to wait for one answer before sending the next request: the
+    line keeps busy while we wait on the USB adapter and decode.
+
+    Up to 'depth' requests are in flight, more are queued. A reader thread
+    splits the incoming bytes by the expected sizes and completes a future
+    per request:
+
+        with QueryPipeline(bot, depth=4) as pipeline:
+            futures = [pipeline.get_sensor_group(101) for _ in range(100)]
+            values = [f.result() for f in futures]
+
+    When a response is late or doesn't decode, the ones in flight can't be
+    told apart anymore: they all fail, the input is drained and the queued
+    requests carry on.
+
+    The pipeline owns the robot's responses while it runs: don't use
+    get_sensor_list()/get_sensor_group() or a stream until it is closed.
+    Commands without a response (drive, leds, ...) are fine.
+    """
+
+    def __init__(self, bot: Create2, depth: int = 4):
+        """
+        Constructor.
+
+        :param bot: the robot to query
+        :param depth: most requests sent but not answered yet
+        """
+        assert depth > 0, "depth must be positive"
+        self.bot = bot
+        self.SCI = bot.SCI
+        self.depth = depth
+
+        self._cond = threading.Condition()
+        self._queued: deque[_Request] = deque()
+        self._in_flight: deque[_Request] = deque()
+        self._buffer = bytearray()
+        self._running = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._port_timeout = None
+
+        self.completed = 0
+        self.failed = 0
+        self.max_in_flight = 0
+
+    def __enter__(self) -> "QueryPipeline":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def running(self) -> bool:
+        return self._running.is_set()
+
+    def start(self):
+        """
+        Starts the reader thread.
+
+        :raises Exception: if a sensor stream is running
+        """
+        if self.running:
+            return
+        stream = self.bot.sensor_stream
+        if stream is not None and stream.running:
+            raise Exception("Cannot pipeline queries while a sensor stream is running")
+
+        self.SCI.flush_input()
+        self._port_timeout = self.SCI.ser.timeout
+        self.SCI.ser.timeout = POLL_INTERVAL
+        self._running.set()
+        self._thread = threading.Thread(
+            target=self._run, name="create2pipeline", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout: float = 1.0):
+        """
+        Stops the reader thread, requests not answered yet fail.
+        """
+        if not self.running:
+            return
+        self._running.clear()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._cond:
+            self._fail(self._in_flight, Exception("Query pipeline closed"))
+            self._fail(self._queued, Exception("Query pipeline closed"))
+        self.SCI.ser.timeout = self._port_timeout
+
+    def submit(self, plan: QueryPlan) -> Future:
+        """
+        Queues a query, it is sent as soon as fewer than 'depth' are in flight.
+
+        :param plan: the query, see pycreate2.query
+        :return: a future with the decoded dict of sensor name to value
+        """
+        if not self.running:
+            raise Exception("Query pipeline is not running, call start() first")
+        request = _Request(plan)
+        with self._cond:
+            self._queued.append(request)
+            self._send_more(time.monotonic())
+            self._cond.notify_all()
+        return request.future
+
+    def get_sensor_list(self, sensor_list: Sequence[str | int]) -> Future:
+        """Pipelined Create2.get_sensor_list, returns a future."""
+        return self.submit(compile_sensor_list(tuple(sensor_list)))
+
+    def get_sensor_group(self, group_id: int) -> Future:
+        """Pipelined Create2.get_sensor_group, returns a future."""
+        return self.submit(compile_sensor_group(group_id))
+
+    def _send_more(self, now: float):
+        """Sends queued requests while there is room. Call with the lock held."""
+        while self._queued and len(self._in_flight) < self.depth:
+            request = self._queued.popleft()
+            if request.future.cancelled():
+                continue
+            request.sent = now
+            if not self._in_flight:
+                request.deadline = now + self.SCI.response_timeout(request.plan.size)
+            self.SCI.write_raw(request.plan.request, True)
+            self._in_flight.append(request)
+        self.max_in_flight = max(self.max_in_flight, len(self._in_flight))
+
+    def _fail(self, requests: deque, error: Exception):
+        while requests:
+            request = requests.popleft()
+            if not request.future.done():
+                request.future.set_exception(error)
+            self.failed += 1
+
+    def _run(self):
+        ser = self.SCI.ser
+        while self._running.is_set():
+            with self._cond:
+                if not self._in_flight:
+                    self._cond.wait(0.1)
+                    continue
+            try:
+                data = ser.read(ser.in_waiting or 1)
+            except Exception as e:
+                logger.error(f"Query pipeline reader stopped: {e}")
+                self._running.clear()
+                break
+            with self._cond:
+                self._buffer += data
+                self._complete(time.monotonic())
+
+    def _complete(self, now: float):
+        """
+        Hands out every response that is complete and checks the deadline of
+        the oldest one. Call with the lock held.
+        """
+        inst = self.SCI.instrumentation
+        error: Exception | None = None
+        while self._in_flight and len(self._buffer) >= self._in_flight[0].plan.size:
+            request = self._in_flight.popleft()
+            plan = request.plan
+            data = bytes(self._buffer[:plan.size])
+            del self._buffer[:plan.size]
+            self.bot._record_query(plan, data)
+            if self._in_flight:
+                self._in_flight[0].deadline = now + self.SCI.response_timeout(self._in_flight[0].plan.size)
+            try:
+                sensor_data = plan.decode(data)
+            except ValueError as e:
+                # most likely a byte went missing, what follows is misaligned
+                self.failed += 1
+                request.future.set_exception(e)
+                error = e
+                break
+            self.completed += 1
+            self.bot.last_query_latency = now - request.sent
+            if inst is not None:
+                inst.on_query(plan.opcode.value, self.bot.last_query_latency)
+            self.bot._track_mode(sensor_data)
+            if not request.future.done():
+                request.future.set_result(sensor_data)
+
+        if error is None and self._in_flight and now > self._in_flight[0].deadline:
+            error = Exception(
+                f"Expected {self._in_flight[0].plan.size} bytes, got {len(self._buffer)} bytes")
+        if error is not None:
+            logger.error(f"Query pipeline out of sync, dropping {len(self._in_flight)} requests: {error}")
+            self._fail(self._in_flight, error)
+            self._drain()
+
+        self._send_more(now)
+
+    def _drain(self):
+        """Throws away input until the line goes quiet. Call with the lock held."""
+        ser = self.SCI.ser
+        while ser.read(ser.in_waiting or 1):
+            pass
+        self._buffer.clear()
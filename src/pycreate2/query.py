@@ -0,0 +1,302 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import combinations
+from typing import Callable
+import struct
+import pycreate2.sensors as sensors
+from pycreate2.OI import Opcodes
+import pycreate2.logger  # just to set up logging
+import logging
+
+logger = logging.getLogger("create2query")
+
+# How many distinct sensor lists / groups keep a compiled plan around
+PLAN_CACHE_SIZE = 64
+
+# The robot sends a stream frame every 15 ms, it has to fit on the wire
+STREAM_PERIOD = 0.015
+# 8N1: a start bit, 8 data bits and a stop bit per byte
+BITS_PER_BYTE = 10
+# QUERY_LIST counts its ids in a single byte
+MAX_LIST_IDS = 255
+
+# Values every struct code can represent, a sensor whose range is narrower
+# than this needs to be range checked after decoding
+_CODE_RANGES = {
+    'B': (0, 0xFF),
+    'b': (-0x80, 0x7F),
+    'H': (0, 0xFFFF),
+    'h': (-0x8000, 0x7FFF),
+}
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    """
+    Everything needed to request and decode one sensor query, worked out once.
+
+    :param opcode: SENSORS for a group, QUERY_LIST for a list of packets
+    :param request: the encoded request, opcode included
+    :param packets: the sensors in the order they come back
+    :param size: total bytes in the response
+    :param decoder: decodes the whole response with one unpack_from
+    :param names: sensor names, in the same order as the decoded values
+    :param checks: (index, low, high) for every value that needs a range check
+    """
+    opcode: Opcodes
+    request: bytes
+    packets: tuple[sensors.Sensor, ...]
+    size: int
+    decoder: struct.Struct
+    names: tuple[str, ...]
+    checks: tuple[tuple[int, int, int], ...]
+
+    @classmethod
+    def build(cls, opcode: Opcodes, data: tuple[int, ...], packets: tuple[sensors.Sensor, ...]) -> "QueryPlan":
+        codes = "".join(pkt.pack_format()[-1] for pkt in packets)
+        checks = tuple(
+            (i, pkt.value_range[0], pkt.value_range[1])
+            for i, (pkt, code) in enumerate(zip(packets, codes))
+            if pkt.value_range != _CODE_RANGES[code]
+        )
+        decoder = struct.Struct(">" + codes)
+        return cls(
+            opcode=opcode,
+            request=bytes((opcode.value,) + data),
+            packets=packets,
+            size=decoder.size,
+            decoder=decoder,
+            names=tuple(pkt.name for pkt in packets),
+            checks=checks,
+        )
+
+    def values(self, data: bytes | bytearray | memoryview, offset: int = 0) -> tuple[int, ...]:
+        """
+        Decode a response into a tuple of values ordered like names.
+
+        :raises ValueError: if a value is outside of its sensor's range
+        """
+        values = self.decoder.unpack_from(data, offset)
+        for i, low, high in self.checks:
+            if not low <= values[i] <= high:
+                pkt = self.packets[i]
+                raise ValueError(
+                    f"Unpacked value {values[i]} out of range {pkt.value_range} for sensor {pkt.name} (ID {pkt.id})"
+                )
+        return values
+
+    def decode(self, data: bytes | bytearray | memoryview, offset: int = 0) -> dict[str, int]:
+        """
+        Decode a response into a dictionary of sensor name to value.
+
+        :raises ValueError: if a value is outside of its sensor's range
+        """
+        return dict(zip(self.names, self.values(data, offset)))
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def compile_sensor_list(sensor_list: tuple[str | int, ...]) -> QueryPlan:
+    """
+    Compile a QUERY_LIST request for sensors given by name or id. Plans are
+    cached, so pass a tuple to make repeated calls cheap.
+
+    :param sensor_list: sensor names (str) or ids (int)
+    :type sensor_list: tuple[str | int, ...]
+    :rtype: QueryPlan
+    """
+    packet_list: list[sensors.Sensor] = []
+    for s in sensor_list:
+        if isinstance(s, str):
+            pkt = sensors.get_sensor_by_name(s)
+            assert pkt is not None, f"Sensor name '{s}' not found"
+            packet_list.append(pkt)
+        elif isinstance(s, int):
+            pkt = sensors.get_sensor_by_id(s)
+            assert pkt is not None, f"Sensor id '{s}' not found"
+            packet_list.append(pkt)
+        else:
+            raise Exception(
+                f"Sensor list must contain strings or integers, got {type(s)}"
+            )
+
+    logger.debug(
+        f"Compiled query for sensors: {', '.join(f"'{pkt.name}' ({pkt.size} bytes)" for pkt in packet_list)}")
+
+    data = (len(packet_list),) + tuple(pkt.id for pkt in packet_list)
+    return QueryPlan.build(Opcodes.QUERY_LIST, data, tuple(packet_list))
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def compile_sensor_group(group_id: int) -> QueryPlan:
+    """
+    Compile a SENSORS request for a whole sensor group.
+
+    :param group_id: sensor group id
+    :type group_id: int
+    :rtype: QueryPlan
+    """
+    block = sensors.REGISTRY.blocks.get(group_id)
+    assert block is not None, f"Sensor group '{group_id}' not found"
+    sensor_list = block.sensors
+
+    logger.debug(
+        f"Compiled query for sensor group {group_id} with sensors: {', '.join(f"'{pkt.name}' ({pkt.size} bytes)" for pkt in sensor_list)}")
+
+    return QueryPlan.build(Opcodes.SENSORS, (group_id,), sensor_list)
+
+
+def wire_time(num_bytes: int, baud: int) -> float:
+    """Seconds it takes to send num_bytes at a baud rate."""
+    return num_bytes * BITS_PER_BYTE / baud
+
+
+@dataclass(frozen=True)
+class OptimizedQuery:
+    """
+    The cheapest way found by optimize_query to read a set of sensors.
+
+    :param names: the sensors asked for
+    :param plans: requests to send, their responses hold every sensor in names
+    :param baud: baud rate the plans were optimized for
+    :param request_bytes: bytes sent by all the plans
+    :param response_bytes: bytes received for all the plans
+    :param stream_packets: packet and group ids to stream the same sensors with
+    :param stream_bytes: size of one stream frame of stream_packets
+    """
+    names: tuple[str, ...]
+    plans: tuple[QueryPlan, ...]
+    baud: int
+    request_bytes: int
+    response_bytes: int
+    stream_packets: tuple[int, ...]
+    stream_bytes: int
+
+    @property
+    def wire_bytes(self) -> int:
+        return self.request_bytes + self.response_bytes
+
+    @property
+    def wire_time(self) -> float:
+        """Seconds the plans keep the serial line busy, both ways."""
+        return wire_time(self.wire_bytes, self.baud)
+
+    def fits_stream(self, baud: int | None = None) -> bool:
+        """
+        True if a stream frame of these sensors can be sent in one 15 ms
+        stream period, the OI spec leaves it to us not to ask for more.
+
+        :param baud: baud rate to check, the one optimized for by default
+        """
+        return wire_time(self.stream_bytes, baud or self.baud) <= STREAM_PERIOD
+
+
+def _split_list(packets: list[sensors.Sensor], limit: int | None) -> list[list[sensors.Sensor]] | None:
+    """
+    Splits a QUERY_LIST into requests that take at most 'limit' bytes on the
+    wire each (request plus response), None if a packet alone is too big.
+    """
+    chunks: list[list[sensors.Sensor]] = []
+    chunk: list[sensors.Sensor] = []
+    used = 2
+    for pkt in packets:
+        cost = 1 + pkt.size
+        if chunk and (len(chunk) == MAX_LIST_IDS or (limit is not None and used + cost > limit)):
+            chunks.append(chunk)
+            chunk, used = [], 2
+        if limit is not None and 2 + cost > limit:
+            return None
+        chunk.append(pkt)
+        used += cost
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _cover(wanted: frozenset[int],
+           group_cost: Callable[[sensors.SensorBlock], int | None],
+           list_cost: Callable[[list[sensors.Sensor]], int | None]) -> tuple[tuple[int, ...], list[sensors.Sensor]] | None:
+    """
+    Finds the groups, plus a list of the packets they leave out, that cost
+    the least. There are only a few groups, every combination of the ones
+    holding a wanted packet is tried.
+
+    :return: (group ids, leftover packets) or None if nothing fits
+    """
+    candidates = [
+        block for block in sensors.REGISTRY.blocks.values()
+        if wanted.intersection(pkt.id for pkt in block.sensors)
+        and group_cost(block) is not None
+    ]
+    best: tuple[tuple[int, int], tuple[int, ...], list[sensors.Sensor]] | None = None
+    for count in range(len(candidates) + 1):
+        for combo in combinations(candidates, count):
+            covered = {pkt.id for block in combo for pkt in block.sensors}
+            leftover = [sensors.REGISTRY.by_id[i] for i in sorted(wanted - covered)]
+            rest = list_cost(leftover)
+            if rest is None:
+                continue
+            cost = sum(group_cost(block) for block in combo) + rest  # type: ignore[misc]
+            key = (cost, count)
+            if best is None or key < best[0]:
+                best = (key, tuple(block.id for block in combo), leftover)
+    if best is None:
+        return None
+    return best[1], best[2]
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def optimize_query(sensor_list: tuple[str | int, ...], baud: int = 115200, max_time: float | None = None) -> OptimizedQuery:
+    """
+    Works out the requests that read a set of sensors with the fewest bytes
+    on the wire, request and response included. Whole groups are used when
+    they are cheaper than listing their packets, ie the first 12 sensors of
+    group 101 cost 30 bytes as a group and 35 as a list. The result is
+    cached, pass a tuple.
+
+    :param sensor_list: sensor names (str) or ids (int)
+    :param baud: baud rate of the port, for the timings
+    :param max_time: longest a single request may keep the line busy, in
+                     seconds. Longer ones are split, so other commands can
+                     go out in between. No limit by default.
+    :raises ValueError: if a single packet can't be read within max_time
+    :rtype: OptimizedQuery
+    """
+    wanted_packets = compile_sensor_list(sensor_list).packets
+    wanted = frozenset(pkt.id for pkt in wanted_packets)
+    limit = None if max_time is None else int(max_time * baud / BITS_PER_BYTE)
+
+    # SENSORS is opcode + group id, QUERY_LIST opcode + count + one byte per id
+    def query_group(block: sensors.SensorBlock) -> int | None:
+        cost = 2 + block.size
+        return cost if limit is None or cost <= limit else None
+
+    def query_list(packets: list[sensors.Sensor]) -> int | None:
+        chunks = _split_list(packets, limit)
+        if chunks is None:
+            return None
+        return sum(2 + len(chunk) + sum(pkt.size for pkt in chunk) for chunk in chunks)
+
+    found = _cover(wanted, query_group, query_list)
+    if found is None:
+        raise ValueError(f"Can't read {', '.join(pkt.name for pkt in wanted_packets)} in requests of {max_time} s at {baud} baud")
+    groups, leftover = found
+    plans = [compile_sensor_group(group_id) for group_id in groups]
+    for chunk in _split_list(leftover, limit) or []:
+        plans.append(compile_sensor_list(tuple(pkt.id for pkt in chunk)))
+
+    # every packet in a stream frame is preceded by its id, the frame has a
+    # header, a length and a checksum
+    stream_groups, stream_leftover = _cover(
+        wanted, lambda block: 1 + block.size,
+        lambda packets: sum(1 + pkt.size for pkt in packets))  # type: ignore[misc]
+
+    return OptimizedQuery(
+        names=tuple(pkt.name for pkt in wanted_packets),
+        plans=tuple(plans),
+        baud=baud,
+        request_bytes=sum(len(plan.request) for plan in plans),
+        response_bytes=sum(plan.size for plan in plans),
+        stream_packets=stream_groups + tuple(pkt.id for pkt in stream_leftover),
+        stream_bytes=3 + sum(1 + sensors.REGISTRY.packet_sizes[i] for i in stream_groups)
+        + sum(1 + pkt.size for pkt in stream_leftover),
+    )
@@ -0,0 +1,384 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Iterator, Sequence, overload
+from pycreate2.OI import Opcodes
+from pycreate2.query import QueryPlan
+from pycreate2.stream import resolve_stream_packets
+import pycreate2.sensors as sensors
+import pycreate2.logger  # just to set up logging
+import logging
+
+logger = logging.getLogger("create2recorder")
+
+MAGIC = b"PYC2REC\x01"
+VERSION = 1
+
+# every record starts with its time.monotonic() timestamp
+TIMESTAMP = struct.Struct("<d")
+HEADER_SIZE = struct.Struct("<I")
+
+
+def _packet_layout(pkt: sensors.Sensor) -> dict:
+    return {
+        "id": pkt.id,
+        "name": pkt.name,
+        "size": pkt.size,
+        "format": pkt.pack_format()[-1],
+        "range": list(pkt.value_range),
+    }
+
+
+class Recorder(object):
+    """
+    Appends raw sensor responses or stream frames to a binary file, each one
+    with a time.monotonic() timestamp. All records have the same size, so
+    the file can be indexed without reading it, see Recording.
+
+    File layout:
+
+        magic (8 bytes) | header size (uint32 LE) | JSON header | records
+        record: timestamp (float64 LE) | payload (payload_size bytes)
+
+    The JSON header describes the payload: the request that produced it, the
+    packet layout taken from the sensor registry and a struct format that
+    decodes a whole payload. A recording can be read without this library.
+
+    Use for_query() or for_stream() to create one.
+    """
+
+    def __init__(self, path: str, kind: str, request: bytes, packets: Sequence[sensors.Sensor], payload_size: int, layout: str):
+        """
+        Constructor, creates the file or appends to it if it already holds a
+        recording with the same layout.
+
+        :param path: file to write
+        :param kind: "query" for sensor responses, "stream" for stream frames
+        :param request: the command that produced the payloads
+        :param packets: the sensors in the payload, in order
+        :param payload_size: bytes in every payload
+        :param layout: struct format decoding a payload, pad bytes included
+        """
+        self.header = {
+            "version": VERSION,
+            "kind": kind,
+            "request": list(request),
+            "payload_size": payload_size,
+            "record_size": TIMESTAMP.size + payload_size,
+            "layout": layout,
+            "names": [pkt.name for pkt in packets],
+            "packets": [_packet_layout(pkt) for pkt in packets],
+        }
+        self.path = path
+        self.request = bytes(request)
+        self.payload_size = payload_size
+        self.count = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with Recording(path) as old:
+                if old.header["layout"] != layout or old.header["request"] != self.header["request"]:
+                    raise Exception(f"{path} holds a recording with a different layout")
+                self.count = len(old)
+                end = old._offset + len(old) * old.record_size
+            # drop a record left half written by a crash
+            self._file = open(path, "r+b")
+            self._file.truncate(end)
+            self._file.seek(end)
+        else:
+            self._file = open(path, "wb")
+            self._write_header()
+
+    @classmethod
+    def for_query(cls, path: str, plan: QueryPlan) -> "Recorder":
+        """
+        Recorder for the responses of a sensor query, see compile_sensor_list
+        and compile_sensor_group.
+        """
+        layout = plan.decoder.format
+        return cls(path, "query", plan.request, plan.packets, plan.size, layout)
+
+    @classmethod
+    def for_stream(cls, path: str, sensor_list: Sequence[str | int]) -> "Recorder":
+        """
+        Recorder for whole stream frames, header and checksum included.
+
+        :param sensor_list: sensor names (str), sensor ids or group ids (int)
+        """
+        resolved = resolve_stream_packets(sensor_list)
+        request = bytes([Opcodes.STREAM.value, len(resolved), *resolved.keys()])
+        layout = ">xx"
+        packets = []
+        size = 3
+        for pkts in resolved.values():
+            layout += "x" + "".join(pkt.pack_format()[-1] for pkt in pkts)
+            packets += pkts
+            size += 1 + sum(pkt.size for pkt in pkts)
+        layout += "x"
+        return cls(path, "stream", request, packets, size, layout)
+
+    def _write_header(self):
+        header = json.dumps(self.header).encode()
+        self._file.write(MAGIC + HEADER_SIZE.pack(len(header)) + header)
+
+    def record(self, data: bytes | bytearray | memoryview, timestamp: float | None = None):
+        """
+        Appends one payload.
+
+        Payloads of another size (a frame of the old layout right after a
+        stream was reconfigured) don't fit in the file, they are counted in
+        'skipped' and dropped.
+
+        :param data: the raw response or frame, payload_size bytes
+        :param timestamp: when it was received, time.monotonic() by default
+        """
+        if len(data) != self.payload_size:
+            self.skipped += 1
+            if self.skipped == 1:
+                logger.warning(f"Not recording {len(data)} byte payloads, expected {self.payload_size} bytes")
+            return
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._lock:
+            self._file.write(TIMESTAMP.pack(timestamp))
+            self._file.write(data)
+            self.count += 1
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self) -> "Recorder":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Recording(object):
+    """
+    Read-only view of a file written by Recorder. The file is memory mapped,
+    records are only read when they are accessed:
+
+        with Recording("run.rec") as rec:
+            print(len(rec), rec.duration)
+            for timestamp, data in rec[1000:2000]:
+                ...
+            frame = rec.decode(5)  # sensor name -> value
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < len(MAGIC) + HEADER_SIZE.size:
+            self._file.close()
+            raise Exception(f"{path} is not a sensor recording")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise Exception(f"{path} is not a sensor recording")
+        (header_size,) = HEADER_SIZE.unpack_from(self._map, len(MAGIC))
+        start = len(MAGIC) + HEADER_SIZE.size
+        self.header: dict = json.loads(bytes(self._map[start: start + header_size]))
+        self._offset = start + header_size
+
+        self.record_size: int = self.header["record_size"]
+        self.request = bytes(self.header["request"])
+        self.names: tuple[str, ...] = tuple(self.header["names"])
+        self._decoder = struct.Struct(self.header["layout"])
+        # a record being written when the file was opened is ignored
+        self._count = (size - self._offset) // self.record_size
+
+    @property
+    def kind(self) -> str:
+        return self.header["kind"]
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def duration(self) -> float:
+        """Seconds between the first and the last record."""
+        if self._count < 2:
+            return 0.0
+        return self.timestamp(self._count - 1) - self.timestamp(0)
+
+    def _index(self, i: int) -> int:
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("record index out of range")
+        return self._offset + i * self.record_size
+
+    def timestamp(self, i: int) -> float:
+        return TIMESTAMP.unpack_from(self._map, self._index(i))[0]
+
+    def payload(self, i: int) -> memoryview:
+        """The raw bytes of record i, without copying them."""
+        start = self._index(i) + TIMESTAMP.size
+        return self._view[start: start + self.record_size - TIMESTAMP.size]
+
+    def records(self) -> memoryview:
+        """Every record, back to back, without copying them."""
+        return self._view[self._offset: self._offset + self._count * self.record_size]
+
+    @overload
+    def __getitem__(self, i: int) -> tuple[float, memoryview]: ...
+    @overload
+    def __getitem__(self, i: slice) -> list[tuple[float, memoryview]]: ...
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        return self.timestamp(i), self.payload(i)
+
+    def __iter__(self) -> Iterator[tuple[float, memoryview]]:
+        for i in range(self._count):
+            yield self[i]
+
+    def decode(self, i: int) -> dict[str, int]:
+        """Record i decoded into sensor name -> value."""
+        return dict(zip(self.names, self._decoder.unpack_from(self._map, self._index(i) + TIMESTAMP.size)))
+
+    def close(self):
+        # views handed out keep the map alive, it goes away with them
+        try:
+            self._view.release()
+            self._map.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+    def __enter__(self) -> "Recording":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplaySerial(object):
+    """
+    Plays a Recording back through Create2, in place of the serial.Serial in
+    SerialCommandInterface.ser:
+
+        sci = SerialCommandInterface()
+        sci.ser = ReplaySerial(Recording("run.rec"))
+        bot = Create2(sci=sci)
+
+    For a query recording, each time its request is written the next recorded
+    response is returned. For a stream recording, frames start coming once
+    the Stream command is written. With realtime=True they are paced by their
+    timestamps (divided by speed), otherwise they are all available at once.
+    Other commands are accepted and ignored.
+    """
+
+    def __init__(self, recording: Recording, realtime: bool = False, speed: float = 1.0):
+        self.recording = recording
+        self.realtime = realtime
+        self.speed = speed
+        self.port = "replay"
+        self.baudrate = 115200
+        self.timeout: float | None = 1.0
+        self.write_timeout: float | None = None
+        self.is_open = True
+        self.rts = True
+        self.dtr = True
+
+        self._cond = threading.Condition()
+        self._buffer = bytearray()
+        self._next = 0
+        self._start: float | None = None  # when stream playback started
+        self._cancelled = False
+
+    @property
+    def done(self) -> bool:
+        """True once every record has been played back."""
+        return self._next >= len(self.recording)
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def _due(self, now: float) -> float | None:
+        """Time the next stream frame is due, None if there is none."""
+        if self._start is None or self.done:
+            return None
+        if not self.realtime:
+            return now
+        offset = self.recording.timestamp(self._next) - self.recording.timestamp(0)
+        return self._start + offset / self.speed
+
+    def _release(self, now: float):
+        while True:
+            due = self._due(now)
+            if due is None or due > now:
+                return
+            self._buffer += self.recording.payload(self._next)
+            self._next += 1
+
+    @property
+    def in_waiting(self) -> int:
+        with self._cond:
+            self._release(time.monotonic())
+            return len(self._buffer)
+
+    def write(self, data: bytes) -> int:
+        data = bytes(data)
+        with self._cond:
+            request = self.recording.request
+            if self.recording.kind == "query":
+                for _ in range(data.count(request)):
+                    if self.done:
+                        logger.warning("Recording exhausted, no response to replay")
+                        break
+                    self._buffer += self.recording.payload(self._next)
+                    self._next += 1
+            elif data.startswith(request) and self._start is None:
+                self._start = time.monotonic()
+            self._cond.notify_all()
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        deadline = float("inf") if self.timeout is None else time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._release(now)
+                if len(self._buffer) >= size or now >= deadline or self._cancelled:
+                    break
+                # like a real port, wait out the timeout when nothing is coming
+                due = self._due(now)
+                wake = deadline if due is None else min(due, deadline)
+                self._cond.wait(None if wake == float("inf") else wake - now)
+            self._cancelled = False
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            return data
+
+    def flush(self):
+        pass
+
+    def cancel_read(self):
+        with self._cond:
+            self._cancelled = True
+            self._cond.notify_all()
+
+    def reset_input_buffer(self):
+        with self._cond:
+            self._buffer.clear()
+
+    def reset_output_buffer(self):
+        pass
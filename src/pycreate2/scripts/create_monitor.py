@@ -2,13 +2,22 @@
 import argparse
 import pycreate2
 import time
+from collections import deque
+from pycreate2.query import STREAM_PERIOD, compile_sensor_group
+from pycreate2.recorder import Recorder
 from pycreate2.sensors import SensorNames
 
 DESCRIPTION = """
 Prints the raw data from a Create 2. The default packet is 100 which get everything.
 However, this can be changed and a different packet and refresh rates can be selected.
+
+With --live the robot streams packet 100 every 15 ms instead and a dashboard
+shows every value, sparklines of the analog ones and the frame rate.
 """
 
+# from empty to full, one character per sample in a sparkline
+SPARK = " \u2581\u2582\u2583\u2584\u2585\u2586\u2587\u2588"
+
 
 def handleArgs():
     parser = argparse.ArgumentParser(
@@ -17,6 +26,12 @@ def handleArgs():
     parser.add_argument(
         '-s', '--sleep', help='time in seconds between samples, default 1.0', type=float, default=1.0)
     # parser.add_argument('-i', '--id', help='packet ID, default is 100', type=int, default=100)
+    parser.add_argument(
+        '-r', '--record', help='also record every raw response to this file, see pycreate2.recorder', type=str, default=None)
+    parser.add_argument(
+        '-l', '--live', help='live dashboard of a 66 Hz sensor stream, q quits', action='store_true')
+    parser.add_argument(
+        '-f', '--fps', help='dashboard redraws per second, default 30', type=float, default=30.0)
     parser.add_argument(
         'port', help='serial port name, Ex: /dev/ttyUSB0 or COM1', type=str)
 
@@ -101,6 +116,170 @@ class Monitor(object):
         print(f'  Turn Radius: {turn_radius} mm')
 
 
+def sparkline(values, low: int, high: int) -> str:
+    """One block character per value, scaled between low and high."""
+    span = max(high - low, 1)
+    top = len(SPARK) - 1
+    return "".join(SPARK[max(0, min(top, (v - low) * top // span))] for v in values)
+
+
+class LiveMonitor(object):
+    """
+    Curses dashboard fed with every stream frame. The screen is a fixed grid
+    of cells and only the cells whose text changed since the last redraw are
+    written, so a redraw costs a few bytes to the terminal and keeps up with
+    the 66 Hz stream.
+    """
+
+    # (label, sensor) drawn with a sparkline of their last values
+    ANALOG = [
+        ("Light bump left", SensorNames.LIGHT_BUMP_LEFT),
+        ("Light bump front left", SensorNames.LIGHT_BUMP_FRONT_LEFT),
+        ("Light bump center left", SensorNames.LIGHT_BUMP_CENTER_LEFT),
+        ("Light bump center right", SensorNames.LIGHT_BUMP_CENTER_RIGHT),
+        ("Light bump front right", SensorNames.LIGHT_BUMP_FRONT_RIGHT),
+        ("Light bump right", SensorNames.LIGHT_BUMP_RIGHT),
+        ("Cliff left", SensorNames.CLIFF_LEFT_SIGNAL),
+        ("Cliff front left", SensorNames.CLIFF_FRONT_LEFT_SIGNAL),
+        ("Cliff front right", SensorNames.CLIFF_FRONT_RIGHT_SIGNAL),
+        ("Cliff right", SensorNames.CLIFF_RIGHT_SIGNAL),
+        ("Current mA", SensorNames.CURRENT),
+        ("Left motor mA", SensorNames.LEFT_MOTOR_CURRENT),
+        ("Right motor mA", SensorNames.RIGHT_MOTOR_CURRENT),
+        ("Main brush mA", SensorNames.MAIN_BRUSH_CURRENT),
+        ("Side brush mA", SensorNames.SIDE_BRUSH_CURRENT),
+    ]
+
+    # (label, sensor) shown as plain values
+    DIGITAL = [
+        ("Bumps wheeldrops", SensorNames.BUMPS_WHEELDROPS),
+        ("Light bumper", SensorNames.LIGHT_BUMPER),
+        ("Wheel overcurrents", SensorNames.OVERCURRENTS),
+        ("IR left / right", (SensorNames.IR_OPCODE_LEFT, SensorNames.IR_OPCODE_RIGHT)),
+        ("Encoders left / right", (SensorNames.ENCODER_COUNTS_LEFT, SensorNames.ENCODER_COUNTS_RIGHT)),
+        ("Requested vel r / l", (SensorNames.REQUESTED_VELOCITY_RIGHT, SensorNames.REQUESTED_VELOCITY_LEFT)),
+        ("Voltage mV", SensorNames.VOLTAGE),
+        ("Charge / capacity mAh", (SensorNames.BATTERY_CHARGE, SensorNames.BATTERY_CAPACITY)),
+        ("Temperature C", SensorNames.TEMPERATURE),
+        ("Charging state", SensorNames.CHARGING_STATE),
+        ("OI mode", SensorNames.OPEN_INTERFACE_MODE),
+    ]
+
+    LABEL_WIDTH = 24
+    VALUE_WIDTH = 14
+
+    def __init__(self, window, width: int = 40):
+        """
+        :param window: curses window to draw on
+        :param width: samples in every sparkline
+        """
+        self.window = window
+        self.history = {name: deque(maxlen=width) for _, name in self.ANALOG}
+        self.width = width
+        self.latest: dict[str, int] = {}
+        self.frames = 0
+        self.cells_written = 0
+        self._cells: dict[tuple[int, int], str] = {}
+        self._start: float | None = None
+        self._counts: deque[tuple[float, int]] = deque()
+
+    def add(self, frame: dict[str, int]):
+        """Takes in one stream frame."""
+        for name, values in self.history.items():
+            values.append(frame[name])
+        self.latest = frame
+        self.frames += 1
+
+    def rate(self, now: float) -> float:
+        """Frames per second over about the last second."""
+        self._counts.append((now, self.frames))
+        while len(self._counts) > 2 and now - self._counts[1][0] >= 1.0:
+            self._counts.popleft()
+        then, frames = self._counts[0]
+        return (self.frames - frames) / (now - then) if now > then else 0.0
+
+    def dropped(self, now: float) -> int:
+        """Frames the robot should have sent since the first one but didn't arrive."""
+        if self._start is None:
+            if not self.frames:
+                return 0
+            self._start = now - STREAM_PERIOD * self.frames
+        return max(0, round((now - self._start) / STREAM_PERIOD) - self.frames)
+
+    def cells(self, errors: int, now: float) -> list[tuple[int, int, str]]:
+        """Every cell of the screen, (row, column, text)."""
+        out = [
+            (0, 0, "Create 2 live monitor, q to quit"),
+            (1, 0, f"{self.rate(now):6.1f} Hz  frames {self.frames:<9d} dropped {self.dropped(now):<7d} errors {errors:<7d}"),
+        ]
+        column = self.LABEL_WIDTH + self.VALUE_WIDTH
+        row = 3
+        for label, name in self.ANALOG:
+            values = self.history[name]
+            out.append((row, 0, label))
+            if values:
+                out.append((row, self.LABEL_WIDTH, f"{values[-1]:<{self.VALUE_WIDTH}d}"))
+                out.append((row, column, sparkline(values, min(values), max(values)).ljust(self.width)))
+            row += 1
+        row += 1
+        for label, names in self.DIGITAL:
+            out.append((row, 0, label))
+            if self.latest:
+                if isinstance(names, str):
+                    text = str(self.latest[names])
+                else:
+                    text = " / ".join(str(self.latest[name]) for name in names)
+                out.append((row, self.LABEL_WIDTH, text.ljust(self.VALUE_WIDTH)))
+            row += 1
+        return out
+
+    def draw(self, errors: int, now: float):
+        """Writes the cells that changed and refreshes the terminal."""
+        for row, column, text in self.cells(errors, now):
+            if self._cells.get((row, column)) == text:
+                continue
+            try:
+                self.window.addstr(row, column, text)
+            except Exception:
+                continue  # off a small terminal, try again on the next redraw
+            self._cells[(row, column)] = text
+            self.cells_written += 1
+        self.window.refresh()
+
+
+def live(bot: pycreate2.Create2, record: str | None, fps: float):
+    """
+    Runs the dashboard until q is pressed. Every frame reaches the
+    sparklines, the screen is redrawn 'fps' times a second.
+    """
+    import curses  # not there on every platform, only needed here
+
+    recorder = Recorder.for_stream(record, [100]) if record else None
+    frames: deque[dict[str, int]] = deque()  # filled by the stream thread
+    stream = bot.start_stream([100], recorder)
+    stream.on_frame = frames.append
+
+    def run(window):
+        try:
+            curses.curs_set(0)
+        except curses.error:
+            pass
+        window.nodelay(True)
+        mon = LiveMonitor(window)
+        while window.getch() not in (ord('q'), 27):
+            while frames:
+                mon.add(frames.popleft())
+            mon.draw(stream.error_count, time.monotonic())
+            time.sleep(1.0 / fps)
+
+    try:
+        curses.wrapper(run)
+    finally:
+        bot.stop_stream()
+        if recorder is not None:
+            recorder.close()
+
+
 def main():
     # get command line args
     args = handleArgs()
@@ -115,6 +294,19 @@ def main():
     bot.start()
     bot.safe()
 
+    if args['live']:
+        try:
+            live(bot, args['record'], args['fps'])
+        except KeyboardInterrupt:
+            pass
+        print('bye ... ')
+        return
+
+    recorder = None
+    if args['record']:
+        recorder = Recorder.for_query(args['record'], compile_sensor_group(100))
+        bot.query_recorder = recorder
+
     # now run forever, until someone hits ctrl-C
     try:
         while True:
@@ -129,6 +321,9 @@ def main():
                 raise
     except KeyboardInterrupt:
         print('bye ... ')
+    finally:
+        if recorder is not None:
+            recorder.close()
 
 
 if __name__ == '__main__':
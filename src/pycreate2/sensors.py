@@ -1,4 +1,6 @@
 from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Iterable, Mapping
 import sys
 import struct
 import pycreate2.logger
@@ -195,24 +197,85 @@ SENSORS = {
 }
 
 
+# Bytes returned for every packet group, as listed in the OI spec. The Create 2
+# spec only defines groups 0-6, 100, 101, 106 and 107.
+GROUP_SIZES = {0: 26, 1: 10, 2: 6, 3: 10, 4: 14, 5: 12, 6: 52, 100: 80, 101: 28, 106: 12, 107: 9}
+
+
+@dataclass(frozen=True)
+class SensorBlock:
+    """Layout of a packet group: its sensors in wire order and where each one starts."""
+    id: int
+    sensors: tuple[Sensor, ...]
+    offsets: tuple[int, ...]
+    size: int
+
+
+class SensorRegistry(object):
+    """
+    Read-only index over the sensor packets, built once at import. Gives O(1)
+    lookups by id and by name, the layout of every packet group and the
+    response size of any packet or group id.
+    """
+
+    def __init__(self, sensor_list: Iterable[Sensor]):
+        sensor_list = sorted(sensor_list, key=lambda s: s.id)
+        self.by_id: Mapping[int, Sensor] = MappingProxyType(
+            {pkt.id: pkt for pkt in sensor_list})
+        self.by_name: Mapping[str, Sensor] = MappingProxyType(
+            {pkt.name: pkt for pkt in sensor_list})
+
+        blocks: dict[int, SensorBlock] = {}
+        for group_id in sorted({g for pkt in sensor_list for g in pkt.membership}):
+            members = tuple(pkt for pkt in sensor_list if group_id in pkt.membership)
+            offsets = []
+            offset = 0
+            for pkt in members:
+                offsets.append(offset)
+                offset += pkt.size
+            blocks[group_id] = SensorBlock(group_id, members, tuple(offsets), offset)
+        self.blocks: Mapping[int, SensorBlock] = MappingProxyType(blocks)
+
+        sizes = {pkt.id: pkt.size for pkt in sensor_list}
+        sizes.update({block.id: block.size for block in blocks.values()})
+        self.packet_sizes: Mapping[int, int] = MappingProxyType(sizes)
+
+        self.check()
+
+    def check(self):
+        """
+        Validates the packet groups against the byte totals in the OI spec.
+
+        :raises ValueError: if a group is missing or its size is wrong
+        """
+        for group_id, size in GROUP_SIZES.items():
+            block = self.blocks.get(group_id)
+            if block is None:
+                raise ValueError(f"Sensor group {group_id} has no sensors")
+            if block.size != size:
+                raise ValueError(
+                    f"Sensor group {group_id} is {block.size} bytes, the OI spec says {size}")
+        for group_id in self.blocks:
+            if group_id not in GROUP_SIZES:
+                raise ValueError(f"Sensor group {group_id} is not in the OI spec")
+
+
+REGISTRY = SensorRegistry(SENSORS.values())
+
+
 def get_sensor_by_id(id: int) -> Sensor | None:
     """Return the SensorPacket with the given id, or None if not found."""
-    for pkt in SENSORS.values():
-        if pkt.id == id:
-            return pkt
-    return None
+    return REGISTRY.by_id.get(id, None)
 
 
 def get_sensor_by_name(name: str) -> Sensor | None:
     """Return the SensorPacket with the given name, or None if not found."""
-    return SENSORS.get(name, None)
+    return REGISTRY.by_name.get(name, None)
 
 
 def get_sensor_block(id: int) -> list[Sensor]:
     """Return a list of SensorPackets that belong to the given block id."""
-    block_sensors = []
-    for pkt in SENSORS.values():
-        if id in pkt.membership:
-            block_sensors.append(pkt)
-    block_sensors.sort(key=lambda s: s.id)
-    return block_sensors
+    block = REGISTRY.blocks.get(id, None)
+    if block is None:
+        return []
+    return list(block.sensors)
@@ -0,0 +1,431 @@
+import math
+import os
+import select
+import threading
+import time
+import pycreate2.sensors as sensors
+from pycreate2.sensors import SensorNames
+from pycreate2.OI import Modes, Opcodes, Robot, command_size
+import pycreate2.logger  # just to set up logging
+import logging
+
+logger = logging.getLogger("create2sim")
+
+STREAM_PERIOD = 0.015  # the robot sends a stream frame every 15 ms
+
+RESET_MESSAGE = (
+    b"bl-start\r\nSTR730\r\nbootloader id: #x47186549 82ECCFFF\r\n"
+    b"bootloader info rev: #xF000\r\nbootloader rev: #x0001\r\n"
+    b"2007-05-14-1715-L   \r\nRoomba by iRobot!\r\n"
+)
+
+# Sensor values reported when nothing else sets them
+DEFAULT_VALUES = {
+    SensorNames.VOLTAGE: 15000,
+    SensorNames.CURRENT: -200,
+    SensorNames.TEMPERATURE: 25,
+    SensorNames.BATTERY_CHARGE: 2500,
+    SensorNames.BATTERY_CAPACITY: 2696,
+}
+
+
+def wrap16(value: int) -> int:
+    """Wraps an integer into the signed 16 bit range, like the encoder counters."""
+    return ((value + 0x8000) & 0xFFFF) - 0x8000
+
+
+class Create2Simulator(object):
+    """
+    Software Create 2 that speaks the Open Interface. It keeps its own clock,
+    so it can run as fast as the caller wants: feed it the bytes written to
+    the robot with receive() and move time forward with advance().
+
+    It tracks the OI mode, answers SENSORS and QUERY_LIST with correctly sized
+    packets, streams frames every 15 ms, integrates DRIVE / DRIVE_DIRECT /
+    DRIVE_PWM into a pose and wheel encoder counts (16 bit, wrapping) and
+    plays songs for their real duration. Sensors it does not model come from
+    the 'values' dictionary, which tests can change at will.
+    """
+
+    def __init__(self):
+        self.time = 0.0
+        self.mode = Modes.OFF
+
+        # pose in mm and radians, x forward at start
+        self.x = 0.0
+        self.y = 0.0
+        self.theta = 0.0
+
+        # requested wheel speeds in mm/s and what was asked for
+        self.velocity_right = 0.0
+        self.velocity_left = 0.0
+        self.requested_velocity = 0
+        self.requested_radius = 0
+
+        self._ticks_left = 0.0
+        self._ticks_right = 0.0
+        # distance / angle since they were last reported
+        self._distance = 0.0
+        self._angle = 0.0
+
+        self.songs: dict[int, tuple[int, ...]] = {}
+        self.song_number = 0
+        self._song_end = 0.0
+
+        self.leds = (0, 0, 0)
+        self.display = b"    "
+        self.motors = 0
+
+        self.stream_packets: tuple[int, ...] = ()
+        self.stream_paused = True
+        self._next_frame = 0.0
+
+        self.values: dict[str, int] = dict(DEFAULT_VALUES)
+        self.commands: list[bytes] = []
+        self._pending = bytearray()
+
+    # ----------------------------- time -------------------------------------
+
+    @property
+    def song_playing(self) -> bool:
+        return self.time < self._song_end
+
+    def advance(self, dt: float) -> bytes:
+        """
+        Moves the clock forward by dt seconds and returns the stream frames
+        sent meanwhile.
+        """
+        return self.advance_to(self.time + dt)
+
+    def advance_to(self, t: float) -> bytes:
+        """
+        Moves the clock forward to t and returns the stream frames sent meanwhile.
+        """
+        out = bytearray()
+        while self._streaming() and self._next_frame <= t:
+            self._integrate(self._next_frame - self.time)
+            out += self.stream_frame()
+            self._next_frame += STREAM_PERIOD
+        if t > self.time:
+            self._integrate(t - self.time)
+        return bytes(out)
+
+    def next_frame_time(self) -> float | None:
+        """When the next stream frame is due, None if not streaming."""
+        return self._next_frame if self._streaming() else None
+
+    def _streaming(self) -> bool:
+        return bool(self.stream_packets) and not self.stream_paused and self.mode != Modes.OFF
+
+    def _integrate(self, dt: float):
+        if dt <= 0:
+            return
+        left = self.velocity_left * dt
+        right = self.velocity_right * dt
+        distance = (left + right) / 2.0
+        dtheta = (right - left) / Robot.WHEEL_BASE.value
+
+        heading = self.theta + dtheta / 2.0
+        self.x += distance * math.cos(heading)
+        self.y += distance * math.sin(heading)
+        self.theta += dtheta
+
+        self._ticks_left += left / Robot.TICK_TO_DISTANCE.value
+        self._ticks_right += right / Robot.TICK_TO_DISTANCE.value
+        self._distance += distance
+        self._angle += math.degrees(dtheta)
+        self.time += dt
+
+    # ----------------------------- commands ---------------------------------
+
+    def receive(self, data: bytes) -> bytes:
+        """
+        Handles bytes written to the robot and returns its immediate answer.
+        """
+        self._pending += data
+        out = bytearray()
+        while True:
+            try:
+                size = command_size(self._pending)
+            except KeyError:
+                logger.warning(f"Dropping unknown opcode {self._pending[0]}")
+                del self._pending[:1]
+                continue
+            if size is None or size > len(self._pending):
+                break
+            cmd = bytes(self._pending[:size])
+            del self._pending[:size]
+            self.commands.append(cmd)
+            out += self._execute(cmd)
+        return bytes(out)
+
+    def _execute(self, cmd: bytes) -> bytes:
+        op = cmd[0]
+        data = cmd[1:]
+
+        if op == Opcodes.START.value:
+            self.mode = Modes.PASSIVE
+            return b""
+        if op == Opcodes.RESET.value:
+            self.__init__()
+            return RESET_MESSAGE
+        if self.mode == Modes.OFF:
+            return b""  # only START and RESET work while off
+
+        if op == Opcodes.STOP.value:
+            self.mode = Modes.OFF
+            self._set_wheels(0, 0)
+        elif op in (Opcodes.SAFE.value, Opcodes.FULL.value):
+            self.mode = Modes.SAFE if op == Opcodes.SAFE.value else Modes.FULL
+        elif op == Opcodes.POWER.value:
+            self.mode = Modes.PASSIVE
+            self._set_wheels(0, 0)
+        elif op == Opcodes.SENSORS.value:
+            return self.packet_bytes(data[0])
+        elif op == Opcodes.QUERY_LIST.value:
+            return b"".join(self.packet_bytes(pid) for pid in data[1:])
+        elif op == Opcodes.STREAM.value:
+            self.stream_packets = tuple(data[1:])
+            self.stream_paused = False
+            self._next_frame = self.time + STREAM_PERIOD
+        elif op == Opcodes.PAUSE_RESUME_STREAM.value:
+            if self.stream_paused and data[0]:
+                self._next_frame = self.time + STREAM_PERIOD
+            self.stream_paused = not data[0]
+        elif op == Opcodes.SONG.value:
+            self.songs[data[0]] = tuple(data[2:])
+        elif self.mode == Modes.PASSIVE:
+            pass  # actuators need safe or full mode
+        elif op == Opcodes.DRIVE_DIRECT.value:
+            right = int.from_bytes(data[0:2], "big", signed=True)
+            left = int.from_bytes(data[2:4], "big", signed=True)
+            self._set_wheels(right, left)
+        elif op == Opcodes.DRIVE.value:
+            self._drive(int.from_bytes(data[0:2], "big", signed=True),
+                        int.from_bytes(data[2:4], "big", signed=False))
+        elif op == Opcodes.DRIVE_PWM.value:
+            right = int.from_bytes(data[0:2], "big", signed=True)
+            left = int.from_bytes(data[2:4], "big", signed=True)
+            self._set_wheels(right * 500 // 255, left * 500 // 255)
+        elif op == Opcodes.PLAY.value:
+            notes = self.songs.get(data[0])
+            if notes is not None and not self.song_playing:
+                self.song_number = data[0]
+                self._song_end = self.time + sum(notes[1::2]) / 64.0
+        elif op == Opcodes.LED.value:
+            self.leds = (data[0], data[1], data[2])
+        elif op == Opcodes.DIGIT_LED_ASCII.value:
+            self.display = bytes(data)
+        elif op == Opcodes.MOTORS.value:
+            self.motors = data[0]
+        return b""
+
+    def _set_wheels(self, right: int, left: int):
+        self.velocity_right = float(max(-500, min(500, right)))
+        self.velocity_left = float(max(-500, min(500, left)))
+        self.requested_velocity = int((self.velocity_right + self.velocity_left) / 2)
+
+    def _drive(self, velocity: int, radius: int):
+        velocity = max(-500, min(500, velocity))
+        self.requested_radius = wrap16(radius)
+        half_base = Robot.WHEEL_BASE.value / 2.0
+        if radius in (0x8000, 0x7FFF, 0):
+            self._set_wheels(velocity, velocity)
+        elif radius == 0xFFFF:  # turn in place clockwise
+            self._set_wheels(-velocity, velocity)
+        elif radius == 0x0001:  # turn in place counter-clockwise
+            self._set_wheels(velocity, -velocity)
+        else:
+            r = wrap16(radius)
+            self._set_wheels(round(velocity * (r + half_base) / r),
+                             round(velocity * (r - half_base) / r))
+        self.requested_velocity = velocity
+
+    # ----------------------------- sensors ----------------------------------
+
+    def sensor_value(self, pkt: sensors.Sensor) -> int:
+        """
+        Current value of one sensor. Distance and Angle reset when read, like
+        on the robot.
+        """
+        name = pkt.name
+        if name == SensorNames.ENCODER_COUNTS_LEFT:
+            return wrap16(round(self._ticks_left))
+        if name == SensorNames.ENCODER_COUNTS_RIGHT:
+            return wrap16(round(self._ticks_right))
+        if name == SensorNames.DISTANCE:
+            value = round(self._distance)
+            self._distance -= value
+            return value
+        if name == SensorNames.ANGLE:
+            value = round(self._angle)
+            self._angle -= value
+            return value
+        if name == SensorNames.OPEN_INTERFACE_MODE:
+            return self.mode.value
+        if name == SensorNames.SONG_NUMBER:
+            return self.song_number
+        if name == SensorNames.SONG_PLAYING:
+            return int(self.song_playing)
+        if name == SensorNames.OI_STREAM_NUM_PACKETS:
+            return len(self.stream_packets)
+        if name == SensorNames.VELOCITY:
+            return self.requested_velocity
+        if name == SensorNames.REQUESTED_RADIUS:
+            return self.requested_radius
+        if name == SensorNames.REQUESTED_VELOCITY_RIGHT:
+            return int(self.velocity_right)
+        if name == SensorNames.REQUESTED_VELOCITY_LEFT:
+            return int(self.velocity_left)
+        return self.values.get(name, pkt.value_range[0] if pkt.value_range[0] > 0 else 0)
+
+    def packet_bytes(self, packet_id: int) -> bytes:
+        """
+        Encoded data of a sensor packet or packet group, as the robot sends it.
+        """
+        pkt = sensors.REGISTRY.by_id.get(packet_id)
+        if pkt is not None:
+            return pkt.pack(self.sensor_value(pkt))
+        block = sensors.REGISTRY.blocks.get(packet_id)
+        if block is None:
+            logger.warning(f"Unknown sensor packet {packet_id}")
+            return b""
+        return b"".join(pkt.pack(self.sensor_value(pkt)) for pkt in block.sensors)
+
+    def stream_frame(self) -> bytes:
+        """
+        One stream frame with the packets requested by the last Stream command.
+        """
+        payload = bytearray()
+        for pid in self.stream_packets:
+            payload.append(pid)
+            payload += self.packet_bytes(pid)
+        frame = bytes([19, len(payload)]) + payload
+        return frame + bytes([-sum(frame) & 0xFF])
+
+
+class SimulatedSerial(object):
+    """
+    In-process serial.Serial stand-in wired to a Create2Simulator running on
+    virtual time: nothing ever sleeps. Writing advances the simulator by the
+    time the bytes take on the wire and reads that need a stream frame move
+    the clock to when it is sent. Use advance() to let time pass, ie while
+    the robot drives.
+    """
+
+    def __init__(self, sim: Create2Simulator | None = None, baudrate: int = 115200):
+        self.sim = sim if sim is not None else Create2Simulator()
+        self.port = "simulator"
+        self.baudrate = baudrate
+        self.timeout: float | None = 1.0
+        self.write_timeout: float | None = None
+        self.is_open = True
+        self.rts = True
+        self.dtr = True
+        self._out = bytearray()
+        self._lock = threading.Lock()
+
+    @property
+    def byte_time(self) -> float:
+        return 10.0 / self.baudrate
+
+    def advance(self, dt: float):
+        """Lets dt seconds of virtual time pass."""
+        with self._lock:
+            self._out += self.sim.advance(dt)
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self._out)
+
+    def write(self, data: bytes) -> int:
+        with self._lock:
+            self._out += self.sim.advance(len(data) * self.byte_time)
+            reply = self.sim.receive(bytes(data))
+            self._out += self.sim.advance(len(reply) * self.byte_time)
+            self._out += reply
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        with self._lock:
+            waited = 0.0
+            limit = float("inf") if self.timeout is None else self.timeout
+            while len(self._out) < size:
+                due = self.sim.next_frame_time()
+                if due is None or waited + due - self.sim.time > limit:
+                    break
+                waited += due - self.sim.time
+                self._out += self.sim.advance_to(due)
+            data = bytes(self._out[:size])
+            del self._out[:size]
+            return data
+
+    def flush(self):
+        pass
+
+    def cancel_read(self):
+        pass
+
+    def reset_input_buffer(self):
+        with self._lock:
+            self._out.clear()
+
+    def reset_output_buffer(self):
+        pass
+
+
+class PtySimulator(object):
+    """
+    Runs a Create2Simulator in real time behind a pseudo terminal, so anything
+    that opens a serial port (Create2, create_monitor, ...) can talk to it:
+
+        sim = PtySimulator()
+        sim.start()
+        bot = Create2(sim.port)
+    """
+
+    def __init__(self, sim: Create2Simulator | None = None):
+        self.sim = sim if sim is not None else Create2Simulator()
+        self._master, self._slave = os.openpty()
+        self.port = os.ttyname(self._slave)
+        self._running = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._start = 0.0
+
+    def start(self):
+        self._start = time.monotonic() - self.sim.time
+        self._running.set()
+        self._thread = threading.Thread(
+            target=self._run, name="create2sim", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
+        os.close(self._master)
+        os.close(self._slave)
+
+    def _run(self):
+        while self._running.is_set():
+            now = time.monotonic() - self._start
+            due = self.sim.next_frame_time()
+            wait = 0.05 if due is None else max(0.0, due - now)
+            ready, _, _ = select.select([self._master], [], [], min(wait, 0.05))
+
+            out = self.sim.advance_to(time.monotonic() - self._start)
+            if ready:
+                try:
+                    data = os.read(self._master, 1024)
+                except OSError:
+                    break
+                out += self.sim.receive(data)
+            if out:
+                os.write(self._master, out)
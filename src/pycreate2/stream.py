@@ -0,0 +1,388 @@
+import threading
+import time
+import pycreate2.sensors as sensors
+from typing import TYPE_CHECKING, Callable, Sequence
+from pycreate2.createSerial import SerialCommandInterface
+from pycreate2.OI import Opcodes
+import pycreate2.logger  # just to set up logging
+import logging
+
+if TYPE_CHECKING:
+    from pycreate2.history import SensorHistory
+    from pycreate2.recorder import Recorder
+
+logger = logging.getLogger("create2stream")
+
+STREAM_HEADER = 19
+
+
+def resolve_stream_packets(sensor_list: Sequence[str | int]) -> dict[int, list[sensors.Sensor]]:
+    """
+    Resolve a list of sensor names, sensor ids or group ids into the packets
+    that will show up in a stream frame.
+
+    :param sensor_list: list of sensor names (str), sensor ids or group ids (int)
+    :type sensor_list: Sequence[str | int]
+    :return: packet id to the sensors contained in that packet
+    :rtype: dict[int, list[sensors.Sensor]]
+    """
+    packets: dict[int, list[sensors.Sensor]] = {}
+    for s in sensor_list:
+        if isinstance(s, str):
+            pkt = sensors.get_sensor_by_name(s)
+            assert pkt is not None, f"Sensor name '{s}' not found"
+            packets[pkt.id] = [pkt]
+        elif isinstance(s, int):
+            pkt = sensors.get_sensor_by_id(s)
+            if pkt is not None:
+                packets[pkt.id] = [pkt]
+                continue
+            block = sensors.REGISTRY.blocks.get(s)
+            assert block is not None, f"Sensor or group id '{s}' not found"
+            packets[s] = list(block.sensors)
+        else:
+            raise Exception(
+                f"Sensor list must contain strings or integers, got {type(s)}"
+            )
+    return packets
+
+
+# every packet id that can show up in a stream frame and what it decodes to
+STREAM_PACKETS: dict[int, tuple[sensors.Sensor, ...]] = {
+    pkt.id: (pkt,) for pkt in sensors.REGISTRY.by_id.values()
+}
+STREAM_PACKETS.update(
+    {block.id: block.sensors for block in sensors.REGISTRY.blocks.values()})
+STREAM_PACKET_SIZES = sensors.REGISTRY.packet_sizes
+
+
+class StreamParser(object):
+    """
+    Incremental parser for OI stream frames.
+
+    Bytes are copied once into a preallocated buffer and frames are decoded in
+    place through a memoryview. Data can be fed in any chunk size, down to a
+    single byte at a time. When a frame is corrupted only its header byte is
+    dropped and parsing carries on from the next header, so one glitch costs
+    one frame instead of the whole input buffer.
+
+    Counters:
+        frames: frames successfully decoded
+        checksum_errors: candidate frames whose checksum did not add up
+        format_errors: frames with a good checksum but unknown packet ids,
+                       mismatched length or out of range values
+        discarded_bytes: bytes thrown away while looking for a header
+    """
+
+    MAX_FRAME = 255 + 3  # header, n-bytes, payload, checksum
+
+    def __init__(self, capacity: int = 1024):
+        """
+        Constructor.
+
+        :param capacity: size of the internal buffer, at least one full frame
+        :type capacity: int
+        """
+        assert capacity >= self.MAX_FRAME, f"capacity must be at least {self.MAX_FRAME} bytes"
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._head = 0
+        self._tail = 0
+
+        # called with the raw bytes of every good frame, ie to record them
+        self.on_frame: Callable[[memoryview], None] | None = None
+
+        self.frames = 0
+        self.checksum_errors = 0
+        self.format_errors = 0
+        self.discarded_bytes = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of bytes buffered but not parsed into a frame yet."""
+        return self._tail - self._head
+
+    def reset(self):
+        """Drops any buffered bytes, the counters are kept."""
+        self._head = self._tail = 0
+
+    def feed(self, data: bytes | bytearray | memoryview) -> list[dict[str, int]]:
+        """
+        Adds raw bytes and returns every frame completed by them, oldest first.
+
+        :param data: raw bytes from the robot
+        :type data: bytes | bytearray | memoryview
+        :return: list of decoded frames (sensor name to value)
+        :rtype: list[dict[str, int]]
+        """
+        frames: list[dict[str, int]] = []
+        src = memoryview(data)
+        capacity = len(self._buf)
+        while len(src) > 0:
+            if self._tail == capacity:
+                self._compact()
+            n = min(len(src), capacity - self._tail)
+            self._view[self._tail: self._tail + n] = src[:n]
+            self._tail += n
+            src = src[n:]
+            self._parse(frames)
+        return frames
+
+    def _compact(self):
+        size = self._tail - self._head
+        self._view[:size] = self._view[self._head: self._tail]
+        self._head = 0
+        self._tail = size
+
+    def _parse(self, frames: list[dict[str, int]]):
+        buf = self._buf
+        view = self._view
+        head = self._head
+        tail = self._tail
+        while True:
+            start = buf.find(STREAM_HEADER, head, tail)
+            if start < 0:
+                self.discarded_bytes += tail - head
+                head = tail
+                break
+            if start > head:
+                self.discarded_bytes += start - head
+                head = start
+            if tail - head < 2:
+                break
+            end = head + buf[head + 1] + 3
+            if end > tail:
+                break
+
+            if sum(view[head:end]) & 0xFF != 0:
+                self.checksum_errors += 1
+            else:
+                frame = self._decode(view, head + 2, end - 1)
+                if frame is not None:
+                    if self.on_frame is not None:
+                        self.on_frame(view[head:end])
+                    frames.append(frame)
+                    self.frames += 1
+                    head = end
+                    continue
+                self.format_errors += 1
+
+            # not a real frame, drop the header and look for the next one
+            self.discarded_bytes += 1
+            head += 1
+
+        if head == tail:
+            head = tail = 0
+        self._head = head
+        self._tail = tail
+
+    @staticmethod
+    def _decode(view: memoryview, index: int, end: int) -> dict[str, int] | None:
+        sensor_data: dict[str, int] = {}
+        while index < end:
+            packet = STREAM_PACKETS.get(view[index])
+            if packet is None:
+                return None
+            index += 1
+            if index + STREAM_PACKET_SIZES[view[index - 1]] > end:
+                return None
+            for pkt in packet:
+                try:
+                    sensor_data[pkt.name] = pkt.unpack(
+                        view[index: index + pkt.size])
+                except ValueError:
+                    return None
+                index += pkt.size
+        return sensor_data
+
+
+class SensorStream(object):
+    """
+    Streams sensor packets from the Create2 using the OI Stream command and
+    decodes them in a background thread. The most recent frame can be read at
+    any time without touching the serial port.
+
+    A stream frame looks like:
+
+        [19][n-bytes][packet id 1][data 1][packet id 2][data 2]...[checksum]
+
+    where n-bytes counts everything between itself and the checksum, and the
+    checksum makes the 8 bit sum of the whole frame equal 0.
+    """
+
+    def __init__(self, sci: SerialCommandInterface, sensor_list: Sequence[str | int], recorder: "Recorder | None" = None, history: "SensorHistory | None" = None):
+        """
+        Constructor.
+
+        :param sci: an opened serial command interface
+        :type sci: SerialCommandInterface
+        :param sensor_list: sensor names (str), sensor ids or group ids (int) to stream
+        :type sensor_list: Sequence[str | int]
+        :param recorder: if given, every good frame is recorded, see Recorder.for_stream
+        :type recorder: Recorder | None
+        :param history: if given, every decoded frame is appended to it, see
+                        SensorHistory.for_stream
+        :type history: SensorHistory | None
+        """
+        self.SCI = sci
+        self.packets = resolve_stream_packets(sensor_list)
+        self.frame_count = 0
+        self.parser = StreamParser()
+        if recorder is not None:
+            self.parser.on_frame = recorder.record
+        self.history = history
+        # called with every decoded frame, from the reader thread
+        self.on_frame: Callable[[dict[str, int]], None] | None = None
+
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._frame: dict[str, int] | None = None
+        self._frame_time = 0.0
+        self._running = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._running.is_set()
+
+    @property
+    def error_count(self) -> int:
+        """Number of corrupted frames dropped so far."""
+        return self.parser.checksum_errors + self.parser.format_errors
+
+    def start(self):
+        """
+        Sends the Stream command and starts the background reader.
+        """
+        if self.running:
+            return
+
+        msg = (len(self.packets),) + tuple(self.packets.keys())
+        self.SCI.write(Opcodes.STREAM.value, msg, True)
+
+        self._running.set()
+        self._thread = threading.Thread(
+            target=self._run, name="create2stream", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        """
+        Pauses the stream on the robot and stops the background reader.
+
+        :param timeout: how long to wait for the reader thread to exit
+        :type timeout: float
+        """
+        if not self.running:
+            return
+
+        self.pause()
+        self._running.clear()
+        cancel_read = getattr(self.SCI.ser, "cancel_read", None)
+        if cancel_read is not None:
+            cancel_read()
+        if self._thread is not None:
+            # a frame callback may stop the stream from the reader itself
+            if self._thread is not threading.current_thread():
+                self._thread.join(timeout)
+            self._thread = None
+
+    def pause(self):
+        """
+        Asks the robot to stop sending frames without forgetting the packet list.
+        """
+        self.SCI.write(Opcodes.PAUSE_RESUME_STREAM.value, (0,), True)
+
+    def resume(self):
+        """
+        Asks the robot to resume sending frames with the last packet list.
+        """
+        self.SCI.write(Opcodes.PAUSE_RESUME_STREAM.value, (1,), True)
+
+    def reconfigure(self, sensor_list: Sequence[str | int]):
+        """
+        Switches a running stream to another packet list. The robot is paused
+        and restarted with the new list in one write, the reader thread and
+        the parser carry on, so no frame already on its way is lost.
+
+        :param sensor_list: sensor names (str), sensor ids or group ids (int) to stream
+        :type sensor_list: Sequence[str | int]
+        """
+        self.packets = resolve_stream_packets(sensor_list)
+        if not self.running:
+            return
+        with self.SCI.batch():
+            self.SCI.write(Opcodes.PAUSE_RESUME_STREAM.value, (0,))
+            msg = (len(self.packets),) + tuple(self.packets.keys())
+            self.SCI.write(Opcodes.STREAM.value, msg)
+
+    def latest(self) -> dict[str, int] | None:
+        """
+        Returns the most recently decoded frame, or None if nothing has been
+        received yet. Never blocks on the serial port.
+        """
+        with self._lock:
+            return self._frame
+
+    def age(self) -> float:
+        """
+        Returns the time in seconds since the last frame was decoded.
+        """
+        with self._lock:
+            return time.monotonic() - self._frame_time
+
+    def wait_frame(self, timeout: float | None = None) -> dict[str, int] | None:
+        """
+        Blocks until the next frame is decoded and returns it.
+
+        :param timeout: seconds to wait, None waits forever
+        :type timeout: float | None
+        :return: the new frame or None on timeout
+        """
+        with self._new_frame:
+            count = self.frame_count
+            self._new_frame.wait_for(
+                lambda: self.frame_count != count, timeout)
+            return self._frame if self.frame_count != count else None
+
+    def feed(self, data: bytes) -> int:
+        """
+        Adds raw bytes read from the serial port and decodes every complete
+        frame found in them.
+
+        :param data: raw bytes from the robot
+        :type data: bytes
+        :return: number of frames decoded
+        :rtype: int
+        """
+        frames = self.parser.feed(data)
+        if frames:
+            if self.history is not None:
+                now = time.monotonic()
+                for frame in frames:
+                    self.history.append(frame, now)
+            if self.on_frame is not None:
+                for frame in frames:
+                    self.on_frame(frame)
+            with self._new_frame:
+                self._frame = frames[-1]
+                self._frame_time = time.monotonic()
+                self.frame_count += len(frames)
+                self._new_frame.notify_all()
+        return len(frames)
+
+    def _run(self):
+        ser = self.SCI.ser
+        while self._running.is_set():
+            try:
+                data = ser.read(ser.in_waiting or 1)
+            except Exception as e:
+                logger.error(f"Stream reader stopped: {e}")
+                self._running.clear()
+                break
+            if not data:
+                continue
+            try:
+                self.feed(data)
+            except Exception as e:
+                # a failing consumer must not take the reader down with it
+                logger.error(f"Stream frame dropped: {e}")
@@ -0,0 +1,141 @@
+import threading
+from typing import TYPE_CHECKING, Callable, Sequence
+from pycreate2.query import STREAM_PERIOD, optimize_query
+from pycreate2.stream import SensorStream
+import pycreate2.logger  # just to set up logging
+import logging
+
+if TYPE_CHECKING:
+    from pycreate2.create2api import Create2
+
+logger = logging.getLogger("create2subscriptions")
+
+
+class Subscription(object):
+    """
+    One consumer of sensor data, returned by Create2.subscribe(). Its
+    callback gets a dict with just its sensors, every 'every' stream frames.
+    """
+
+    def __init__(self, manager: "SubscriptionManager", names: tuple[str, ...], rate: float | None, callback: Callable[[dict[str, int]], None]):
+        self.manager = manager
+        self.names = names
+        self.rate = rate
+        self.callback = callback
+        # frames arrive every 15 ms, deliver one out of 'every'
+        self.every = 1 if rate is None else max(1, round(1.0 / (rate * STREAM_PERIOD)))
+        self.delivered = 0
+        self.errors = 0
+        self._countdown = 1
+
+    @property
+    def active(self) -> bool:
+        return self in self.manager.subscriptions
+
+    def cancel(self):
+        """Stops the deliveries, same as bot.unsubscribe(subscription)."""
+        self.manager.unsubscribe(self)
+
+    def _offer(self, frame: dict[str, int]):
+        if any(name not in frame for name in self.names):
+            return  # sent before the stream was switched to our sensors
+        self._countdown -= 1
+        if self._countdown > 0:
+            return
+        self._countdown = self.every
+        try:
+            self.callback({name: frame[name] for name in self.names})
+            self.delivered += 1
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Subscriber to {', '.join(self.names)} failed: {e}")
+
+
+class SubscriptionManager(object):
+    """
+    Serves every subscription from a single sensor stream carrying the union
+    of their sensors, so the traffic on the port grows with the sensors in
+    use and not with the number of consumers. The stream packets are picked
+    by optimize_query, groups included when they are cheaper.
+
+    When subscriptions come and go the running stream is switched to the new
+    packet list (see SensorStream.reconfigure). It is stopped when nobody is
+    left, so polling queries work again, and started by the next subscriber.
+
+    Callbacks run on the stream's reader thread, one after the other: keep
+    them short. Polling queries are not possible while the stream is up.
+    """
+
+    def __init__(self, bot: "Create2"):
+        self.bot = bot
+        # replaced, never changed in place, the reader thread iterates it
+        self.subscriptions: tuple[Subscription, ...] = ()
+        self.stream_packets: tuple[int, ...] = ()
+        self._lock = threading.Lock()
+
+    def subscribe(self, names: Sequence[str | int], rate: float | None, callback: Callable[[dict[str, int]], None]) -> Subscription:
+        """
+        See Create2.subscribe.
+        """
+        query = optimize_query(tuple(names), self.bot.SCI.ser.baudrate)
+        sub = Subscription(self, query.names, rate, callback)
+        with self._lock:
+            self.subscriptions = self.subscriptions + (sub,)
+            self._update()
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        """
+        See Create2.unsubscribe.
+        """
+        with self._lock:
+            if sub not in self.subscriptions:
+                return
+            self.subscriptions = tuple(s for s in self.subscriptions if s is not sub)
+            self._update()
+
+    def close(self):
+        """
+        Drops every subscription and stops the stream.
+        """
+        with self._lock:
+            self.subscriptions = ()
+            self.stream_packets = ()
+            if self._stream() is not None:
+                self.bot.stop_stream()
+
+    def _stream(self) -> SensorStream | None:
+        stream = self.bot.sensor_stream
+        if stream is not None and stream.running and stream.on_frame == self._dispatch:
+            return stream
+        return None
+
+    def _update(self):
+        """
+        Points the stream at the union of the subscribed sensors. Called with
+        the lock held.
+        """
+        stream = self._stream()
+        if not self.subscriptions:
+            if stream is not None:
+                self.bot.stop_stream()
+            self.stream_packets = ()
+            return
+
+        wanted = tuple(dict.fromkeys(name for sub in self.subscriptions for name in sub.names))
+        query = optimize_query(wanted, self.bot.SCI.ser.baudrate)
+        if not query.fits_stream():
+            logger.warning(
+                f"{query.stream_bytes} byte stream frames don't fit in {STREAM_PERIOD * 1000:.0f} ms at {query.baud} baud")
+        packets = query.stream_packets
+
+        if stream is None:
+            stream = self.bot.start_stream(packets)
+            stream.on_frame = self._dispatch
+        elif packets != self.stream_packets:
+            stream.reconfigure(packets)
+        self.stream_packets = packets
+
+    def _dispatch(self, frame: dict[str, int]):
+        for sub in self.subscriptions:
+            sub._offer(frame)
@@ -2,8 +2,11 @@ import pytest
 import logging
 import sys
 from pycreate2.createSerial import SerialCommandInterface
+from pycreate2.create2api import Create2
+from pycreate2.OI import Modes
+from pycreate2.simulator import SimulatedSerial
 from dataclasses import dataclass
-from threading import Thread, Lock
+from threading import Thread, Condition
 import time
 
 @dataclass
@@ -16,8 +19,11 @@ class DummySerial:
         self.buffer: bytearray = bytearray()
         self.port = "/dev/ttyUSB0"
         self.baudrate = 115200
+        self.timeout: float | None = 1.0
+        self.write_timeout: float | None = None
         self.responses: list[RespondWith] = []
-        self.buffer_lock = Lock()
+        self.buffer_lock = Condition()
+        self.cancelled = False
 
     def close(self):
         ...
@@ -34,12 +40,18 @@ class DummySerial:
         self.responses.append(RespondWith(data, wait))
 
     def read(self, num_bytes: int) -> bytes:
+        # like pyserial: wait until num_bytes arrived or the timeout expired
         with self.buffer_lock:
+            self.buffer_lock.wait_for(
+                lambda: len(self.buffer) >= num_bytes or self.cancelled, self.timeout)
+            self.cancelled = False
             to_return, self.buffer = self.buffer[:num_bytes], self.buffer[num_bytes:]
+        return bytes(to_return)
 
-        if len(to_return) < num_bytes:
-            time.sleep(1) # simulate waiting for more data
-        return to_return
+    def cancel_read(self):
+        with self.buffer_lock:
+            self.cancelled = True
+            self.buffer_lock.notify_all()
 
     def reset_output_buffer(self):
         pass
@@ -54,6 +66,7 @@ class DummySerial:
         print("DummySerial responding with:", response.data)
         with self.buffer_lock:
             self.buffer += response.data
+            self.buffer_lock.notify_all()
 
     def write(self, data: bytes):
         # If there are responses queued, respond with them
@@ -66,8 +79,8 @@ class DummySerial:
         return len(self.buffer)
 
     def flush(self):
-        with self.buffer_lock:
-            self.buffer.clear()
+        # like pyserial: waits for the output to be sent, input is untouched
+        pass
 
 @pytest.fixture(scope="session", autouse=True)
 def logging_setup():
@@ -85,3 +98,23 @@ def dummy_interface(logging_setup) -> SerialCommandInterface:
     dummy_serial = DummySerial()
     interface.ser = dummy_serial  # type: ignore
     return interface
+
+@pytest.fixture
+def make_bot(logging_setup):
+    """
+    Builds a Create2 talking to a SimulatedSerial, or to the port given, and
+    returns it with the port. With a mode the robot is started and switched
+    to it first.
+    """
+    def make(mode: Modes | None = None, ser=None) -> tuple[Create2, SimulatedSerial]:
+        sci = SerialCommandInterface()
+        sci.ser = ser if ser is not None else SimulatedSerial()  # type: ignore
+        bot = Create2(sci=sci)
+        if mode is not None:
+            bot.start()
+        if mode == Modes.SAFE:
+            bot.safe()
+        elif mode == Modes.FULL:
+            bot.full()
+        return bot, sci.ser  # type: ignore
+    return make
@@ -0,0 +1,45 @@
+from common import logging_setup, make_bot
+from pycreate2.OI import Modes
+
+
+def count(sim, opcode):
+    return sum(1 for cmd in sim.commands if cmd[0] == opcode)
+
+
+def test_redundant_writes_skipped(make_bot):
+    bot, ser = make_bot(Modes.SAFE)
+    sim = ser.sim
+    for _ in range(10):
+        bot.led(8, 128, 255)
+        bot.digit_led_ascii("abcd")
+        bot.brush_motors(True, False, False)
+    bot.stop_cleaning()
+    bot.stop_cleaning()
+    assert count(sim, 139) == 1
+    assert count(sim, 164) == 1
+    assert count(sim, 138) == 2
+
+    bot.led(0, 128, 255)
+    bot.digit_led_ascii("ABCD")  # same as "abcd" on the display
+    assert count(sim, 139) == 2
+    assert count(sim, 164) == 1
+    assert sim.display == b"ABCD"
+
+
+def test_mode_change_invalidates(make_bot):
+    bot, ser = make_bot(Modes.SAFE)
+    sim = ser.sim
+    bot.led(8, 0, 0)
+    bot.full()
+    bot.led(8, 0, 0)
+    assert count(sim, 139) == 2
+
+    # the robot dropping to passive on its own, noticed on the next query
+    sim.mode = Modes.PASSIVE
+    assert bot.get_mode() == Modes.PASSIVE
+    bot.led(8, 0, 0)
+    assert count(sim, 139) == 3
+
+    bot.invalidate_actuators()
+    bot.led(8, 0, 0)
+    assert count(sim, 139) == 4
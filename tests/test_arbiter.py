@@ -0,0 +1,77 @@
+import threading
+from concurrent.futures import CancelledError
+import pytest
+from common import logging_setup, make_bot
+from pycreate2.arbiter import CommandArbiter, Priority
+from pycreate2.OI import Modes
+from pycreate2.sensors import SensorNames
+
+
+def test_stop_preempts_queued_traffic(make_bot):
+    bot, ser = make_bot(Modes.FULL)
+    sim = ser.sim
+    io = CommandArbiter(bot)
+    base = len(sim.commands)
+    # queued before the I/O thread runs, so the order is all the arbiter's
+    leds = [io.led(i % 16, i, 255) for i in range(20)]
+    songs = [io.createSong(i % 4, [60 + i, 16]) for i in range(8)]
+    go = io.drive_direct(200, 200)
+    query = io.get_sensor_list([SensorNames.VOLTAGE])
+    stop = io.emergency_stop()
+    assert io.pending == 30
+    with io:
+        assert stop.result(timeout=2.0) is None
+        assert query.result(timeout=2.0) == {SensorNames.VOLTAGE: 15000}
+        for f in leds + songs:
+            f.result(timeout=2.0)
+
+    with pytest.raises(CancelledError):
+        go.result()
+    assert io.superseded == 1
+    sent = [cmd[0] for cmd in sim.commands[base:]]
+    # the stop first, then the query, then the rest in submission order
+    assert sent[:2] == [145, 149]
+    assert sent[2:] == [139] * 20 + [140] * 8
+    assert (sim.velocity_left, sim.velocity_right) == (0, 0)
+
+
+def test_queued_stop_never_cancelled(make_bot):
+    bot, ser = make_bot(Modes.FULL)
+    sim = ser.sim
+    io = CommandArbiter(bot)
+    base = len(sim.commands)
+    stop = io.emergency_stop()
+    go = io.drive_direct(100, 100)
+    with io:
+        assert stop.result(timeout=2.0) is None
+        assert go.result(timeout=2.0) is None
+    assert io.superseded == 0
+    assert sim.commands[base:] == [bytes([145, 0, 0, 0, 0]), bytes([145, 0, 100, 0, 100])]
+
+
+def test_concurrent_callers(make_bot):
+    bot, _ = make_bot(Modes.FULL)
+    errors = []
+
+    with CommandArbiter(bot) as io:
+        def driver():
+            for i in range(200):
+                io.drive_direct(i, -i)
+
+        def reader():
+            for _ in range(50):
+                try:
+                    data = io.get_sensor_group(3).result(timeout=2.0)
+                    assert data[SensorNames.VOLTAGE] == 15000
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=f) for f in (driver, driver, reader, reader)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        last = io.submit(lambda: bot.mode, priority=Priority.NORMAL)
+        assert last.result(timeout=2.0) is not None
+    assert errors == []
+    assert io.executed + io.superseded == 2 * 200 + 2 * 50 + 1
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import serial
+from pycreate2.create2async import AsyncCreate2, AsyncSerialInterface
+from pycreate2.OI import Modes
+from pycreate2.sensors import SensorNames
+
+
+def make_frame(payload: bytes) -> bytes:
+    frame = bytes([19, len(payload)]) + payload
+    return frame + bytes([-sum(frame) & 0xFF])
+
+
+class FakeRobot:
+    """Answers on the master side of a pty."""
+
+    def __init__(self, fd: int):
+        self.fd = fd
+        self.received = bytearray()
+
+    def on_readable(self):
+        data = os.read(self.fd, 1024)
+        self.received += data
+        if data[:1] == bytes([149]):  # query list: charger available
+            os.write(self.fd, b'\x01')
+        elif data[:1] == bytes([148]):  # stream: charger available
+            os.write(self.fd, make_frame(b'\x22\x02') + make_frame(b'\x22\x03'))
+
+
+async def open_bot():
+    master, slave = os.openpty()
+    ser = serial.Serial()
+    sci = AsyncSerialInterface(ser)
+    startup = await sci.open(os.ttyname(slave), startup_timeout=0.05, startup_idle=0.01)
+    assert startup == b""
+    robot = FakeRobot(master)
+    asyncio.get_running_loop().add_reader(master, robot.on_readable)
+    return AsyncCreate2(sci), robot, master, slave
+
+
+def close_bot(bot, master, slave):
+    asyncio.get_running_loop().remove_reader(master)
+    bot.close()
+    os.close(master)
+    os.close(slave)
+
+
+def test_async_query():
+    async def run():
+        bot, robot, master, slave = await open_bot()
+        try:
+            result = await bot.get_sensor_list([SensorNames.CHARGER_AVAILABLE])
+            assert result == {SensorNames.CHARGER_AVAILABLE: 1}
+            bot.drive_direct(100, -100)
+            await asyncio.sleep(0.01)
+            assert robot.received[-5:] == bytes([145, 0, 100, 255, 156])
+            # the blocking stream API is not there, stream() replaces it
+            assert not hasattr(bot, "start_stream")
+            # Create2 writes through the commands sharing the watched port
+            assert bot.bot.SCI is bot.SCI.commands
+            assert bot.SCI.commands.ser is bot.SCI.ser
+        finally:
+            close_bot(bot, master, slave)
+
+    asyncio.run(run())
+
+
+def test_async_stream():
+    async def run():
+        bot, robot, master, slave = await open_bot()
+        try:
+            frames = []
+            async for frame in bot.stream([SensorNames.CHARGER_AVAILABLE]):
+                frames.append(frame)
+                if len(frames) == 2:
+                    break
+            assert frames == [{SensorNames.CHARGER_AVAILABLE: 2}, {SensorNames.CHARGER_AVAILABLE: 3}]
+            await asyncio.sleep(0.01)
+            assert robot.received[-2:] == bytes([150, 0])
+        finally:
+            close_bot(bot, master, slave)
+
+    asyncio.run(run())
+
+
+def test_async_mode_change():
+    async def run():
+        bot, robot, master, slave = await open_bot()
+        try:
+            # the fake robot answers every query with 1, Passive mode
+            await bot.start()
+            assert bot.mode == Modes.PASSIVE
+            received = len(robot.received)
+            await bot.start()
+            # only the mode was read back, Start wasn't sent again
+            assert robot.received[received:] == bytes([149, 1, 35])
+        finally:
+            close_bot(bot, master, slave)
+
+    asyncio.run(run())
@@ -0,0 +1,60 @@
+import pytest
+from pycreate2.query import compile_sensor_group, compile_sensor_list
+from pycreate2.recorder import Recorder, Recording
+from pycreate2.sensors import SensorNames
+from pycreate2.simulator import Create2Simulator
+
+np = pytest.importorskip("numpy")
+from pycreate2.columnar import decode_frames, decode_recording, out_of_range, plan_dtype  # noqa: E402
+
+
+def simulated_responses(plan, count):
+    sim = Create2Simulator()
+    sim.receive(bytes([128]))
+    data = bytearray()
+    for i in range(count):
+        sim.values[SensorNames.VOLTAGE] = 14000 + i
+        sim.values[SensorNames.CURRENT] = -i
+        data += sim.receive(plan.request)
+    return bytes(data)
+
+
+def test_matches_scalar_decode():
+    plan = compile_sensor_group(100)
+    assert plan_dtype(plan).itemsize == plan.size
+    data = simulated_responses(plan, 50)
+    frames = decode_frames(plan, data)
+    assert len(frames) == 50
+    assert frames[SensorNames.VOLTAGE][-1] == 14049
+    assert frames[SensorNames.CURRENT].min() == -49
+    for i in (0, 17, 49):
+        expected = plan.decode(data, i * plan.size)
+        assert {name: int(frames[name][i]) for name in plan.names} == expected
+
+
+def test_vectorized_range_check():
+    plan = compile_sensor_list((SensorNames.CHARGING_STATE, SensorNames.VOLTAGE))
+    data = bytearray(b"\x02\x3a\x98" * 10)
+    data[12] = 9  # charging state only goes up to 5
+    with pytest.raises(ValueError, match="in frame 4"):
+        decode_frames(plan, bytes(data))
+    frames = decode_frames(plan, bytes(data), validate=False)
+    assert out_of_range(frames, plan.packets).nonzero()[0].tolist() == [4]
+    with pytest.raises(ValueError):
+        decode_frames(plan, bytes(data[:-1]))
+
+
+def test_decode_recording(tmp_path):
+    path = str(tmp_path / "run.rec")
+    plan = compile_sensor_group(3)
+    data = simulated_responses(plan, 100)
+    with Recorder.for_query(path, plan) as rec:
+        for i in range(100):
+            rec.record(data[i * plan.size: (i + 1) * plan.size], timestamp=i * 0.015)
+
+    with Recording(path) as recording:
+        frames = decode_recording(recording)
+        assert frames["timestamp"][10] == pytest.approx(0.15)
+        assert frames[SensorNames.VOLTAGE].tolist() == list(range(14000, 14100))
+        assert recording.decode(42) == {name: int(frames[name][42]) for name in plan.names}
+        del frames
@@ -0,0 +1,78 @@
+from common import logging_setup, make_bot
+from pycreate2.drive import DriveController
+from pycreate2.OI import Modes
+
+
+def drive_commands(sim):
+    return [cmd for cmd in sim.commands if cmd[0] == 145]
+
+
+def test_only_latest_setpoint_is_sent(make_bot):
+    bot, ser = make_bot(Modes.FULL)
+    sim = ser.sim
+    base = len(drive_commands(sim))
+    drive = DriveController(bot)
+    for v in range(100):
+        drive.set(v, -v)
+    drive.set(900, -900)  # clamped
+    assert drive.step()
+    assert drive.current == (500, -500)
+    assert not drive.step()  # unchanged, nothing written
+    assert drive.ticks == 2
+    assert len(drive_commands(sim)) - base == 1
+    assert (sim.requested_velocity, sim.velocity_right, sim.velocity_left) == (0, 500, -500)
+
+
+def test_slew_limit(make_bot):
+    bot, _ = make_bot(Modes.FULL)
+    drive = DriveController(bot, rate=50, max_accel=1000)  # 20 mm/s per tick
+    drive.set(100, -50)
+    speeds = []
+    while drive.step():
+        speeds.append(drive.current)
+    assert speeds[:3] == [(20, -20), (40, -40), (60, -50)]
+    assert speeds[-1] == (100, -50)
+    assert len(speeds) == 5
+
+    drive.emergency_stop()  # no ramp down
+    assert drive.current == (0, 0)
+    assert not drive.step()
+
+
+def test_fixed_rate(make_bot):
+    bot, _ = make_bot(Modes.FULL)
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+        if now[0] < 0.2:
+            drive.set(int(now[0] * 1000), 0)  # changes constantly
+        else:
+            drive.close()
+
+    drive = DriveController(bot, rate=100, clock=lambda: now[0], sleep=sleep)
+    drive.run()
+    assert drive.ticks == 20
+    assert drive.writes == drive.ticks + 1  # every tick, plus stopping on close
+    assert drive.overruns == 0
+    assert drive.current == (0, 0)
+
+
+def test_late_ticks_skipped(make_bot):
+    bot, _ = make_bot(Modes.FULL)
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+        if len(sleeps) == 3:
+            now[0] += 0.025  # the thread woke up 2.5 periods late
+        if len(sleeps) == 6:
+            drive.close()
+
+    drive = DriveController(bot, rate=100, clock=lambda: now[0], sleep=sleep)
+    drive.run()
+    assert drive.overruns == 2
+    # the deadlines don't move: after the late tick the next one is on the grid
+    assert abs(sleeps[3] - 0.005) < 1e-9
@@ -0,0 +1,78 @@
+import asyncio
+import time
+import pytest
+from pycreate2.fleet import Fleet
+from pycreate2.OI import Modes
+from pycreate2.sensors import SensorNames
+from pycreate2.simulator import PtySimulator
+
+
+@pytest.fixture
+def robots():
+    sims = [PtySimulator() for _ in range(4)]
+    for sim in sims:
+        sim.start()
+    yield sims
+    for sim in sims:
+        sim.stop()
+
+
+def test_fleet_connect_and_stop(robots):
+    async def run():
+        start = time.monotonic()
+        fleet = await Fleet.connect({f"bot{i}": sim.port for i, sim in enumerate(robots)})
+        # opened concurrently, not one after the other
+        assert time.monotonic() - start < 0.5 * len(robots)
+        async with fleet:
+            assert len(fleet) == 4
+            fleet.broadcast(128)
+            fleet.broadcast(131)
+            fleet.broadcast(145, (0, 100, 0, 100))
+            await asyncio.sleep(0.1)
+            assert all(sim.sim.mode == Modes.SAFE for sim in robots)
+            assert all(sim.sim.velocity_left == 100 for sim in robots)
+
+            assert fleet.stop_all() == {}
+            await asyncio.sleep(0.1)
+            assert all(sim.sim.velocity_left == 0 for sim in robots)
+
+            results = await fleet.gather("get_sensor_list", [SensorNames.OPEN_INTERFACE_MODE])
+            assert all(r[SensorNames.OPEN_INTERFACE_MODE] == Modes.SAFE.value for r in results.values())
+
+    asyncio.run(run())
+
+
+def test_fleet_streams(robots):
+    async def run():
+        fleet = await Fleet.connect([sim.port for sim in robots])
+        async with fleet:
+            stats = {name: fleet[name].instrument() for name in fleet}
+            fleet.broadcast(128)
+            fleet.start_streams([SensorNames.BATTERY_CHARGE])
+
+            async def all_frames():
+                while len(fleet.frames) < len(fleet):
+                    await asyncio.sleep(0.01)
+
+            await asyncio.wait_for(all_frames(), 2.0)
+            latest = fleet.latest(max_age=1.0)
+            assert set(latest) == set(fleet)
+            assert all(frame[SensorNames.BATTERY_CHARGE] == 2500 for frame in latest.values())
+
+            await fleet.stop_streams()
+            # every robot was told to pause and its transport left stream mode
+            assert all(s.commands.get(150) == 1 for s in stats.values())
+            assert all(fleet[name].SCI.parser is None for name in fleet)
+
+    asyncio.run(run())
+
+
+def test_fleet_connect_failure(robots):
+    async def run():
+        with pytest.raises(Exception):
+            await Fleet.connect([robots[0].port, "/dev/does-not-exist"])
+        fleet = await Fleet.connect([robots[0].port, "/dev/does-not-exist"], require_all=False)
+        assert list(fleet) == [robots[0].port]
+        await fleet.close()
+
+    asyncio.run(run())
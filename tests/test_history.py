@@ -0,0 +1,55 @@
+import pytest
+from common import logging_setup, make_bot
+from pycreate2.OI import Modes
+from pycreate2.query import compile_sensor_list
+from pycreate2.sensors import SensorNames
+from pycreate2.simulator import Create2Simulator
+
+np = pytest.importorskip("numpy")
+from pycreate2.history import SensorHistory  # noqa: E402
+
+
+def test_ring_buffer_windows():
+    plan = compile_sensor_list((SensorNames.VOLTAGE, SensorNames.CURRENT))
+    history = SensorHistory.for_plan(plan, capacity=10)
+    sim = Create2Simulator()
+    sim.receive(bytes([128]))
+    for i in range(25):
+        sim.values[SensorNames.CURRENT] = -i
+        history.append_values(plan.values(sim.receive(plan.request)), timestamp=i * 0.1)
+
+    assert len(history) == 10  # the oldest 15 were overwritten
+    assert list(history.window(SensorNames.CURRENT)) == [-i for i in range(15, 25)]
+    assert history.min(SensorNames.CURRENT) == -24
+    assert history.max(SensorNames.CURRENT, samples=3) == -22
+    assert history.mean(SensorNames.CURRENT, samples=4) == -22.5
+    # samples at 2.2, 2.3 and 2.4 s
+    assert history.percentile(SensorNames.CURRENT, 50, seconds=0.25, now=2.45) == -23
+    assert list(history.timestamps(seconds=0.25, now=2.45)) == pytest.approx([2.2, 2.3, 2.4])
+    assert history.mean(SensorNames.VOLTAGE) == 15000
+
+    with pytest.raises(ValueError):
+        history.max(SensorNames.CURRENT, seconds=1.0, now=10.0)
+
+    history.append({SensorNames.VOLTAGE: 14000}, timestamp=2.5)  # no current
+    assert len(history) == 10 and history.skipped == 1
+    assert history.min(SensorNames.VOLTAGE) == 15000
+
+
+def test_stream_feeds_history(make_bot):
+    bot, ser = make_bot(Modes.SAFE)
+
+    sensor_list = [SensorNames.REQUESTED_VELOCITY_RIGHT, SensorNames.BATTERY_CHARGE]
+    history = SensorHistory.for_stream(sensor_list, capacity=50)
+    assert history.names == (SensorNames.REQUESTED_VELOCITY_RIGHT, SensorNames.BATTERY_CHARGE)
+    bot.drive_direct(200, 200)
+    bot.start_stream(sensor_list, history=history)
+    stream = bot.sensor_stream
+    assert stream is not None
+    while stream.frame_count < 60:
+        ser.advance(0.1)
+        stream.wait_frame(0.1)
+    bot.stop_stream()
+
+    assert len(history) == 50
+    assert history.min(SensorNames.REQUESTED_VELOCITY_RIGHT) == history.max(SensorNames.REQUESTED_VELOCITY_RIGHT) == 200
@@ -0,0 +1,52 @@
+import pytest
+from common import logging_setup, DummySerial, dummy_interface
+from pycreate2.create2api import Create2
+from pycreate2.instrumentation import Histogram, Instrumentation
+
+
+def test_stats_query_retry(logging_setup, dummy_interface):
+    create2 = Create2(sci=dummy_interface)  # type: ignore
+    ser: DummySerial = dummy_interface.ser  # type: ignore
+    create2.instrument()
+    ser.add_response(b'\xFF')
+    ser.add_response(b'\x01')
+    assert create2.get_sensor_list(["Charger Available"]) == {"Charger Available": 1}
+    create2.drive_direct(0, 0)
+
+    stats = create2.stats()
+    assert stats["commands"] == {149: 2, 145: 1}
+    assert stats["bytes_out"] == 2 * 3 + 5
+    assert stats["bytes_in"] == 2
+    assert stats["retries"] == 1
+    assert stats["flushes"] >= 1
+    assert stats["query"]["count"] == 1
+    assert stats["decode"]["count"] == 1
+    create2.uninstrument()
+    assert create2.stats() == {}
+
+
+def test_custom_hooks(dummy_interface):
+    class Counter(Instrumentation):
+        def __init__(self):
+            self.writes = 0
+
+        def on_write(self, num_bytes, seconds):
+            self.writes += 1
+
+    create2 = Create2(sci=dummy_interface)  # type: ignore
+    counter = create2.instrument(Counter())
+    with create2.batch():
+        create2.led()
+        create2.digit_led_ascii("hi")
+    assert counter.writes == 1  # type: ignore
+
+
+def test_histogram():
+    hist = Histogram()
+    for us in (1, 3, 3, 3, 100):
+        hist.record(us * 1e-6)
+    snap = hist.snapshot()
+    assert snap["count"] == 5
+    assert snap["p50"] == pytest.approx(4e-6)
+    assert snap["p99"] == pytest.approx(100e-6)
+    assert snap["buckets"] == {2: 1, 4: 3, 128: 1}
@@ -0,0 +1,32 @@
+import time
+from common import logging_setup, make_bot
+from pycreate2.loopback import LoopbackSerial, SensorResponder
+from pycreate2.OI import command_size
+
+
+def test_command_size():
+    assert command_size(b"") is None
+    assert command_size(bytes([145, 0])) == 5
+    assert command_size(bytes([149])) is None
+    assert command_size(bytes([149, 2, 7, 8])) == 4
+    assert command_size(bytes([140, 0])) is None
+    assert command_size(bytes([140, 0, 2, 60, 32, 62, 32])) == 7
+
+
+def test_loopback_timing():
+    ser = LoopbackSerial(baudrate=19200)
+    ser.inject(bytes(20))
+    assert ser.in_waiting < 20
+    start = time.monotonic()
+    assert ser.read(20) == bytes(20)
+    assert time.monotonic() - start >= 19 * ser.byte_time
+    ser.timeout = 0.01
+    assert ser.read(1) == b""
+
+
+def test_loopback_query(make_bot):
+    bot, ser = make_bot(ser=LoopbackSerial(SensorResponder(), baudrate=115200))
+    result = bot.get_sensor_group(100)
+    assert len(result) == 52
+    # 2 bytes out and 80 back can't take less than their wire time
+    assert bot.last_query_latency >= 81 * ser.byte_time
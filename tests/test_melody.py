@@ -0,0 +1,59 @@
+from common import logging_setup, make_bot
+from pycreate2.melody import MelodyPlayer, song_duration, split_notes
+from pycreate2.OI import Modes
+from pycreate2.simulator import Create2Simulator, SimulatedSerial
+
+
+class PlayLog(Create2Simulator):
+    """Simulator that remembers when every song started."""
+
+    def __init__(self):
+        super().__init__()
+        self.starts: list[tuple[float, int]] = []
+
+    def _execute(self, cmd: bytes) -> bytes:
+        before = self._song_end
+        out = super()._execute(cmd)
+        if cmd[0] == 141 and self._song_end != before:
+            self.starts.append((self.time, cmd[1]))
+        return out
+
+
+def make_player(make_bot):
+    bot, ser = make_bot(Modes.FULL, SimulatedSerial(PlayLog()))
+    sim = ser.sim
+    sim.starts.clear()  # full() plays the empty songs that clear the slots
+    return MelodyPlayer(bot, clock=lambda: sim.time, sleep=ser.advance), sim
+
+
+def test_split_notes():
+    notes = list(range(80))
+    chunks = split_notes(notes)
+    assert [len(c) for c in chunks] == [32, 32, 16]
+    assert split_notes([(60, 8), (62, 8)]) == [(60, 8, 62, 8)]
+    assert song_duration((60, 32, 62, 32)) == 1.0
+
+
+def test_gapless_playback(make_bot):
+    player, sim = make_player(make_bot)
+    melody = [(60 + i % 12, 8 + i % 5) for i in range(100)]  # 7 songs
+    chunks = split_notes(melody)
+    player.play(melody)
+
+    # every chunk played, in slot order, each right after the previous one
+    assert [slot for _, slot in sim.starts] == [i % 4 for i in range(len(chunks))]
+    for i in range(1, len(chunks)):
+        gap = sim.starts[i][0] - sim.starts[i - 1][0] - song_duration(chunks[i - 1])
+        assert 0 <= gap < 0.005
+    assert player.uploads == len(chunks)
+
+
+def test_resident_songs_not_uploaded(make_bot):
+    player, sim = make_player(make_bot)
+    melody = [(60 + i % 20, 4) for i in range(40)]  # 3 songs, fit in the slots
+    player.play(melody)
+    assert player.uploads == 3
+    sim.advance(1.0)
+    player.play(melody, repeat=2)
+    assert player.uploads == 3
+    assert len(sim.starts) == 9
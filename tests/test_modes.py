@@ -0,0 +1,71 @@
+import time
+import pytest
+from common import logging_setup, make_bot
+from pycreate2.OI import Modes, Opcodes
+
+
+def test_cold_to_full_is_fast(make_bot):
+    bot, ser = make_bot()
+    sim = ser.sim
+    assert bot.mode is None
+    start = time.monotonic()
+    bot.start()
+    bot.full()
+    assert time.monotonic() - start < 0.2
+    assert bot.mode == sim.mode == Modes.FULL
+    assert bot.get_mode() == Modes.FULL
+
+
+def safe_commands(sim):
+    return sum(1 for cmd in sim.commands if cmd[0] == Opcodes.SAFE.value)
+
+
+def test_redundant_transitions_skipped(make_bot):
+    bot, ser = make_bot()
+    sim = ser.sim
+    bot.start()
+    bot.safe()
+    assert safe_commands(sim) == 1
+    bot.safe()  # only reads the mode to confirm it
+    assert safe_commands(sim) == 1
+    bot.safe(force=True)
+    assert safe_commands(sim) == 2
+
+
+def test_dropped_to_passive_unnoticed(make_bot):
+    bot, ser = make_bot()
+    sim = ser.sim
+    bot.start()
+    bot.safe()
+    sim.mode = Modes.PASSIVE  # ie a wheel drop, nothing queried since
+    assert bot.mode == Modes.SAFE
+    bot.safe()
+    assert safe_commands(sim) == 2
+    assert bot.mode == sim.mode == Modes.SAFE
+
+
+def test_mode_tracked_from_queries(make_bot):
+    bot, ser = make_bot()
+    sim = ser.sim
+    bot.start()
+    bot.safe()
+    sim.mode = Modes.PASSIVE  # ie a cliff sensor fired
+    bot.get_sensor_group(100)
+    assert bot.mode == Modes.PASSIVE
+    sent = len(sim.commands)
+    bot.safe()
+    assert len(sim.commands) > sent
+    assert sim.mode == Modes.SAFE
+
+
+def test_stop_and_timeout(make_bot):
+    bot, ser = make_bot()
+    sim = ser.sim
+    bot.start()
+    bot.stop()
+    assert bot.mode == sim.mode == Modes.OFF
+    # the robot ignores everything but Start while off
+    bot.mode_timeout = 0.05
+    with pytest.raises(Exception, match="SAFE"):
+        bot.safe()
+    assert bot.mode is None
@@ -0,0 +1,45 @@
+from pycreate2.query import compile_sensor_group
+from pycreate2.scripts.create_monitor import LiveMonitor, sparkline
+from pycreate2.sensors import SensorNames
+from pycreate2.simulator import Create2Simulator
+
+
+class FakeWindow(object):
+    def __init__(self):
+        self.writes = []
+
+    def addstr(self, row, column, text):
+        self.writes.append((row, column, text))
+
+    def refresh(self):
+        pass
+
+
+def test_sparkline():
+    assert sparkline([0, 50, 100], 0, 100) == " ▄█"
+    assert sparkline([7, 7], 7, 7) == "  "
+
+
+def test_only_changed_cells_redrawn():
+    plan = compile_sensor_group(100)
+    sim = Create2Simulator()
+    sim.receive(bytes([128]))
+    window = FakeWindow()
+    mon = LiveMonitor(window)
+
+    mon.add(plan.decode(sim.receive(plan.request)))
+    mon.draw(0, 1.0)
+    first = len(window.writes)
+    assert first > 40
+
+    # a current spike: its value and sparkline change, plus the status line
+    window.writes.clear()
+    sim.values[SensorNames.CURRENT] = -1500
+    mon.add(plan.decode(sim.receive(plan.request)))
+    mon.draw(0, 1.015)
+    changed = {text.strip() for _, _, text in window.writes}
+    assert "-1500" in changed
+    assert len(window.writes) <= 17  # 15 sparklines, the value and the status line
+    assert mon.frames == 2
+    assert mon.dropped(1.015) == 0
+    assert mon.dropped(1.105) == 6  # 8 periods since the first frame
@@ -0,0 +1,56 @@
+import math
+import pytest
+from pycreate2.OI import Robot
+from pycreate2.odometry import Odometry, Pose, encoder_delta, integrate
+from pycreate2.sensors import REGISTRY, SensorNames
+from pycreate2.simulator import Create2Simulator
+
+
+def test_encoder_delta():
+    assert encoder_delta(10, 5) == 5
+    assert encoder_delta(-32768, 32767) == 1
+    assert encoder_delta(32767, -32768) == -1
+    assert encoder_delta(-32000, 32000) == 1536
+
+
+def test_straight_across_rollover():
+    odom = Odometry()
+    odom.update(32000, 32000)
+    pose = odom.update(-32000, -32000)  # 1536 ticks forward
+    assert pose.x == pytest.approx(1536 * Robot.TICK_TO_DISTANCE.value)
+    assert pose.y == pytest.approx(0.0)
+    assert odom.distance == pytest.approx(pose.x)
+
+
+def test_follows_simulator():
+    sim = Create2Simulator()
+    sim.receive(bytes([128, 132]))
+    sim.receive(bytes([137, 0, 100, 0x01, 0xF4]))  # 100 mm/s on a 500 mm radius
+    odom = Odometry(fuse_angle=0.5)
+    names = (SensorNames.ENCODER_COUNTS_LEFT, SensorNames.ENCODER_COUNTS_RIGHT, SensorNames.ANGLE)
+    for _ in range(1000):
+        sim.advance(0.015)
+        frame = {name: sim.sensor_value(REGISTRY.by_name[name]) for name in names}
+        odom.update_frame(frame)
+    assert odom.pose.x == pytest.approx(sim.x, abs=2)
+    assert odom.pose.y == pytest.approx(sim.y, abs=2)
+    assert odom.pose.theta == pytest.approx(sim.theta, abs=0.02)
+
+
+def test_batch_matches_incremental():
+    np = pytest.importorskip("numpy")
+    rng = np.random.default_rng(1)
+    left = np.cumsum(rng.integers(-20, 60, 500))
+    right = np.cumsum(rng.integers(-20, 60, 500))
+    # what the robot reports
+    left = ((left + 0x8000) % 0x10000) - 0x8000
+    right = ((right + 0x8000) % 0x10000) - 0x8000
+    angle = rng.integers(-3, 4, 500)
+
+    start = Pose(10.0, -5.0, 0.3)
+    poses = integrate(left, right, angle, fuse_angle=0.25, pose=start)
+    odom = Odometry(fuse_angle=0.25, pose=start)
+    for i, (l, r, a) in enumerate(zip(left, right, angle)):
+        pose = odom.update(int(l), int(r), int(a))
+        assert poses[i] == pytest.approx([pose.x, pose.y, pose.theta])
+    assert math.isfinite(poses[-1, 0])
@@ -0,0 +1,54 @@
+import time
+import pytest
+from common import logging_setup, make_bot
+from pycreate2.loopback import LoopbackSerial, SensorResponder
+from pycreate2.pipeline import QueryPipeline
+from pycreate2.sensors import SensorNames
+
+
+def test_responses_matched_in_order(make_bot):
+    bot, _ = make_bot()
+    bot.start()
+    with QueryPipeline(bot, depth=3) as pipeline:
+        futures = []
+        for i in range(30):
+            if i % 3:
+                futures.append(pipeline.get_sensor_list([SensorNames.CURRENT, SensorNames.VOLTAGE]))
+            else:
+                futures.append(pipeline.get_sensor_group(3))
+        results = [f.result(timeout=2.0) for f in futures]
+    # responses of different sizes, each one went to its own request
+    assert [len(r) for r in results] == [2 if i % 3 else 6 for i in range(30)]
+    assert all(r[SensorNames.VOLTAGE] == 15000 and r[SensorNames.CURRENT] == -200 for r in results)
+    assert pipeline.completed == 30
+    assert pipeline.max_in_flight <= 3
+
+
+def test_timeout_fails_in_flight_only(make_bot):
+    bot, _ = make_bot()  # never started, the robot ignores queries
+    bot.SCI.read_margin = 0.05
+    with QueryPipeline(bot) as pipeline:
+        future = pipeline.get_sensor_group(3)
+        with pytest.raises(Exception):
+            future.result(timeout=2.0)
+        bot.SCI.write(128)
+        assert pipeline.get_sensor_group(3).result(timeout=2.0)[SensorNames.VOLTAGE] == 15000
+    assert pipeline.failed == 1
+
+
+def test_faster_than_lock_step(make_bot):
+    # a USB adapter that takes 10 ms to hand over every reply
+    bot, _ = make_bot(ser=LoopbackSerial(SensorResponder(), latency=0.01))
+    count = 20
+    start = time.monotonic()
+    for _ in range(count):
+        bot.get_sensor_group(101)
+    lock_step = time.monotonic() - start
+
+    with QueryPipeline(bot, depth=4) as pipeline:
+        start = time.monotonic()
+        futures = [pipeline.get_sensor_group(101) for _ in range(count)]
+        for f in futures:
+            f.result(timeout=2.0)
+        pipelined = time.monotonic() - start
+    assert pipelined < 0.6 * lock_step
@@ -0,0 +1,91 @@
+import random
+import pytest
+import pycreate2.sensors as sensors
+from common import logging_setup, DummySerial, dummy_interface, make_bot
+from pycreate2.create2api import Create2
+from pycreate2.query import compile_sensor_group, compile_sensor_list, optimize_query
+from pycreate2.OI import Modes, Opcodes
+
+
+def test_group_plan_matches_unpack():
+    plan = compile_sensor_group(100)
+    assert plan.opcode == Opcodes.SENSORS
+    assert plan.request == b'\x8e\x64'
+    assert plan.size == 80
+
+    random.seed(42)
+    data = b"".join(
+        pkt.pack(random.randint(*pkt.value_range)) for pkt in plan.packets)
+    expected = {pkt.name: pkt.unpack(data[i: i + pkt.size])
+                for pkt, i in zip(plan.packets, _offsets(plan.packets))}
+    assert plan.decode(data) == expected
+
+
+def _offsets(packets):
+    offset = 0
+    for pkt in packets:
+        yield offset
+        offset += pkt.size
+
+
+def test_list_plan_cached():
+    plan = compile_sensor_list(("Charger Available", 19))
+    assert plan is compile_sensor_list(("Charger Available", 19))
+    assert plan.request == bytes([149, 2, 34, 19])
+    assert plan.size == 3
+    assert plan.decode(b'\x01\xff\xfe') == {"Charger Available": 1, "Distance": -2}
+
+
+def test_plan_range_check():
+    plan = compile_sensor_list(("Charger Available",))
+    with pytest.raises(ValueError):
+        plan.decode(b'\xff')
+
+
+def test_read_group(logging_setup, dummy_interface):
+    create2 = Create2(sci=dummy_interface)  # type: ignore
+    ser: DummySerial = dummy_interface.ser  # type: ignore
+    ser.add_response(bytes(12))
+    result = create2.get_sensor_group(106)
+    assert len(result) == 6
+    assert result[sensors.SensorNames.LIGHT_BUMP_RIGHT] == 0
+
+
+def test_optimizer_prefers_groups():
+    block = sensors.REGISTRY.blocks[101]
+    names = tuple(pkt.name for pkt in block.sensors[:12])
+    query = optimize_query(names)
+    assert [plan.request for plan in query.plans] == [bytes([142, 101])]
+    assert query.wire_bytes == 30
+    assert query.names == names
+
+    # a couple of small sensors are cheaper as a list
+    query = optimize_query(("Charger Available", 19))
+    assert query.plans == (compile_sensor_list((19, 34)),)
+    assert query.fits_stream(19200)
+
+
+def test_optimizer_splits_and_stream_fit():
+    names = tuple(pkt.name for pkt in sensors.REGISTRY.blocks[100].sensors)
+    query = optimize_query(names)
+    assert [plan.request for plan in query.plans] == [bytes([142, 100])]
+    assert query.stream_packets == (100,)
+    assert query.stream_bytes == 84
+    assert query.fits_stream(115200)
+    assert not query.fits_stream(19200)
+
+    # at 19200 baud 15 ms is 28 bytes, group 100 has to be split up
+    query = optimize_query(names, 19200, 0.015)
+    assert len(query.plans) > 3
+    assert all(len(plan.request) + plan.size <= 28 for plan in query.plans)
+    assert {pkt.name for plan in query.plans for pkt in plan.packets} == set(names)
+    with pytest.raises(ValueError):
+        optimize_query(names, 19200, 0.001)
+
+
+def test_get_sensors(make_bot):
+    bot, _ = make_bot(Modes.PASSIVE)
+    names = [sensors.SensorNames.VOLTAGE, sensors.SensorNames.CURRENT,
+             sensors.SensorNames.OPEN_INTERFACE_MODE]
+    data = bot.get_sensors(names, max_time=0.001)  # one request each
+    assert data == {names[0]: 15000, names[1]: -200, names[2]: 1}
@@ -0,0 +1,133 @@
+import time
+from common import logging_setup, make_bot
+from pycreate2.OI import Modes
+from pycreate2.query import compile_sensor_group, compile_sensor_list
+from pycreate2.recorder import Recorder, Recording, ReplaySerial
+from pycreate2.sensors import SensorNames
+from pycreate2.simulator import Create2Simulator
+
+
+def test_record_queries(tmp_path, make_bot):
+    path = str(tmp_path / "run.rec")
+    plan = compile_sensor_group(100)
+    sim = Create2Simulator()
+    sim.receive(bytes([128]))
+
+    with Recorder.for_query(path, plan) as rec:
+        for charge in range(10):
+            sim.values[SensorNames.BATTERY_CHARGE] = charge
+            rec.record(sim.receive(plan.request), timestamp=charge * 0.5)
+        rec.record(b"short")  # not the recorded layout
+        assert rec.count == 10 and rec.skipped == 1
+
+    # appending keeps the old records
+    with Recorder.for_query(path, plan) as rec:
+        assert rec.count == 10
+        rec.record(sim.receive(plan.request), timestamp=5.0)
+
+    with Recording(path) as recording:
+        assert len(recording) == 11
+        assert recording.kind == "query"
+        assert recording.duration == 5.0
+        assert recording.header["packets"][0]["name"] == SensorNames.BUMPS_WHEELDROPS
+        assert recording.decode(3)[SensorNames.BATTERY_CHARGE] == 3
+        assert recording.decode(-1) == plan.decode(recording.payload(-1))
+        assert [t for t, _ in recording[2:4]] == [1.0, 1.5]
+
+        bot, _ = make_bot(ser=ReplaySerial(recording))
+        for charge in range(10):
+            assert bot.get_sensor_group(100)[SensorNames.BATTERY_CHARGE] == charge
+
+
+def test_query_recorder(tmp_path, make_bot):
+    path = str(tmp_path / "run.rec")
+    bot, _ = make_bot(Modes.PASSIVE)
+    with Recorder.for_query(path, compile_sensor_group(100)) as rec:
+        bot.query_recorder = rec
+        for _ in range(3):
+            bot.get_sensor_group(100)
+        bot.get_sensor_group(3)  # another request, not recorded
+        bot.query_recorder = None
+        assert rec.count == 3
+    with Recording(path) as recording:
+        assert recording.decode(2)[SensorNames.OPEN_INTERFACE_MODE] == 1
+
+
+def test_truncated_record_ignored(tmp_path):
+    path = str(tmp_path / "run.rec")
+    plan = compile_sensor_list((7,))
+    with Recorder.for_query(path, plan) as rec:
+        rec.record(b"\x00")
+        rec.record(b"\x01")
+    with open(path, "ab") as f:
+        f.write(b"\x00\x00")  # crashed while writing a timestamp
+    with Recording(path) as recording:
+        assert len(recording) == 2
+    with Recorder.for_query(path, plan) as rec:
+        rec.record(b"\x03")
+    with Recording(path) as recording:
+        assert [bytes(data) for _, data in recording] == [b"\x00", b"\x01", b"\x03"]
+
+
+def test_record_and_replay_stream(tmp_path, make_bot):
+    path = str(tmp_path / "stream.rec")
+    sensor_list = [SensorNames.ENCODER_COUNTS_LEFT, 7]
+
+    bot, _ = make_bot()
+    sci = bot.SCI
+    sci.write(128)
+    sci.write(132)
+    sci.write(145, (0, 100, 0, 100))
+    with Recorder.for_stream(path, sensor_list) as rec:
+        stream = bot.start_stream(sensor_list, rec)
+        while rec.count < 20:
+            stream.wait_frame(1.0)
+        bot.stop_stream()
+        count = rec.count
+
+    with Recording(path) as recording:
+        assert len(recording) == count
+        assert recording.kind == "stream"
+        left = [recording.decode(i)[SensorNames.ENCODER_COUNTS_LEFT] for i in range(count)]
+        assert left == sorted(left) and left[-1] > 0
+
+        bot, _ = make_bot(ser=ReplaySerial(recording))
+        stream = bot.start_stream(sensor_list)
+        start = time.monotonic()
+        while stream.frame_count < count and time.monotonic() - start < 2:
+            stream.wait_frame(0.1)
+        assert stream.latest() == recording.decode(count - 1)
+        bot.stop_stream()
+
+
+def test_stream_reconfigured_while_recording(tmp_path, make_bot):
+    path = str(tmp_path / "stream.rec")
+    bot, _ = make_bot(Modes.PASSIVE)
+    with Recorder.for_stream(path, [7]) as rec:
+        stream = bot.start_stream([7], rec)
+        while rec.count < 5:
+            stream.wait_frame(1.0)
+        # frames of the new layout are skipped, the reader keeps going
+        stream.reconfigure([7, SensorNames.VOLTAGE])
+        frames = stream.frame_count
+        while stream.frame_count < frames + 5:
+            assert stream.wait_frame(1.0) is not None
+        assert stream.running
+        assert rec.skipped > 0
+        bot.stop_stream()
+
+
+def test_replay_realtime(tmp_path):
+    path = str(tmp_path / "stream.rec")
+    rec = Recorder.for_stream(path, [7])
+    for i in range(5):
+        rec.record(bytes([19, 2, 7, i, (-(19 + 2 + 7 + i)) & 0xFF]), timestamp=100 + i * 0.02)
+    rec.close()
+
+    ser = ReplaySerial(Recording(path), realtime=True)
+    ser.write(bytes([148, 1, 7]))
+    assert ser.in_waiting == 5
+    ser.timeout = 0.2
+    start = time.monotonic()
+    assert len(ser.read(25)) == 25
+    assert 0.07 < time.monotonic() - start < 0.2
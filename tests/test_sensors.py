@@ -1,3 +1,4 @@
+import pytest
 import pycreate2.sensors as sensors
 import random
 from common import logging_setup, DummySerial, dummy_interface
@@ -52,3 +53,40 @@ def test_read_sensors_out_range_first(logging_setup, dummy_interface):
     result = create2.get_sensor_list(sensor_list)
     assert result == {'Charger Available': 1}
 
+
+def test_read_sensors_latency(logging_setup, dummy_interface):
+    create2 = Create2(sci=dummy_interface) # type: ignore
+    ser: DummySerial = dummy_interface.ser  # type: ignore
+    ser.add_response(b'\x01')
+    result = create2.get_sensor_list(["Charger Available"])
+    assert result == {'Charger Available': 1}
+    assert create2.last_query_latency < 0.015
+
+def test_registry_lookup():
+    assert sensors.get_sensor_by_id(34) is sensors.SENSORS["Charger Available"]
+    assert sensors.get_sensor_by_id(200) is None
+    assert sensors.get_sensor_by_name("Nope") is None
+    assert sensors.get_sensor_block(102) == []
+
+
+def test_registry_blocks():
+    block = sensors.REGISTRY.blocks[101]
+    assert block.size == 28
+    assert block.sensors[0].id == 43
+    assert block.offsets[:4] == (0, 2, 4, 5)
+    for group_id, size in sensors.GROUP_SIZES.items():
+        assert sensors.REGISTRY.packet_sizes[group_id] == size
+
+
+def test_registry_sizes_match_oi():
+    from pycreate2.OI import RESPONSE_SIZES
+    for pkt in sensors.SENSORS.values():
+        assert RESPONSE_SIZES[pkt.id] == pkt.size
+    assert RESPONSE_SIZES[32] == 1
+    assert RESPONSE_SIZES[33] == 2
+
+
+def test_registry_check():
+    bad = [s for s in sensors.SENSORS.values() if s.id != 58]
+    with pytest.raises(ValueError):
+        sensors.SensorRegistry(bad)
@@ -38,3 +38,87 @@ def test_read_less(dummy_interface: SerialCommandInterface):
         assert False, "Expected Exception"
     except Exception as e:
         assert str(e) == "Did not receive expected number of bytes from Create2"
+
+
+def test_read_returns_early(dummy_interface: SerialCommandInterface):
+    ser: DummySerial = dummy_interface.ser  # type: ignore
+    ser.add_response(b"\x01")
+    ser.write(b"\x8e\x22")
+    data = dummy_interface.read(1)
+    assert data == b"\x01"
+    assert dummy_interface.last_read_latency < 0.015
+
+
+def test_read_deadline(dummy_interface: SerialCommandInterface):
+    dummy_interface.read_margin = 0.05
+    start = time.monotonic()
+    with pytest.raises(Exception):
+        dummy_interface.read(5)
+    assert time.monotonic() - start < 0.5
+    assert dummy_interface.ser.timeout == 1.0
+
+
+class TimeoutCountingSerial(DummySerial):
+    def __init__(self):
+        self.timeout_sets = 0
+        super().__init__()
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self.timeout_sets += 1
+        self._timeout = value
+
+
+def test_read_sets_timeout_once():
+    ser = TimeoutCountingSerial()
+    sci = SerialCommandInterface()
+    sci.ser = ser  # type: ignore
+    ser.buffer = bytearray(b"Hello")
+    ser.timeout_sets = 0
+    assert sci.read(5) == b"Hello"
+    # set for the read, restored after it
+    assert ser.timeout_sets == 2
+    assert ser.timeout == 1.0
+
+    # the port already waits as long as needed, it isn't touched
+    ser.buffer = bytearray(b"Hello")
+    ser.timeout_sets = 0
+    assert sci.read(5, timeout=1.0) == b"Hello"
+    assert ser.timeout_sets == 0
+
+
+class RecordingSerial(DummySerial):
+    def __init__(self):
+        super().__init__()
+        self.writes: list[bytes] = []
+
+    def write(self, data: bytes):
+        self.writes.append(bytes(data))
+        super().write(data)
+
+
+def test_batch_single_write(dummy_interface: SerialCommandInterface):
+    ser = RecordingSerial()
+    dummy_interface.ser = ser  # type: ignore
+    with dummy_interface.batch():
+        dummy_interface.write(137, (0, 0, 0, 0))
+        with dummy_interface.batch():
+            dummy_interface.write(139, (0, 0, 0))
+        assert ser.writes == []
+    assert ser.writes == [bytes([137, 0, 0, 0, 0, 139, 0, 0, 0])]
+
+
+def test_batch_sent_before_read(dummy_interface: SerialCommandInterface):
+    ser = RecordingSerial()
+    dummy_interface.ser = ser  # type: ignore
+    ser.add_response(b"\x01")
+    with dummy_interface.batch():
+        dummy_interface.write(145, (0, 0, 0, 0))
+        dummy_interface.write(142, (34,))
+        assert dummy_interface.read(1) == b"\x01"
+        dummy_interface.write(139, (0, 0, 0))
+    assert ser.writes == [bytes([145, 0, 0, 0, 0, 142, 34]), bytes([139, 0, 0, 0])]
@@ -0,0 +1,85 @@
+import gc
+import time
+from common import logging_setup, make_bot
+from pycreate2.create2api import _close_open_bots
+from pycreate2.OI import Modes
+from pycreate2.sensors import SensorNames
+from pycreate2.simulator import SimulatedSerial
+
+
+class CountingSerial(SimulatedSerial):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+        self.closed = 0
+
+    def write(self, data: bytes) -> int:
+        self.writes += 1
+        return super().write(data)
+
+    def close(self):
+        self.closed += 1
+        super().close()
+
+
+def test_context_manager_single_write(make_bot):
+    bot, ser = make_bot(ser=CountingSerial())
+    with bot:
+        bot.start()
+        bot.full()
+        bot.drive_direct(100, 100)
+        bot.led(4, 255, 255)
+        writes = ser.writes
+        start = time.monotonic()
+    assert time.monotonic() - start < bot.shutdown_budget
+    assert ser.writes == writes + 1
+    assert ser.closed == 1
+    assert ser.sim.mode == Modes.OFF
+    assert ser.sim.velocity_left == 0 and ser.sim.leds == (0, 0, 0)
+    bot.close()  # closing twice is fine
+    assert ser.closed == 1
+
+
+def test_close_stops_stream(make_bot):
+    bot, ser = make_bot(ser=CountingSerial())
+    bot.start()
+    bot.start_stream([SensorNames.BATTERY_CHARGE])
+    bot.close()
+    assert bot.sensor_stream is None
+    assert ser.sim.stream_paused
+
+
+def test_close_without_shutdown(make_bot):
+    bot, ser = make_bot(ser=CountingSerial())
+    ser.write_timeout = 2.0
+    bot.start()
+    stream = bot.start_stream([SensorNames.BATTERY_CHARGE])
+    bot.close(shutdown=False)
+    assert bot.sensor_stream is None and not stream.running
+    assert ser.sim.mode == Modes.PASSIVE
+    assert ser.write_timeout == 2.0
+
+
+def test_write_timeout_restored(make_bot):
+    bot, ser = make_bot(ser=CountingSerial())
+    ser.write_timeout = 2.0
+    bot.start()
+    bot._shutdown(time.monotonic() + bot.shutdown_budget)
+    assert ser.write_timeout == 2.0
+    assert ser.sim.mode == Modes.OFF
+
+
+def test_no_io_on_garbage_collection(make_bot):
+    bot, ser = make_bot(ser=CountingSerial())
+    del bot
+    gc.collect()
+    assert ser.writes == 0
+
+
+def test_atexit_safety_net(make_bot):
+    bot, ser = make_bot(ser=CountingSerial())
+    bot.start()
+    bot.safe()
+    _close_open_bots()
+    assert ser.sim.mode == Modes.OFF
+    assert ser.closed == 1
@@ -0,0 +1,147 @@
+import math
+import time
+import serial
+from common import logging_setup, make_bot
+from pycreate2.OI import Modes, Robot
+from pycreate2.sensors import SensorNames
+from pycreate2.simulator import Create2Simulator, PtySimulator, STREAM_PERIOD, wrap16
+
+
+def test_modes(make_bot):
+    bot, ser = make_bot()
+    sim = ser.sim
+    assert sim.mode == Modes.OFF
+    bot.drive_direct(100, 100)  # ignored while off
+    assert sim.velocity_left == 0
+    bot.start()
+    assert sim.mode == Modes.PASSIVE
+    bot.drive_direct(100, 100)  # ignored in passive
+    assert sim.velocity_left == 0
+    bot.safe()
+    assert sim.mode == Modes.SAFE
+    assert bot.get_sensor_list([SensorNames.OPEN_INTERFACE_MODE])[SensorNames.OPEN_INTERFACE_MODE] == Modes.SAFE.value
+    bot.SCI.write(173)  # stop
+    assert sim.mode == Modes.OFF
+
+
+def test_queries_sized(make_bot):
+    bot, ser = make_bot()
+    sim = ser.sim
+    bot.start()
+    sim.values[SensorNames.BATTERY_CHARGE] = 1234
+    for group in (0, 1, 2, 3, 4, 5, 6, 100, 101, 106, 107):
+        bot.get_sensor_group(group)
+    data = bot.get_sensor_list([SensorNames.BATTERY_CHARGE, SensorNames.VOLTAGE])
+    assert data[SensorNames.BATTERY_CHARGE] == 1234
+    assert data[SensorNames.VOLTAGE] == 15000
+
+
+def test_drive_kinematics(make_bot):
+    bot, ser = make_bot()
+    sim = ser.sim
+    bot.start()
+    bot.safe()
+
+    bot.drive_direct(200, 200)
+    bot.SCI.ser.advance(1.0)
+    bot.drive_direct(0, 0)
+    assert abs(sim.x - 200) < 1
+    assert abs(sim.y) < 1e-6
+    data = bot.get_sensor_list([SensorNames.ENCODER_COUNTS_LEFT, SensorNames.DISTANCE])
+    assert data[SensorNames.ENCODER_COUNTS_LEFT] == round(200 / Robot.TICK_TO_DISTANCE.value)
+    assert data[SensorNames.DISTANCE] == 200
+    # distance resets once read
+    assert bot.get_sensor_list([SensorNames.DISTANCE])[SensorNames.DISTANCE] == 0
+
+    # turn in place counter-clockwise for a quarter turn
+    speed = 100
+    quarter = (math.pi / 2) * (Robot.WHEEL_BASE.value / 2) / speed
+    bot.drive_radius(speed, 1)
+    bot.SCI.ser.advance(quarter)
+    bot.drive_direct(0, 0)
+    assert abs(sim.theta - math.pi / 2) < 0.01
+    assert bot.get_sensor_list([SensorNames.ANGLE])[SensorNames.ANGLE] == 90
+
+
+def test_encoder_wraparound():
+    sim = Create2Simulator()
+    sim.receive(bytes([128, 132]))
+    sim.receive(bytes([145, 0x01, 0xF4, 0x01, 0xF4]))  # 500 mm/s both wheels
+    ticks = 0
+    # 32767 ticks is about 14.5 m, drive past it
+    for _ in range(40):
+        sim.advance(1.0)
+        ticks += 500 / Robot.TICK_TO_DISTANCE.value
+    left = sim.packet_bytes(43)
+    assert int.from_bytes(left, "big", signed=True) == wrap16(round(ticks))
+    assert wrap16(32768) == -32768
+    assert wrap16(-32769) == 32767
+
+
+def test_song_duration(make_bot):
+    bot, ser = make_bot()
+    sim = ser.sim
+    bot.start()
+    bot.safe()
+    bot.createSong(3, [72, 32, 74, 32])  # two half second notes
+    bot.playSong(3)
+    assert bot.get_sensor_list([SensorNames.SONG_PLAYING])[SensorNames.SONG_PLAYING] == 1
+    bot.SCI.ser.advance(1.0)
+    assert bot.get_sensor_list([SensorNames.SONG_PLAYING])[SensorNames.SONG_PLAYING] == 0
+    assert sim.song_number == 3
+
+
+def test_song_ignored_in_passive(make_bot):
+    bot, ser = make_bot(Modes.PASSIVE)
+    bot.createSong(1, [60, 16])  # uploading works in Passive
+    bot.playSong(1)  # playing needs safe or full mode
+    assert ser.sim.songs[1] == (60, 16)
+    assert not ser.sim.song_playing
+    bot.safe()
+    bot.createSong(1, [60, 16])  # safe() cleared the slots
+    bot.playSong(1)
+    assert ser.sim.song_playing and ser.sim.song_number == 1
+
+
+def test_stream_frames(make_bot):
+    bot, ser = make_bot()
+    sim = ser.sim
+    bot.start()
+    bot.start_stream([SensorNames.BATTERY_CHARGE, SensorNames.ENCODER_COUNTS_LEFT])
+    assert bot.sensor_stream is not None
+    assert bot.sensor_stream.wait_frame(1.0)
+    frame = bot.get_stream_frame()
+    assert frame[SensorNames.BATTERY_CHARGE] == 2500
+    bot.stop_stream()
+
+    sim = Create2Simulator()
+    sim.receive(bytes([128, 148, 1, 7]))
+    data = sim.advance(10 * STREAM_PERIOD + 1e-9)
+    assert len(data) == 10 * 5
+    assert sum(data[:5]) & 0xFF == 0
+
+
+def test_runs_faster_than_real_time(make_bot):
+    bot, ser = make_bot()
+    sim = ser.sim
+    bot.start()
+    bot.safe()
+    sent = len(sim.commands)
+    start = time.monotonic()
+    for _ in range(1000):
+        bot.drive_direct(100, -100)
+        bot.get_sensor_group(100)
+    assert time.monotonic() - start < 5
+    assert len(sim.commands) - sent == 2000
+
+
+def test_pty_endpoint():
+    pty = PtySimulator()
+    pty.start()
+    try:
+        ser = serial.Serial(pty.port, 115200, timeout=1)
+        ser.write(bytes([128, 142, 100]))
+        assert len(ser.read(80)) == 80
+        ser.close()
+    finally:
+        pty.stop()
@@ -0,0 +1,95 @@
+import random
+import pycreate2.sensors as sensors
+from common import logging_setup, DummySerial, dummy_interface
+from pycreate2.create2api import Create2
+from pycreate2.stream import SensorStream, StreamParser
+
+
+def make_frame(payload: bytes) -> bytes:
+    frame = bytes([19, len(payload)]) + payload
+    return frame + bytes([-sum(frame) & 0xFF])
+
+
+def test_stream_decode(dummy_interface):
+    stream = SensorStream(dummy_interface, ["Charger Available", "Distance"])
+    frame = make_frame(b'\x22\x01\x13\xff\xfe')
+    assert stream.feed(frame) == 1
+    assert stream.latest() == {"Charger Available": 1, "Distance": -2}
+
+
+def test_stream_split_frames(dummy_interface):
+    stream = SensorStream(dummy_interface, ["Charger Available"])
+    frames = make_frame(b'\x22\x01') + make_frame(b'\x22\x02')
+    assert stream.feed(frames[:3]) == 0
+    assert stream.latest() is None
+    assert stream.feed(frames[3:]) == 2
+    assert stream.latest() == {"Charger Available": 2}
+    assert stream.frame_count == 2
+
+
+def test_stream_bad_checksum(dummy_interface):
+    stream = SensorStream(dummy_interface, ["Charger Available"])
+    bad = bytearray(make_frame(b'\x22\x01'))
+    bad[-1] ^= 0xFF
+    assert stream.feed(bytes(bad) + make_frame(b'\x22\x03')) == 1
+    assert stream.latest() == {"Charger Available": 3}
+    assert stream.error_count == 1
+
+
+def test_stream_group(dummy_interface):
+    stream = SensorStream(dummy_interface, [106])
+    values = bytes(range(12))
+    assert stream.feed(make_frame(b'\x6a' + values)) == 1
+    frame = stream.latest()
+    assert frame is not None
+    assert len(frame) == len(sensors.get_sensor_block(106))
+    assert frame["Light Bump Left"] == 1
+
+
+def test_query_blocked_while_streaming(dummy_interface):
+    create2 = Create2(sci=dummy_interface)
+    create2.start_stream(["Charger Available"])
+    try:
+        create2.get_sensor_list(["Charger Available"])
+        assert False, "Expected Exception"
+    except Exception as e:
+        assert "stream" in str(e)
+    finally:
+        create2.stop_stream()
+    assert create2.sensor_stream is None
+
+
+def test_parser_byte_by_byte_noise():
+    random.seed(42)
+    parser = StreamParser(capacity=StreamParser.MAX_FRAME)
+    data = bytearray()
+    for i in range(200):
+        data += bytes(random.randint(0, 255) for _ in range(random.randint(0, 5)))
+        data += make_frame(b'\x22' + bytes([i % 4]) + b'\x2b' + bytes([0, i]))
+
+    frames = []
+    for b in data:
+        frames += parser.feed(bytes([b]))
+
+    assert len(frames) == 200
+    assert frames[-1] == {"Charger Available": 3, "Encoder Counts Left": 199}
+    assert parser.frames == 200
+    assert parser.discarded_bytes > 0
+    assert parser.pending == 0
+
+
+def test_parser_corrupt_byte_resync():
+    parser = StreamParser()
+    good = make_frame(b'\x22\x01')
+    bad = bytearray(good)
+    bad[3] = 0x02  # flipped data bit, checksum no longer matches
+    frames = parser.feed(good + bytes(bad) + good)
+    assert len(frames) == 2
+    assert parser.checksum_errors == 1
+    assert parser.discarded_bytes == len(bad)
+
+
+def test_parser_unknown_packet():
+    parser = StreamParser()
+    assert parser.feed(make_frame(b'\xc8\x01')) == []
+    assert parser.format_errors == 1
@@ -0,0 +1,76 @@
+from common import logging_setup, make_bot
+from pycreate2.OI import Modes
+from pycreate2.sensors import SensorNames
+
+
+def run_frames(bot, ser, count):
+    stream = bot.sensor_stream
+    target = stream.frame_count + count
+    while stream.frame_count < target:
+        ser.advance(0.05)
+        stream.wait_frame(0.1)
+
+
+def stream_commands(sim):
+    return [cmd for cmd in sim.commands if cmd[0] in (148, 150)]
+
+
+def test_merged_stream_and_decimation(make_bot):
+    bot, ser = make_bot(Modes.PASSIVE)
+    safety, ui = [], []
+    bot.subscribe([SensorNames.BUMPS_WHEELDROPS], None, safety.append)
+    sub = bot.subscribe([SensorNames.VOLTAGE, SensorNames.BUMPS_WHEELDROPS], 10, ui.append)
+    assert bot.subscriptions.stream_packets == (7, 22)
+    # one stream for both, switched on the fly when the second one came
+    assert stream_commands(ser.sim) == [bytes([148, 1, 7]), bytes([150, 0]), bytes([148, 2, 7, 22])]
+
+    run_frames(bot, ser, 5)
+    safety.clear()
+    ui.clear()
+    run_frames(bot, ser, 70)
+    assert set(safety[-1]) == {SensorNames.BUMPS_WHEELDROPS}
+    assert ui[-1] == {SensorNames.VOLTAGE: 15000, SensorNames.BUMPS_WHEELDROPS: 0}
+    assert sub.every == 7
+    assert abs(len(ui) - len(safety) / 7) <= 2
+    assert sub.errors == 0
+
+    bot.unsubscribe(sub)
+    assert bot.subscriptions.stream_packets == (7,)
+    bot.stop_stream()
+
+
+def test_polling_after_last_cancel(make_bot):
+    bot, ser = make_bot(Modes.PASSIVE)
+    frames = []
+    sub = bot.subscribe([SensorNames.VOLTAGE], None, frames.append)
+    run_frames(bot, ser, 3)
+    sub.cancel()
+    assert not sub.active
+    assert bot.sensor_stream is None
+    assert ser.sim.stream_paused
+    # nothing streams anymore, queries and mode changes poll again
+    assert bot.get_sensor_list([SensorNames.VOLTAGE]) == {SensorNames.VOLTAGE: 15000}
+    bot.safe()
+
+    sub = bot.subscribe([SensorNames.VOLTAGE], None, frames.append)
+    assert not ser.sim.stream_paused
+    assert stream_commands(ser.sim)[-1] == bytes([148, 1, 22])
+    bot.subscriptions.close()
+    assert bot.sensor_stream is None
+
+
+def test_cancel_from_callback(make_bot):
+    bot, ser = make_bot(Modes.PASSIVE)
+    frames = []
+
+    def once(frame):
+        frames.append(frame)
+        sub.cancel()
+
+    sub = bot.subscribe([SensorNames.VOLTAGE], None, once)
+    stream = bot.sensor_stream
+    while stream.running:
+        ser.advance(0.05)
+        stream.wait_frame(0.1)
+    assert len(frames) == 1
+    assert bot.sensor_stream is None